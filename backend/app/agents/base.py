@@ -1,14 +1,133 @@
 # Import necessary components for agent implementation
-from typing import Any, Dict, List, Optional
-from langchain.agents import AgentExecutor
+import functools
+import time
+from typing import TYPE_CHECKING, Any, AsyncContextManager, Dict, List, Optional, Tuple
+from uuid import UUID
+from langchain_core.callbacks import AsyncCallbackHandler, UsageMetadataCallbackHandler
 from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import ensure_config
+
+from app.core.config import settings
+from app.core.metrics import agent_turn_errors_total, agent_turn_seconds
+from app.core.tracing import Span, current_span, span, start_span
+from app.services.admission import Permit, admission
+from app.services.history import HistoryManager, count_tokens, summarize_with_chat_model
+from app.services.messages import StoredMessage
+from app.services.model_policy import model_policy
+from app.services.persistence import conversation_writer
+from app.services.session_store import SessionMap, create_session_map
+
+if TYPE_CHECKING:
+    # langchain.agents is only imported when an agent executor is first built
+    from langchain.agents import AgentExecutor
+
+# Session used when the caller does not provide one
+DEFAULT_SESSION_ID = "default"
+
+def observe_turn(process_message):
+    """
+    Decorator for `process_message` implementations recording the duration
+    and failures of each turn, labelled with the agent name. A session gets
+    one turn in flight at a time; another one raises AdmissionRejected.
+    """
+    @functools.wraps(process_message)
+    async def wrapper(
+        self,
+        message: str,
+        context: Optional[Dict[str, Any]] = None,
+        session_id: str = DEFAULT_SESSION_ID
+    ):
+        with admission.turn(self._archive_key(session_id)), agent_turn_seconds.labels(self.name).time():
+            with span(f"{self.name}.process_message", "agent", agent=self.name):
+                try:
+                    return await process_message(self, message, context, session_id)
+                except Exception:
+                    agent_turn_errors_total.labels(self.name).inc()
+                    raise
+    return wrapper
+
+def config_with_handler(*handlers: Any) -> RunnableConfig:
+    """
+    Config adding callback handlers to a call, keeping the callbacks it
+    inherits from an enclosing run (e.g. the token streaming of the booking
+    pipeline), which an explicit `callbacks` entry would otherwise replace.
+    """
+    config = ensure_config()
+    callbacks = config.get("callbacks")
+    if callbacks is None:
+        callbacks = list(handlers)
+    elif isinstance(callbacks, list):
+        callbacks = [*callbacks, *handlers]
+    else:
+        callbacks = callbacks.copy()
+        for handler in handlers:
+            callbacks.add_handler(handler, inherit=True)
+    return {"callbacks": callbacks}
+
+class SpanCallbackHandler(AsyncCallbackHandler):
+    """
+    Callbacks recording a span per LLM call (model, time to first token when
+    streamed, tokens, the tools it chose) under the span current when the
+    handler is created. `steps` counts the calls, i.e. the agent executor steps.
+    """
+    
+    def __init__(self):
+        self.parent = current_span()
+        self.steps = 0
+        self._llm_spans: Dict[UUID, Span] = {}
+        self._last_llm_span: Optional[Span] = None
+        
+    async def on_chat_model_start(self, serialized, messages, *, run_id: UUID, metadata=None, **kwargs) -> None:
+        self._start_llm(run_id, metadata)
+        
+    async def on_llm_start(self, serialized, prompts, *, run_id: UUID, metadata=None, **kwargs) -> None:
+        self._start_llm(run_id, metadata)
+        
+    def _start_llm(self, run_id: UUID, metadata: Optional[Dict[str, Any]]) -> None:
+        if self.parent is None:
+            # Untraced request
+            return
+        self.steps += 1
+        llm_span = start_span("llm.call", "llm", self.parent, model=(metadata or {}).get("ls_model_name"), step=self.steps)
+        self._llm_spans[run_id] = llm_span
+        self._last_llm_span = llm_span
+        
+    async def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs) -> None:
+        llm_span = self._llm_spans.get(run_id)
+        if llm_span is not None and token and "ttft_ms" not in llm_span.attributes:
+            llm_span.set(ttft_ms=round(llm_span.elapsed() * 1000, 3))
+        
+    async def on_llm_end(self, response, *, run_id: UUID, **kwargs) -> None:
+        llm_span = self._llm_spans.pop(run_id, None)
+        if llm_span is None:
+            return
+        message = getattr(response.generations[0][0], "message", None) if response.generations else None
+        usage = getattr(message, "usage_metadata", None)
+        if usage:
+            llm_span.set(prompt_tokens=usage["input_tokens"], completion_tokens=usage["output_tokens"])
+        llm_span.end()
+        
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        llm_span = self._llm_spans.pop(run_id, None)
+        if llm_span is not None:
+            llm_span.end(error)
+        
+    async def on_agent_action(self, action, *, run_id: UUID, **kwargs) -> None:
+        # The tools the last LLM call asked for; the calls get spans of their own
+        if self._last_llm_span is not None:
+            self._last_llm_span.attributes.setdefault("actions", []).append(action.tool)
 
 class BaseAgent:
     """
     Base class for AI agents in the TripHelix system.
     This class provides common functionality for both SiteSherpa and Concierge agents.
+    
+    The agent executor is built once and reused for every message. It holds no
+    conversation state, so a single agent can serve many sessions concurrently;
+    each session's history is kept separately and passed in on every call.
     """
     
     def __init__(
@@ -16,7 +135,8 @@ class BaseAgent:
         llm: BaseChatModel,  # The language model to use (e.g., GPT-4)
         tools: List[Any],  # List of tools the agent can use
         system_prompt: str,  # The system prompt defining the agent's behavior
-        name: str  # The name of the agent
+        name: str,  # The name of the agent
+        verbose: Optional[bool] = None  # Log agent steps (defaults to AGENT_VERBOSE)
     ):
         """
         Initialize the base agent with necessary components.
@@ -26,12 +146,29 @@ class BaseAgent:
             tools: List of tools the agent can use
             system_prompt: The system prompt defining agent behavior
             name: The name of the agent
+            verbose: Whether the agent executor logs its steps
         """
         self.llm = llm
         self.tools = tools
         self.system_prompt = system_prompt
         self.name = name
-        self.memory: List[Dict[str, str]] = []  # Store conversation history
+        self.verbose = settings.AGENT_VERBOSE if verbose is None else verbose
+        # Conversation history of each session, keyed by session id (compact messages,
+        # converted to dictionaries by get_memory when a turn needs them). Bounded like the
+        # session store; evicted sessions are reloaded from the archive when they come back
+        self.sessions: SessionMap[List[StoredMessage]] = create_session_map()
+        # Bounds the history sent to the model, folding older turns into a summary
+        self.history_manager = HistoryManager(
+            summarizer=summarize_with_chat_model(llm),
+            model=settings.OPENAI_MODEL,
+            max_tokens=settings.HISTORY_MAX_TOKENS,
+            keep_recent=settings.HISTORY_KEEP_RECENT,
+        )
+        # Copies of llm configured for each conversation phase (see MODEL_PHASES)
+        self._phase_llms: Dict[str, BaseChatModel] = {}
+        # Executors by phase (None: llm itself) and the (tools, prompt, verbose) fingerprint they were built for
+        self._executors: Dict[Optional[str], "AgentExecutor"] = {}
+        self._executor_key: Optional[Tuple[Any, ...]] = None
         
     def _create_prompt(self) -> ChatPromptTemplate:
         """
@@ -40,17 +177,91 @@ class BaseAgent:
         """
         raise NotImplementedError
         
-    def _create_agent(self) -> AgentExecutor:
+    def _create_agent(self, llm: Optional[BaseChatModel] = None) -> "AgentExecutor":
         """
         Create the agent executor with the appropriate tools and prompt.
         This method must be implemented by child classes.
+        
+        Args:
+            llm: The model to run the agent with (defaults to the agent's llm)
         """
         raise NotImplementedError
         
+    def llm_for(self, phase: str) -> BaseChatModel:
+        """
+        Get the agent's model configured for a conversation phase: a copy of llm
+        with the phase's model and max_tokens (MODEL_PHASES), sharing its clients.
+        Models without these settings are used as they are.
+        
+        Args:
+            phase: "gathering", "extraction", "itinerary" or "booking"
+        """
+        llm = self._phase_llms.get(phase)
+        if llm is None:
+            llm = self.llm
+            if hasattr(llm, "model_name") and hasattr(llm, "max_tokens"):
+                model, max_tokens = model_policy.for_phase(phase)
+                llm = llm.model_copy(update={"model_name": model, "max_tokens": max_tokens})
+            self._phase_llms[phase] = llm
+        return llm
+        
+    def get_agent_executor(self, phase: Optional[str] = None) -> "AgentExecutor":
+        """
+        Get the agent executor, building it only on first use or after the
+        tools, the system prompt or the verbosity have changed.
+        
+        Args:
+            phase: Conversation phase selecting the model (None: the agent's llm)
+            
+        Returns:
+            The cached agent executor
+        """
+        key = (tuple(id(tool) for tool in self.tools), self.system_prompt, self.verbose)
+        if key != self._executor_key:
+            self._executors.clear()
+            self._executor_key = key
+        executor = self._executors.get(phase)
+        if executor is None:
+            with span("agent.build_executor", "step", agent=self.name, phase=phase):
+                executor = self._create_agent(self.llm if phase is None else self.llm_for(phase))
+            self._executors[phase] = executor
+        return executor
+        
+    async def run_agent(self, phase: str, inputs: Dict[str, Any], *prompt: str) -> Dict[str, Any]:
+        """
+        Run the executor of a phase on one turn in an admission slot, recording
+        the latency and cost of the phase.
+        
+        Args:
+            phase: Conversation phase of the turn
+            inputs: Variables of the agent prompt
+            prompt: Texts sent with the call, counted against PROVIDER_TPM
+            
+        Returns:
+            The executor's result
+        """
+        agent = self.get_agent_executor(phase)
+        usage = UsageMetadataCallbackHandler()
+        started = time.perf_counter()
+        async with self.admit(self.name, *prompt, phase=phase):
+            with span("agent.run", "agent", agent=self.name, phase=phase) as run_span:
+                spans = SpanCallbackHandler()
+                response = await agent.ainvoke(inputs, config=config_with_handler(usage, spans))
+                run_span.set(steps=spans.steps)
+        model_policy.record(
+            phase,
+            getattr(self.llm_for(phase), "model_name", self.name),
+            time.perf_counter() - started,
+            sum(call["input_tokens"] for call in usage.usage_metadata.values()),
+            sum(call["output_tokens"] for call in usage.usage_metadata.values()),
+        )
+        return response
+        
     async def process_message(
         self,
         message: str,
-        context: Optional[Dict[str, Any]] = None
+        context: Optional[Dict[str, Any]] = None,
+        session_id: str = DEFAULT_SESSION_ID
     ) -> str:
         """
         Process a message and return the agent's response.
@@ -59,27 +270,88 @@ class BaseAgent:
         Args:
             message: The user's message to process
             context: Optional additional context for the agent
+            session_id: The conversation the message belongs to
             
         Returns:
             The agent's response as a string
         """
         raise NotImplementedError
         
-    def add_to_memory(self, role: str, content: str) -> None:
+    @property
+    def memory(self) -> List[Dict[str, str]]:
+        """
+        Conversation history of the default session.
+        """
+        return self.get_memory()
+        
+    def add_to_memory(self, role: str, content: str, session_id: str = DEFAULT_SESSION_ID) -> None:
         """
         Add a message to the agent's conversation memory.
         
         Args:
             role: The role of the message sender ('user' or 'assistant')
             content: The content of the message
+            session_id: The conversation the message belongs to
         """
-        self.memory.append({"role": role, "content": content})
+        self.sessions.setdefault(session_id, []).append(StoredMessage(role, content))
+        # Archived in the background (see PERSISTENCE_ENABLED)
+        conversation_writer.submit(self._archive_key(session_id), role, content, source=self.name)
         
-    def get_memory(self) -> List[Dict[str, str]]:
+    def admit(self, caller: str, *prompt: str, phase: Optional[str] = None) -> AsyncContextManager[Permit]:
+        """
+        Admission slot for one upstream call of this agent: waits for a free slot
+        and the provider rate limits, or raises AdmissionRejected.
+        
+        Args:
+            caller: Metrics label identifying the call site
+            prompt: Texts sent with the call, counted against PROVIDER_TPM
+            phase: Conversation phase of the call (its max_tokens is reserved)
+        """
+        tokens = 0
+        if admission.limits_tokens:
+            llm = self.llm if phase is None else self.llm_for(phase)
+            max_tokens = getattr(llm, "max_tokens", None) or settings.OPENAI_MAX_TOKENS
+            tokens = sum(count_tokens(text, self.history_manager.model) for text in prompt) + max_tokens
+        return admission.slot(caller, tokens)
+        
+    def _archive_key(self, session_id: str) -> str:
+        """Id of a session's archived conversation, distinct per agent"""
+        return f"{self.name}:{session_id}"
+        
+    async def get_context_window(self, session_id: str = DEFAULT_SESSION_ID) -> List[Dict[str, str]]:
+        """
+        Get the part of the conversation memory to send to the model this turn.
+        Recent messages are kept verbatim and older ones are summarized so that
+        the history, together with the system prompt, fits the token budget.
+        
+        Args:
+            session_id: The conversation to build the window for
+            
+        Returns:
+            List of message dictionaries with role and content
+        """
+        if session_id not in self.sessions:
+            # Reload a session this process does not hold (e.g. after a restart) from the archive
+            with span("conversation.load", "store"):
+                archived = await conversation_writer.load(self._archive_key(session_id))
+            if archived:
+                self.sessions[session_id] = [StoredMessage.from_openai(message) for message in archived]
+                
+        with span("history.window", "step"):
+            return await self.history_manager.window(
+                f"{self.name}:{id(self)}:{session_id}",
+                self.get_memory(session_id),
+                reserved_tokens=count_tokens(self.system_prompt, self.history_manager.model)
+            )
+        
+    def get_memory(self, session_id: str = DEFAULT_SESSION_ID) -> List[Dict[str, str]]:
         """
         Get the agent's conversation memory.
         
+        Args:
+            session_id: The conversation to return
+            
         Returns:
             List of message dictionaries with role and content
         """
-        return self.memory 
\ No newline at end of file
+        return [message.to_openai() for message in self.sessions.get(session_id, ())]
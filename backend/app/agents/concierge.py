@@ -1,17 +1,33 @@
 # Import necessary components for agent implementation
-from typing import Any, Dict, List, Optional
-from langchain.agents import AgentExecutor, create_openai_functions_agent
+import json
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 from langchain_core.language_models import BaseChatModel
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.messages import SystemMessage
 
 # Import the base agent class
-from .base import BaseAgent
+from .base import BaseAgent, DEFAULT_SESSION_ID, observe_turn
+from app.services.tool_executor import tool_executor
+
+if TYPE_CHECKING:
+    from langchain.agents import AgentExecutor
+
+# Lookup tool answering each section of a booking schema (see SiteSherpa._generate_booking_schema)
+BOOKING_LOOKUPS = {
+    "flights": "search_flights",
+    "accommodation": "search_hotels",
+    "transfers": "search_transfers",
+    "activities": "search_activities",
+}
 
 class Concierge(BaseAgent):
     """
     Concierge agent specializes in making travel arrangements and bookings.
     This agent handles the actual booking process after SiteSherpa has gathered the necessary information.
+    
+    Its tools run through the shared tool executor: the calls the model makes in
+    one step run concurrently, each within its time limit, and lookups are
+    cached across sessions (TOOL_CACHE_TTLS).
     """
     
     def __init__(self, llm: BaseChatModel, tools: List[Any]):
@@ -19,7 +35,7 @@ class Concierge(BaseAgent):
         Initialize the Concierge agent with its specialized system prompt.
         
         Args:
-            llm: The language model instance
+            llm: The language model instance (a ChatOpenAI built with openai_endpoint() is routed across LLM_BACKENDS)
             tools: List of tools the agent can use
         """
         # Define the system prompt that guides the agent's behavior
@@ -55,53 +71,125 @@ class Concierge(BaseAgent):
         return ChatPromptTemplate.from_messages([
             SystemMessage(content=self.system_prompt),  # System instructions
             MessagesPlaceholder(variable_name="chat_history"),  # Conversation history
-            HumanMessage(content="{input}"),  # User's input
+            ("human", "{input}"),  # User's input
             MessagesPlaceholder(variable_name="agent_scratchpad"),  # Agent's thinking process
         ])
         
-    def _create_agent(self) -> AgentExecutor:
+    def _create_agent(self, llm: Optional[BaseChatModel] = None) -> "AgentExecutor":
         """
-        Create the agent executor with OpenAI functions agent.
-        This combines the language model, tools, and prompt template.
+        Create the agent executor with OpenAI tools agent.
+        This combines the language model, tools, and prompt template. Unlike the
+        functions agent, the tools agent lets the model request several tool
+        calls in one step (e.g. flights and hotels), which the executor runs
+        concurrently.
+        
+        Args:
+            llm: The model to run the agent with (defaults to the agent's llm)
         """
-        agent = create_openai_functions_agent(
-            llm=self.llm,
-            tools=self.tools,
+        # Deferred to the first executor build: langchain.agents is a heavy import
+        from langchain.agents import AgentExecutor, create_openai_tools_agent
+        
+        tools = [tool_executor.wrap(tool) for tool in self.tools]
+        agent = create_openai_tools_agent(
+            llm=llm or self.llm,
+            tools=tools,
             prompt=self._create_prompt()
         )
         return AgentExecutor.from_agent_and_tools(
             agent=agent,
-            tools=self.tools,
-            verbose=True  # Enable verbose output for debugging
+            tools=tools,
+            verbose=self.verbose  # Log agent steps when AGENT_VERBOSE is enabled
         )
         
+    def booking_queries(self, schema: Dict[str, Any]) -> Dict[str, Tuple[Any, Dict[str, Any]]]:
+        """
+        Turn a booking schema into the lookups answering it.
+        
+        Args:
+            schema: Output of SiteSherpa._generate_booking_schema
+            
+        Returns:
+            Section -> (tool, arguments), for the sections the agent has a lookup tool for
+        """
+        requirements = schema.get("booking_requirements") or {}
+        flights = requirements.get("flights") or {}
+        sections = dict(requirements)
+        if flights:
+            # Airport transfers on arrival, derived from the flights
+            sections["transfers"] = {
+                "destination": flights.get("destination"),
+                "date": (flights.get("dates") or {}).get("departure"),
+                "passengers": flights.get("passengers"),
+            }
+        tools = {tool.name: tool for tool in self.tools}
+        queries = {}
+        for section, args in sections.items():
+            tool = tools.get(BOOKING_LOOKUPS.get(section, ""))
+            if tool is not None and args:
+                queries[section] = (tool, args)
+        return queries
+        
+    async def lookup_bookings(self, schema: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run the lookups of a booking schema concurrently, as one batch.
+        
+        Args:
+            schema: Output of SiteSherpa._generate_booking_schema
+            
+        Returns:
+            Section -> the tool's output, or {"error": message} when it failed
+        """
+        queries = self.booking_queries(schema)
+        results = await tool_executor.run_batch(list(queries.values()))
+        return {
+            section: result.output if result.error is None else {"error": result.error}
+            for section, result in zip(queries, results)
+        }
+        
+    @observe_turn
     async def process_message(
         self,
         message: str,
-        context: Optional[Dict[str, Any]] = None
+        context: Optional[Dict[str, Any]] = None,
+        session_id: str = DEFAULT_SESSION_ID
     ) -> str:
         """
         Process a user message and return the agent's response.
         
         Args:
             message: The user's message to process
-            context: Optional additional context for the booking process
+            context: Optional additional context for the booking process (a booking schema,
+                with its "booking_lookups" when they were already run)
+            session_id: The conversation the message belongs to
             
         Returns:
             The agent's response as a string
         """
-        # Create a new agent instance for this interaction
-        agent = self._create_agent()
+        # A booking schema handed over by SiteSherpa is looked up up front, all sections at
+        # once, so the model starts from the options instead of calling the tools one by one
+        # (unless the caller already did, e.g. a checkpointed pipeline step)
+        agent_input = message
+        if context and context.get("booking_requirements"):
+            lookups = context.get("booking_lookups")
+            if lookups is None:
+                lookups = await self.lookup_bookings(context)
+            if lookups:
+                agent_input = f"{message}\n\nBooking lookups already run for these requirements:\n{json.dumps(lookups, default=str)}"
         
-        # Process the message with the agent, including any context
-        response = await agent.ainvoke({
-            "input": message,
-            "chat_history": self.memory,
-            "context": context or {}  # Include context if provided
-        })
+        # Process the message with the agent (built once, on the booking phase's model), including any context
+        chat_history = await self.get_context_window(session_id)
+        response = await self.run_agent(
+            "booking",
+            {
+                "input": agent_input,
+                "chat_history": chat_history,
+                "context": context or {}  # Include context if provided
+            },
+            self.system_prompt, agent_input, *(m["content"] for m in chat_history)
+        )
         
         # Store the interaction in memory
-        self.add_to_memory("user", message)
-        self.add_to_memory("assistant", response["output"])
+        self.add_to_memory("user", message, session_id)
+        self.add_to_memory("assistant", response["output"], session_id)
         
         return response["output"]
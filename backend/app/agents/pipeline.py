@@ -0,0 +1,203 @@
+"""
+SiteSherpa -> Concierge booking pipeline, as a LangGraph graph.
+
+The nodes run in order, and the state is checkpointed after each one
+(see app/services/checkpoints.py):
+
+- write_itinerary: SiteSherpa writes the itinerary for the preferences (LLM)
+- build_schema: SiteSherpa turns the preferences into the booking schema
+- run_lookups: Concierge runs the lookups of the schema as one batch (tools)
+- propose_booking: Concierge proposes the bookings from the schema and the lookups (LLM)
+
+A run is identified by its run id (the LangGraph thread id). Running an
+unfinished run again (it failed, its client went away, its worker died)
+resumes after its last completed node; running a finished one replays its
+result without calling anything.
+"""
+
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Optional, Tuple, TypedDict
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.graph import END, START, StateGraph
+
+from app.core.metrics import pipeline_node_seconds, pipeline_runs_total
+from app.core.tracing import span
+from app.schemas.base import TravelPreferences
+
+if TYPE_CHECKING:
+    from .concierge import Concierge
+    from .site_sherpa import SiteSherpa
+
+# Nodes in execution order, and the state key each one fills
+NODES = ("write_itinerary", "build_schema", "run_lookups", "propose_booking")
+NODE_OUTPUTS = {
+    "write_itinerary": "itinerary",
+    "build_schema": "booking_schema",
+    "run_lookups": "booking_lookups",
+    "propose_booking": "booking",
+}
+
+# Request sent to Concierge when the caller gives none
+DEFAULT_BOOKING_REQUEST = "Propose flights, accommodation and transfers for this trip within the budget."
+
+
+class PipelineState(TypedDict, total=False):
+    """State of a pipeline run, checkpointed after every node."""
+    preferences: Dict[str, Any]  # TravelPreferences as JSON
+    message: str  # Booking request passed to Concierge
+    itinerary: str
+    booking_schema: Dict[str, Any]
+    booking_lookups: Dict[str, Any]
+    booking: str
+
+
+class BookingPipeline:
+    """
+    The booking graph over one SiteSherpa and one Concierge, with its checkpointer.
+    """
+
+    def __init__(self, sherpa: "SiteSherpa", concierge: "Concierge", checkpointer: BaseCheckpointSaver):
+        """
+        Args:
+            sherpa: Writes the itinerary and the booking schema
+            concierge: Runs the lookups and proposes the bookings
+            checkpointer: Where the state of the runs is saved after each node
+        """
+        self.sherpa = sherpa
+        self.concierge = concierge
+        self.checkpointer = checkpointer
+        self.graph = self._build().compile(checkpointer=checkpointer)
+
+    def _build(self) -> StateGraph:
+        builder = StateGraph(PipelineState)
+        builder.add_node("write_itinerary", self._timed("write_itinerary", self._itinerary))
+        builder.add_node("build_schema", self._timed("build_schema", self._booking_schema))
+        builder.add_node("run_lookups", self._timed("run_lookups", self._lookups))
+        builder.add_node("propose_booking", self._timed("propose_booking", self._booking))
+        builder.add_edge(START, NODES[0])
+        for node, next_node in zip(NODES, NODES[1:]):
+            builder.add_edge(node, next_node)
+        builder.add_edge(NODES[-1], END)
+        return builder
+
+    @staticmethod
+    def _timed(name: str, node):
+        async def run(state: PipelineState, config: RunnableConfig) -> Dict[str, Any]:
+            with pipeline_node_seconds.labels(name).time(), span(f"pipeline.{name}", "step"):
+                return await node(state, config["configurable"]["thread_id"])
+        return run
+
+    async def _itinerary(self, state: PipelineState, run_id: str) -> Dict[str, Any]:
+        preferences = TravelPreferences.model_validate(state["preferences"])
+        return {"itinerary": await self.sherpa._generate_itinerary(preferences=preferences)}
+
+    async def _booking_schema(self, state: PipelineState, run_id: str) -> Dict[str, Any]:
+        preferences = TravelPreferences.model_validate(state["preferences"])
+        return {"booking_schema": self.sherpa._generate_booking_schema(preferences)}
+
+    async def _lookups(self, state: PipelineState, run_id: str) -> Dict[str, Any]:
+        return {"booking_lookups": await self.concierge.lookup_bookings(state["booking_schema"])}
+
+    async def _booking(self, state: PipelineState, run_id: str) -> Dict[str, Any]:
+        booking = await self.concierge.process_message(
+            state.get("message") or DEFAULT_BOOKING_REQUEST,
+            context={**state["booking_schema"], "booking_lookups": state["booking_lookups"]},
+            # The run's own Concierge conversation
+            session_id=f"pipeline:{run_id}",
+        )
+        return {"booking": booking}
+
+    @staticmethod
+    def _config(run_id: str) -> Dict[str, Any]:
+        return {"configurable": {"thread_id": run_id}}
+
+    async def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """
+        State of a run: the nodes completed and to come, and their outputs.
+
+        Returns:
+            None for an unknown run
+        """
+        snapshot = await self.graph.aget_state(self._config(run_id))
+        if not snapshot.values:
+            return None
+        # From the outputs rather than snapshot.next: a node that completed without its step
+        # being checkpointed (pending writes) is done, although the next one is not scheduled yet
+        completed = [node for node in NODES if NODE_OUTPUTS[node] in snapshot.values]
+        return {
+            "run_id": run_id,
+            "completed": completed,
+            "next": [node for node in NODES if node not in completed],
+            **snapshot.values,
+        }
+
+    async def stream(
+        self,
+        run_id: str,
+        preferences: Optional[TravelPreferences] = None,
+        message: Optional[str] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Run, resume or replay a run, yielding its events:
+
+        - resumed: {"completed", "next"} when an unfinished run is picked up again
+        - token: {"node", "text"} for every token an LLM streams inside a node
+        - node: {"node", "output"} when a node completes (and is checkpointed)
+        - done: the final state of the run
+
+        Args:
+            run_id: The run to start, resume or replay
+            preferences: Preferences of a new run (ignored for a known run)
+            message: Booking request of a new run (defaults to DEFAULT_BOOKING_REQUEST)
+
+        Raises:
+            LookupError: The run is unknown and no preferences were given
+        """
+        config = self._config(run_id)
+        run = await self.get_run(run_id)
+        if run is not None and not run["next"]:
+            # Finished earlier: nothing to call again
+            pipeline_runs_total.labels("replayed").inc()
+            yield "done", run
+            return
+
+        if run is not None:
+            inputs = None
+            pipeline_runs_total.labels("resumed").inc()
+            yield "resumed", {"completed": run["completed"], "next": run["next"]}
+        elif preferences is None:
+            raise LookupError(f"Unknown pipeline run {run_id}")
+        else:
+            inputs = {"preferences": preferences.model_dump(mode="json"), "message": message or DEFAULT_BOOKING_REQUEST}
+            pipeline_runs_total.labels("started").inc()
+
+        try:
+            async for mode, chunk in self.graph.astream(inputs, config, stream_mode=["messages", "updates"]):
+                if mode == "messages":
+                    token, metadata = chunk
+                    if isinstance(token.content, str) and token.content:
+                        yield "token", {"node": metadata.get("langgraph_node"), "text": token.content}
+                else:
+                    for node, output in chunk.items():
+                        yield "node", {"node": node, "output": output}
+        except Exception:
+            pipeline_runs_total.labels("failed").inc()
+            raise
+        pipeline_runs_total.labels("completed").inc()
+        yield "done", await self.get_run(run_id)
+
+
+def create_booking_pipeline() -> BookingPipeline:
+    """
+    Build the booking pipeline: a SiteSherpa and a Concierge sharing its model,
+    checkpointed to PIPELINE_CHECKPOINT_BACKEND.
+    """
+    from app.services.checkpoints import create_checkpointer
+
+    from .concierge import Concierge
+    from .site_sherpa import SiteSherpa
+
+    sherpa = SiteSherpa(tools=[])
+    concierge = Concierge(sherpa.llm, tools=[])
+    return BookingPipeline(sherpa, concierge, create_checkpointer())
@@ -1,30 +1,93 @@
 # Import necessary components for agent implementation
-from typing import Any, Dict, List, Optional
-from langchain.agents import AgentExecutor, create_openai_functions_agent
+import asyncio
+import json
+import time
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional
 from langchain_core.language_models import BaseChatModel
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.messages import SystemMessage
 from langchain_openai import ChatOpenAI
+import httpx
 from pydantic import BaseModel, Field
-from datetime import datetime
+from datetime import datetime, timedelta
 from enum import Enum
 
-# Import the base agent class and AI config
-from .base import BaseAgent
-from app.core.ai_config import ai_config
+# Import the base agent class and settings
+from .base import BaseAgent, DEFAULT_SESSION_ID, SpanCallbackHandler, config_with_handler, observe_turn
+from app.core.config import settings
+from app.schemas.base import TravelPreferences
+from app.core.metrics import itinerary_generation_seconds, llm_tokens_total, upstream_requests_total
+from app.core.tracing import span
+from app.services.llm_cache import completion_cache
+from app.services.cancellation import completion_lengths
+from app.services.llm_router import openai_endpoint
+from app.services.model_policy import model_policy
+from app.services.session_store import SessionMap, create_session_map
 
-class TravelPreferences(BaseModel):
-    """Structured data model for travel preferences"""
-    destination: str = Field(..., description="Main travel destination")
-    start_date: datetime = Field(..., description="Travel start date")
-    end_date: datetime = Field(..., description="Travel end date")
-    budget: float = Field(..., description="Total budget for the trip")
-    accommodation_type: str = Field(..., description="Preferred type of accommodation")
-    travel_style: str = Field(..., description="Travel style (e.g., luxury, budget, adventure)")
-    interests: List[str] = Field(..., description="List of interests and activities")
-    special_requirements: List[str] = Field(default_factory=list, description="Any special requirements")
-    group_size: int = Field(..., description="Number of people traveling")
-    dietary_restrictions: List[str] = Field(default_factory=list, description="Any dietary restrictions")
+if TYPE_CHECKING:
+    from langchain.agents import AgentExecutor
+
+class PreferenceDelta(BaseModel):
+    """Travel preferences stated in a single user message; every field is optional"""
+    destination: Optional[str] = Field(None, description="Main travel destination")
+    start_date: Optional[datetime] = Field(None, description="Travel start date")
+    end_date: Optional[datetime] = Field(None, description="Travel end date")
+    budget: Optional[float] = Field(None, description="Total budget for the trip")
+    accommodation_type: Optional[str] = Field(None, description="Preferred type of accommodation")
+    travel_style: Optional[str] = Field(None, description="Travel style (e.g., luxury, budget, adventure)")
+    interests: Optional[List[str]] = Field(None, description="List of interests and activities")
+    special_requirements: Optional[List[str]] = Field(None, description="Any special requirements")
+    group_size: Optional[int] = Field(None, description="Number of people traveling")
+    dietary_restrictions: Optional[List[str]] = Field(None, description="Any dietary restrictions")
+
+# Fields behind each conversation_state flag; a flag is set once all its fields are known
+STATE_FIELDS = {
+    "has_destination": ("destination",),
+    "has_dates": ("start_date", "end_date"),
+    "has_preferences": ("accommodation_type", "travel_style", "interests", "group_size"),
+    "has_budget": ("budget",),
+    "has_special_requirements": ("special_requirements", "dietary_restrictions"),
+}
+
+# Flags needed before an itinerary can be generated (special requirements default to none)
+REQUIRED_STATE = ("has_destination", "has_dates", "has_preferences", "has_budget")
+
+def merge_preferences(known: PreferenceDelta, delta: PreferenceDelta) -> PreferenceDelta:
+    """
+    Merge the preferences extracted from a new message into the known ones.
+    Stated values replace earlier ones; list values are added to earlier ones.
+    
+    Args:
+        known: Preferences collected so far
+        delta: Preferences stated in the new message
+        
+    Returns:
+        The merged preferences
+    """
+    updates = delta.model_dump(exclude_none=True)
+    for field, value in updates.items():
+        previous = getattr(known, field)
+        if isinstance(value, list) and previous:
+            updates[field] = previous + [item for item in value if item not in previous]
+    return known.model_copy(update=updates)
+
+def conversation_state_for(preferences: PreferenceDelta) -> Dict[str, bool]:
+    """
+    Derive the conversation_state flags from the preferences collected so far.
+    
+    Args:
+        preferences: Preferences collected so far
+    """
+    state = {
+        flag: all(getattr(preferences, field) is not None for field in fields)
+        for flag, fields in STATE_FIELDS.items()
+    }
+    # Special requirements count as answered once either kind has been stated
+    state["has_special_requirements"] = any(
+        getattr(preferences, field) is not None for field in STATE_FIELDS["has_special_requirements"]
+    )
+    state["all_info_collected"] = all(state[flag] for flag in REQUIRED_STATE)
+    return state
 
 class SiteSherpa(BaseAgent):
     """
@@ -39,12 +102,19 @@ class SiteSherpa(BaseAgent):
         Args:
             tools: List of tools the agent can use
         """
-        # Initialize OpenAI chat model
+        # Initialize OpenAI chat model, routed across LLM_BACKENDS when they are set
+        base_url, http_client = openai_endpoint()
         llm = ChatOpenAI(
-            model=ai_config.OPENAI_MODEL,
-            temperature=ai_config.OPENAI_TEMPERATURE,
-            max_tokens=ai_config.OPENAI_MAX_TOKENS,
-            api_key=ai_config.OPENAI_API_KEY
+            model=settings.OPENAI_MODEL,
+            temperature=settings.OPENAI_TEMPERATURE,
+            max_tokens=settings.OPENAI_MAX_TOKENS,
+            api_key=settings.OPENAI_API_KEY,
+            base_url=base_url,  # e.g. the local fake upstream in benchmarks/
+            http_async_client=http_client,
+            timeout=httpx.Timeout(
+                settings.OPENAI_READ_TIMEOUT,
+                connect=settings.OPENAI_CONNECT_TIMEOUT
+            )
         )
         
         # Define the system prompt that guides the agent's behavior
@@ -88,15 +158,45 @@ class SiteSherpa(BaseAgent):
             name="SiteSherpa"
         )
         self.travel_preferences = None
-        self.conversation_state = {
-            "has_destination": False,
-            "has_dates": False,
-            "has_preferences": False,
-            "has_budget": False,
-            "has_special_requirements": False,
-            "all_info_collected": False
-        }
+        # Preferences collected so far in each session, keyed by session id; bounded like
+        # the session histories and touched on the same turns, so both age out together
+        self.session_preferences: SessionMap[PreferenceDelta] = create_session_map()
+        
+    @property
+    def conversation_state(self) -> Dict[str, bool]:
+        """
+        Information collected so far in the default session.
+        """
+        return self.get_conversation_state()
+        
+    def get_conversation_state(self, session_id: str = DEFAULT_SESSION_ID) -> Dict[str, bool]:
+        """
+        Get which information has been collected so far in a session.
+        
+        Args:
+            session_id: The conversation to inspect
+            
+        Returns:
+            The conversation_state flags (has_destination, ..., all_info_collected)
+        """
+        return conversation_state_for(self.session_preferences.get(session_id, PreferenceDelta()))
         
+    def get_travel_preferences(self, session_id: str = DEFAULT_SESSION_ID) -> Optional[TravelPreferences]:
+        """
+        Get the complete travel preferences of a session.
+        
+        Args:
+            session_id: The conversation to inspect
+            
+        Returns:
+            The preferences, or None while required information is still missing
+        """
+        preferences = self.session_preferences.get(session_id, PreferenceDelta())
+        if not conversation_state_for(preferences)["all_info_collected"]:
+            return None
+        return TravelPreferences(**preferences.model_dump(exclude_none=True))
+        
+
     def _create_prompt(self) -> ChatPromptTemplate:
         """
         Create the chat prompt template for the SiteSherpa agent.
@@ -104,41 +204,168 @@ class SiteSherpa(BaseAgent):
         """
         return ChatPromptTemplate.from_messages([
             SystemMessage(content=self.system_prompt),  # System instructions
+            ("system", "{collection_state}"),  # Information collected so far and still missing
             MessagesPlaceholder(variable_name="chat_history"),  # Conversation history
-            HumanMessage(content="{input}"),  # User's input
+            ("human", "{input}"),  # User's input
             MessagesPlaceholder(variable_name="agent_scratchpad"),  # Agent's thinking process
         ])
         
-    def _create_agent(self) -> AgentExecutor:
+    def _create_agent(self, llm: Optional[BaseChatModel] = None) -> "AgentExecutor":
         """
         Create the agent executor with OpenAI functions agent.
         This combines the language model, tools, and prompt template.
+        
+        Args:
+            llm: The model to run the agent with (defaults to the agent's llm)
         """
+        # Deferred to the first executor build: langchain.agents is a heavy import
+        from langchain.agents import AgentExecutor, create_openai_functions_agent
+        
         agent = create_openai_functions_agent(
-            llm=self.llm,
+            llm=llm or self.llm,
             tools=self.tools,
             prompt=self._create_prompt()
         )
         return AgentExecutor.from_agent_and_tools(
             agent=agent,
             tools=self.tools,
-            verbose=True  # Enable verbose output for debugging
+            verbose=self.verbose  # Log agent steps when AGENT_VERBOSE is enabled
+        )
+        
+    def _preferences_block(self, preferences: TravelPreferences) -> str:
+        """Describe the collected preferences for itinerary prompts"""
+        return f"""Destination: {preferences.destination}
+        Dates: {preferences.start_date} to {preferences.end_date}
+        Budget: ${preferences.budget}
+        Style: {preferences.travel_style}
+        Interests: {', '.join(preferences.interests)}
+        Group Size: {preferences.group_size}
+        Special Requirements: {', '.join(preferences.special_requirements)}"""
+        
+    async def _complete(self, prompt: str, caller: str, use_cache: bool = True, phase: str = "itinerary") -> str:
+        """
+        Run a single completion through the completion cache, recording metrics.
+        
+        Args:
+            prompt: The prompt to complete
+            caller: Metrics label identifying the call site
+            use_cache: Reuse an earlier completion of the same prompt,
+                when the model temperature allows caching
+            phase: Conversation phase of the call, selecting its model (MODEL_PHASES)
+        """
+        llm = self.llm_for(phase)
+        cache_key = None
+        if use_cache:
+            cache_key = completion_cache.key(
+                llm.model_name,
+                llm.temperature,
+                [{"role": "user", "content": prompt}],
+                max_tokens=llm.max_tokens,
+            )
+        if cache_key:
+            cached = await completion_cache.get(cache_key)
+            if cached is not None:
+                return cached
+                
+        started = time.perf_counter()
+        async with self.admit(caller, prompt, phase=phase) as permit:
+            try:
+                response = await llm.ainvoke(prompt, config=config_with_handler(SpanCallbackHandler()))
+            except asyncio.CancelledError:
+                # Consumer gone (e.g. stream_itinerary closed): the request is dropped mid-flight
+                upstream_requests_total.labels(caller, "cancelled").inc()
+                completion_lengths.cancelled(caller, 0, llm.max_tokens)
+                raise
+            except Exception:
+                upstream_requests_total.labels(caller, "error").inc()
+                raise
+            upstream_requests_total.labels(caller, "ok").inc()
+            if response.usage_metadata:
+                llm_tokens_total.labels(caller, "prompt").inc(response.usage_metadata["input_tokens"])
+                llm_tokens_total.labels(caller, "completion").inc(response.usage_metadata["output_tokens"])
+                completion_lengths.observe(caller, response.usage_metadata["output_tokens"])
+                permit.release(response.usage_metadata["total_tokens"])
+            usage = response.usage_metadata or {}
+            model_policy.record(
+                phase, llm.model_name, time.perf_counter() - started,
+                usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+            )
+        if cache_key:
+            await completion_cache.set(cache_key, response.content)
+        return response.content
+        
+    async def _extract_preferences(self, message: str, known: PreferenceDelta) -> PreferenceDelta:
+        """
+        Extract the preferences stated in one user message. Only the new message
+        is sent, with the preferences known so far, instead of the whole transcript.
+        
+        Args:
+            message: The user's message
+            known: Preferences collected so far
+            
+        Returns:
+            The preferences stated in the message (empty if none could be parsed)
+        """
+        extraction_prompt = f"""Extract the travel preferences stated in the user's message below.
+        Today is {datetime.now().date().isoformat()}.
+        Already known (include these only if the message changes them): {known.model_dump_json(exclude_none=True)}
+        
+        Return ONLY a JSON object with any of these keys: destination, start_date (YYYY-MM-DD),
+        end_date (YYYY-MM-DD), budget (total, number), accommodation_type, travel_style,
+        interests (list), special_requirements (list), group_size (integer), dietary_restrictions (list).
+        Leave out the keys the message does not mention. Use an empty list when the user
+        says they have no special requirements or dietary restrictions.
+        
+        Message: {message}
+        """
+        raw = await self._complete(extraction_prompt, "preference_extraction", phase="extraction")
+        try:
+            return PreferenceDelta.model_validate_json(raw[raw.index("{"):raw.rindex("}") + 1])
+        except ValueError:
+            return PreferenceDelta()
+            
+    def _collection_state_prompt(self, preferences: PreferenceDelta) -> str:
+        """Tell the agent what is already known so that it only asks for what is missing"""
+        known = preferences.model_dump(mode="json", exclude_none=True)
+        state = conversation_state_for(preferences)
+        missing = [
+            field.replace("_", " ")
+            for flag, fields in STATE_FIELDS.items() if not state[flag]
+            for field in fields if getattr(preferences, field) is None
+        ]
+        return (
+            f"Information already collected, do not ask for it again: {json.dumps(known) if known else 'nothing yet'}\n"
+            f"Still to ask about, one question at a time: {', '.join(missing) or 'nothing'}"
         )
         
-    def _generate_itinerary(self) -> str:
-        """Generate a detailed itinerary based on collected preferences"""
-        if not self.travel_preferences:
+    async def _generate_itinerary(
+        self,
+        use_cache: bool = True,
+        parallel: Optional[bool] = None,
+        preferences: Optional[TravelPreferences] = None
+    ) -> str:
+        """
+        Generate a detailed itinerary based on collected preferences.
+        
+        Args:
+            use_cache: Reuse the itinerary generated earlier for the same preferences,
+                when the model temperature allows caching
+            parallel: Plan a skeleton and generate the days concurrently
+                (defaults to ITINERARY_PARALLEL)
+            preferences: Preferences to plan for (defaults to travel_preferences)
+        """
+        preferences = preferences or self.travel_preferences
+        if not preferences:
             return "Please provide all necessary travel information first."
             
+        if settings.ITINERARY_PARALLEL if parallel is None else parallel:
+            with itinerary_generation_seconds.labels("parallel").time(), span("sherpa.generate_itinerary", "agent", mode="parallel"):
+                days = self.stream_itinerary(use_cache=use_cache, preferences=preferences)
+                return "\n".join([day async for day in days])
+                
         # Use the LLM to generate a detailed itinerary
         itinerary_prompt = f"""Based on the following travel preferences, create a detailed day-by-day itinerary in HTML format:
-        Destination: {self.travel_preferences.destination}
-        Dates: {self.travel_preferences.start_date} to {self.travel_preferences.end_date}
-        Budget: ${self.travel_preferences.budget}
-        Style: {self.travel_preferences.travel_style}
-        Interests: {', '.join(self.travel_preferences.interests)}
-        Group Size: {self.travel_preferences.group_size}
-        Special Requirements: {', '.join(self.travel_preferences.special_requirements)}
+        {self._preferences_block(preferences)}
         
         Please provide a detailed day-by-day itinerary in HTML format with the following structure:
         <div class="itinerary-day">
@@ -161,47 +388,156 @@ class SiteSherpa(BaseAgent):
         6. Booking links where applicable
         """
         
-        return self.llm.predict(itinerary_prompt)
+        with itinerary_generation_seconds.labels("single").time(), span("sherpa.generate_itinerary", "agent", mode="single"):
+            return await self._complete(itinerary_prompt, "itinerary", use_cache)
+            
+    async def _plan_itinerary_skeleton(
+        self,
+        preferences: TravelPreferences,
+        use_cache: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        Plan the outline of the trip (one short entry per day) so that the days
+        can then be generated independently without repeating each other.
+        Falls back to one untitled entry per date if the outline cannot be parsed.
+        """
+        skeleton_prompt = f"""Plan the outline of a day-by-day itinerary for these travel preferences:
+        {self._preferences_block(preferences)}
+        
+        Return ONLY a JSON array with one object per day, in order, like:
+        [{{"day": 1, "date": "YYYY-MM-DD", "theme": "short theme", "area": "neighbourhood or town"}}]
+        Spread the interests over the trip and do not repeat the same attraction twice.
+        """
+        raw = await self._complete(skeleton_prompt, "itinerary_skeleton", use_cache)
+        try:
+            days = json.loads(raw[raw.index("["):raw.rindex("]") + 1])
+            if days and all(isinstance(day, dict) for day in days):
+                return days
+        except ValueError:
+            pass
+            
+        start = preferences.start_date.date()
+        length = (preferences.end_date.date() - start).days + 1
+        return [
+            {"day": i + 1, "date": (start + timedelta(days=i)).isoformat(), "theme": "", "area": ""}
+            for i in range(max(1, length))
+        ]
+        
+    async def stream_itinerary(
+        self,
+        use_cache: bool = True,
+        max_concurrency: Optional[int] = None,
+        preferences: Optional[TravelPreferences] = None
+    ) -> AsyncIterator[str]:
+        """
+        Generate the itinerary day by day: plan a skeleton first, then generate
+        every day concurrently and yield each day's HTML block in order as soon
+        as it and all the days before it are ready.
+        
+        Args:
+            use_cache: Reuse earlier completions of the same prompts when allowed
+            max_concurrency: Maximum days generated at once (defaults to ITINERARY_MAX_CONCURRENCY)
+            preferences: Preferences to plan for (defaults to travel_preferences)
+        """
+        preferences = preferences or self.travel_preferences
+        skeleton = await self._plan_itinerary_skeleton(preferences, use_cache)
+        outline = "\n".join(
+            f"Day {day.get('day')}: {day.get('date', '')} {day.get('theme', '')} {day.get('area', '')}".rstrip()
+            for day in skeleton
+        )
+        semaphore = asyncio.Semaphore(max_concurrency or settings.ITINERARY_MAX_CONCURRENCY)
+        
+        async def generate_day(day: Dict[str, Any]) -> str:
+            day_prompt = f"""Based on the following travel preferences, write day {day.get('day')} of a trip itinerary in HTML format:
+            {self._preferences_block(preferences)}
+            
+            Outline of the whole trip (other days are written separately, do not repeat their activities):
+            {outline}
+            
+            Write ONLY this day, as:
+            <div class="itinerary-day">
+              <h3>Day {day.get('day')}: {day.get('date', '[Date]')}</h3>
+              <div class="itinerary-time">Morning</div>
+              <div class="itinerary-activity">[Activity]</div>
+              <div class="itinerary-time">Afternoon</div>
+              <div class="itinerary-activity">[Activity]</div>
+              <div class="itinerary-time">Evening</div>
+              <div class="itinerary-activity">[Activity]</div>
+              <div class="itinerary-note">[Notes/Recommendations]</div>
+            </div>
+            
+            Include recommended restaurants, transportation, estimated costs,
+            time allocations and booking links where applicable.
+            """
+            async with semaphore:
+                return await self._complete(day_prompt, "itinerary_day", use_cache)
+                
+        tasks = [asyncio.create_task(generate_day(day)) for day in skeleton]
+        try:
+            for task in tasks:
+                yield await task
+        finally:
+            # Stop generating days nobody will read (consumer gone or a day failed)
+            for task in tasks:
+                task.cancel()
         
-    def _generate_booking_schema(self) -> Dict[str, Any]:
+    def _generate_booking_schema(self, preferences: Optional[TravelPreferences] = None) -> Dict[str, Any]:
         """Generate a structured JSON schema for the next agent"""
-        if not self.travel_preferences:
+        preferences = preferences or self.travel_preferences
+        if not preferences:
             return {}
             
         return {
             "booking_requirements": {
                 "flights": {
                     "origin": "To be determined",
-                    "destination": self.travel_preferences.destination,
+                    "destination": preferences.destination,
                     "dates": {
-                        "departure": self.travel_preferences.start_date.isoformat(),
-                        "return": self.travel_preferences.end_date.isoformat()
+                        "departure": preferences.start_date.isoformat(),
+                        "return": preferences.end_date.isoformat()
                     },
-                    "passengers": self.travel_preferences.group_size
+                    "passengers": preferences.group_size
                 },
                 "accommodation": {
-                    "type": self.travel_preferences.accommodation_type,
-                    "location": self.travel_preferences.destination,
-                    "check_in": self.travel_preferences.start_date.isoformat(),
-                    "check_out": self.travel_preferences.end_date.isoformat(),
-                    "guests": self.travel_preferences.group_size,
-                    "special_requirements": self.travel_preferences.special_requirements
+                    "type": preferences.accommodation_type,
+                    "location": preferences.destination,
+                    "check_in": preferences.start_date.isoformat(),
+                    "check_out": preferences.end_date.isoformat(),
+                    "guests": preferences.group_size,
+                    "special_requirements": preferences.special_requirements
                 },
                 "activities": {
-                    "interests": self.travel_preferences.interests,
-                    "dietary_restrictions": self.travel_preferences.dietary_restrictions
+                    "interests": preferences.interests,
+                    "dietary_restrictions": preferences.dietary_restrictions
                 },
                 "budget": {
-                    "total": self.travel_preferences.budget,
-                    "style": self.travel_preferences.travel_style
+                    "total": preferences.budget,
+                    "style": preferences.travel_style
                 }
             }
         }
         
+    async def enqueue_itinerary(self, preferences: Optional[TravelPreferences] = None) -> str:
+        """
+        Hand itinerary generation to a background worker.
+        
+        Args:
+            preferences: Preferences to plan for (defaults to travel_preferences)
+            
+        Returns:
+            The job id; progress is streamed from /api/v1/jobs/{job_id}/stream
+        """
+        # Imported here so that workers importing this module do not import themselves
+        from app.services.jobs import enqueue, generate_itinerary_task
+        preferences = preferences or self.travel_preferences
+        return await enqueue(generate_itinerary_task, (preferences.model_dump(mode="json"),))
+        
+    @observe_turn
     async def process_message(
         self,
         message: str,
-        context: Optional[Dict[str, Any]] = None
+        context: Optional[Dict[str, Any]] = None,
+        session_id: str = DEFAULT_SESSION_ID
     ) -> str:
         """
         Process a user message and return the agent's response.
@@ -209,30 +545,54 @@ class SiteSherpa(BaseAgent):
         Args:
             message: The user's message to process
             context: Optional additional context
+            session_id: The conversation the message belongs to
             
         Returns:
             The agent's response as a string
         """
-        # Create a new agent instance for this interaction
-        agent = self._create_agent()
-        
-        # Process the message with the agent
-        response = await agent.ainvoke({
-            "input": message,
-            "chat_history": self.memory
-        })
+        # Parse only the new message and merge it into what this session already told us
+        known = self.session_preferences.get(session_id, PreferenceDelta())
+        preferences = merge_preferences(known, await self._extract_preferences(message, known))
+        self.session_preferences[session_id] = preferences
         
-        # Store the interaction in memory
-        self.add_to_memory("user", message)
-        self.add_to_memory("assistant", response["output"])
-        
-        # Check if we have all necessary information
-        if "all information collected" in response["output"].lower():
+        if preferences != known and conversation_state_for(preferences)["all_info_collected"]:
+            # Everything needed is known (or changed after planning): skip the agent turn and plan the trip
+            travel_preferences = self.get_travel_preferences(session_id)
+            reply = f"Thanks, I have all the information I need for your trip to {travel_preferences.destination}."
+            self.add_to_memory("user", message, session_id)
+            self.add_to_memory("assistant", reply, session_id)
+            
+            if settings.JOBS_OFFLOAD_ITINERARY:
+                # Long generation: let a worker do it and point the client at the job stream
+                job_id = await self.enqueue_itinerary(travel_preferences)
+                return f"{reply}\n\nYour itinerary is being prepared (job {job_id}). Follow its progress at /api/v1/jobs/{job_id}/stream."
+                
             # Generate itinerary
-            itinerary = self._generate_itinerary()
+            itinerary = await self._generate_itinerary(preferences=travel_preferences)
             
             # Combine the response with itinerary
-            final_response = f"{response['output']}\n\nHere's your detailed itinerary:\n{itinerary}\n\nWould you like to save this itinerary or make any adjustments?"
+            final_response = f"{reply}\n\nHere's your detailed itinerary:\n{itinerary}\n\nWould you like to save this itinerary or make any adjustments?"
             return final_response
             
+        # Questions about missing information go to the small model; once everything is
+        # known (follow-ups on the itinerary) the large one answers (MODEL_PHASES)
+        phase = "itinerary" if conversation_state_for(preferences)["all_info_collected"] else "gathering"
+        
+        # Process the message with the agent, telling it which questions are left
+        chat_history = await self.get_context_window(session_id)
+        collection_state = self._collection_state_prompt(preferences)
+        response = await self.run_agent(
+            phase,
+            {
+                "input": message,
+                "chat_history": chat_history,
+                "collection_state": collection_state
+            },
+            self.system_prompt, collection_state, message, *(m["content"] for m in chat_history)
+        )
+        
+        # Store the interaction in memory
+        self.add_to_memory("user", message, session_id)
+        self.add_to_memory("assistant", response["output"], session_id)
+        
         return response["output"]
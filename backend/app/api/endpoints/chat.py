@@ -1,26 +1,129 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+import logging
+import time
+import uuid
+from collections import Counter
+from fastapi import APIRouter, Depends, Header, HTTPException
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List, Dict
-from openai import OpenAI
-from app.core.ai_config import ai_config
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import TYPE_CHECKING, AsyncIterator, Optional, List, Dict, Literal, Set, Tuple
+import httpx
+from app.core.config import settings
+from app.core.database import get_async_db
+from app.core.metrics import (
+    chat_stream_duration_seconds,
+    chat_streams_in_flight,
+    chat_ttft_seconds,
+    llm_tokens_total,
+    upstream_requests_total,
+)
+from app.core.tracing import span, start_span
+from app.models.base import ConversationSession
+from app.schemas.base import ConversationRead
+from app.services.admission import AdmissionRejected, admission
+from app.services.cancellation import TRUNCATED_MARKER, completion_lengths
+from app.services.history import HistoryManager, count_message_tokens, summarize_with_openai
+from app.services.itinerary_stream import ItineraryStreamParser
+from app.services.llm_cache import completion_cache, completion_key, replay_stream
+from app.services.llm_router import openai_endpoint
+from app.services.messages import system_prompts
+from app.services.model_policy import chat_phase, guard_gathering_reply, model_policy
+from app.services.persistence import conversation_writer
+from app.services.session_store import SessionStore, create_session_store
+from app.services.single_flight import SingleFlight
+from app.services.reply_buffer import TERMINAL_EVENTS, ReplyBuffer, ReplyEvent, create_reply_buffer, parse_event_id
+from app.services.sse import SSE_HEADERS, ClosingStreamingResponse, coalesce, format_comment, format_event
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
-client = OpenAI(api_key=ai_config.OPENAI_API_KEY)
 
-chat_history: Dict[str, List[Dict[str, str]]] = {}
+# Shared clients of this worker, created in the application lifespan (open_resources)
+# rather than at import, so that importing the API stays cheap
+client: Optional["AsyncOpenAI"] = None
+session_store: Optional[SessionStore] = None
+history_manager: Optional[HistoryManager] = None
+reply_buffer: Optional[ReplyBuffer] = None
 
-class ChatRequest(BaseModel):
-    message: str
-    session_id: Optional[str] = None
+# Tasks producing SSE replies into the reply buffer, by reply id (kept referenced until they finish)
+_reply_tasks: Dict[str, asyncio.Task] = {}
 
-@router.post("/chat/stream")
-async def chat_stream(request: ChatRequest):
-    try:
-        session_id = request.session_id or "default_session"
-        if session_id not in chat_history:
-            chat_history[session_id] = [
-                {"role": "system", "content": """You are SiteSherpa, a friendly and knowledgeable travel assistant. Your goal is to have a natural conversation with the user to gather all necessary information for creating their perfect travel itinerary.
+# Reply id -> SSE responses of this worker currently reading that reply
+_reply_readers: Counter = Counter()
+
+# Tasks waiting to abandon replies whose readers left (kept referenced until they finish)
+_abandon_watchers: Set[asyncio.Task] = set()
+
+# Upstream streams in flight, shared by identical concurrent requests (LLM_SINGLE_FLIGHT)
+upstream_flights = SingleFlight("chat_stream")
+
+# (session id, message) of the turns being answered by this worker -> number of requests
+turns_in_progress: Counter = Counter()
+
+def _end_turn(turn: Tuple[str, str]) -> None:
+    turns_in_progress[turn] -= 1
+    if turns_in_progress[turn] <= 0:
+        del turns_in_progress[turn]
+        admission.end_turn(turn[0])
+
+def open_resources() -> None:
+    """
+    Create the upstream client, the session store and the history manager.
+    """
+    global client, session_store, history_manager, reply_buffer
+    # Deferred: the OpenAI SDK is one of the slowest imports of the API
+    from openai import AsyncOpenAI
+
+    # Async client so that reading the upstream stream never blocks the event loop.
+    # The read timeout bounds the gap between two chunks, not the whole completion.
+    # With LLM_BACKENDS set, requests go through a router instead of a single endpoint.
+    base_url, http_client = openai_endpoint()
+    client = AsyncOpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        base_url=base_url,
+        timeout=httpx.Timeout(
+            settings.OPENAI_READ_TIMEOUT,
+            connect=settings.OPENAI_CONNECT_TIMEOUT,
+        ),
+        http_client=http_client,
+    )
+
+    # Conversation histories, bounded and optionally shared between workers (see SESSION_STORE_BACKEND)
+    session_store = create_session_store()
+
+    # Streamed replies, resumable after a dropped connection (see REPLY_BUFFER_BACKEND)
+    reply_buffer = create_reply_buffer()
+
+    # Keeps each turn's prompt within HISTORY_MAX_TOKENS by summarizing older turns
+    history_manager = HistoryManager(
+        summarizer=summarize_with_openai(
+            client,
+            model=settings.HISTORY_SUMMARY_MODEL or settings.OPENAI_MODEL,
+            max_tokens=settings.HISTORY_SUMMARY_MAX_TOKENS,
+        ),
+        model=settings.OPENAI_MODEL,
+        max_tokens=settings.HISTORY_MAX_TOKENS,
+        keep_recent=settings.HISTORY_KEEP_RECENT,
+    )
+
+async def close_resources() -> None:
+    """
+    Close the session store, the reply buffer and the upstream connections.
+    """
+    if session_store is not None:
+        await session_store.close()
+    if reply_buffer is not None:
+        await reply_buffer.close()
+    if client is not None:
+        await client.close()
+
+SYSTEM_PROMPT = system_prompts.register("""You are SiteSherpa, a friendly and knowledgeable travel assistant. Your goal is to have a natural conversation with the user to gather all necessary information for creating their perfect travel itinerary.
 
 Follow this conversation flow:
 1. Start with a warm greeting and ask if they have a specific destination in mind.
@@ -89,32 +192,451 @@ TEMPLATE
 - {{activity 2}}
 
 (Repeat “## Day …” blocks as needed.)  
-No HTML. No code‑fences. Do **NOT** drop or reorder the blank lines."""}
-            ]
-        chat_history[session_id].append({"role": "user", "content": request.message})
-
-        response_stream = client.chat.completions.create(
-            model=ai_config.OPENAI_MODEL,
-            messages=chat_history[session_id],
-            temperature=ai_config.OPENAI_TEMPERATURE,
-            max_tokens=ai_config.OPENAI_MAX_TOKENS,
-            stream=True,
+No HTML. No code‑fences. Do **NOT** drop or reorder the blank lines.""")
+
+class ChatRequest(BaseModel):
+    message: str
+    session_id: Optional[str] = None
+    # "raw" streams plain text, "sse" streams text/event-stream frames;
+    # when omitted, SSE is used if the Accept header asks for it
+    stream_format: Optional[Literal["raw", "sse"]] = None
+
+async def _publish_reply(reply_id: str, chunks: AsyncIterator[str], session_id: str) -> None:
+    """
+    Append the chunks of a reply to the reply buffer, each followed by the itinerary
+    events of the lines it completes (STREAM_ITINERARY_EVENTS), then its done or error event.
+    """
+    seq = 0
+    parser = ItineraryStreamParser() if settings.STREAM_ITINERARY_EVENTS else None
+    try:
+        async for chunk in chunks:
+            await reply_buffer.append(reply_id, seq + 1, "message", {"delta": chunk})
+            seq += 1
+            if parser is not None:
+                for event_type, data in parser.feed(chunk):
+                    await reply_buffer.append(reply_id, seq + 1, event_type, data)
+                    seq += 1
+        if parser is not None:
+            for event_type, data in parser.close():
+                await reply_buffer.append(reply_id, seq + 1, event_type, data)
+                seq += 1
+    except asyncio.CancelledError:
+        # Abandoned (see _abandon_reply): end the reply so that a late resume does not wait for it
+        await reply_buffer.append(reply_id, seq + 1, "done", {"session_id": session_id, "truncated": True})
+        raise
+    except Exception as e:
+        # Headers are already sent, so failures are reported in-band
+        await reply_buffer.append(reply_id, seq + 1, "error", {"detail": str(e)})
+        return
+    await reply_buffer.append(reply_id, seq + 1, "done", {"session_id": session_id})
+
+
+async def _reply_events(reply_id: str, after: int, batch: Optional[List[ReplyEvent]] = None):
+    """
+    SSE frames of a buffered reply after sequence number `after`, with heartbeats while
+    it is idle. Event ids are `<reply id>:<seq>`, so Last-Event-ID identifies the reply.
+    """
+    _reply_readers[reply_id] += 1
+    # A reply produced by another worker is leased in the shared buffer, so that
+    # the worker producing it does not abandon it while it is read here
+    reader_id = None if reply_id in _reply_tasks else uuid.uuid4().hex
+    lease_renewed = None
+    try:
+        while True:
+            if reader_id is not None:
+                now = time.monotonic()
+                # Renewed once per heartbeat, lasting two
+                if lease_renewed is None or now - lease_renewed >= settings.SSE_HEARTBEAT_SECONDS:
+                    await reply_buffer.touch_reader(reply_id, reader_id, 2 * settings.SSE_HEARTBEAT_SECONDS)
+                    lease_renewed = now
+            if batch is None:
+                batch = await reply_buffer.read(reply_id, after, timeout=settings.SSE_HEARTBEAT_SECONDS)
+                if batch is None:
+                    yield format_event({"detail": "The reply expired"}, event="error")
+                    return
+            if not batch:
+                # Nothing new: keep the connection open through idle proxies
+                yield format_comment("heartbeat")
+            for seq, event_type, data in batch:
+                after = seq
+                yield format_event(
+                    data,
+                    event=None if event_type == "message" else event_type,
+                    event_id=f"{reply_id}:{seq}",
+                )
+                if event_type in TERMINAL_EVENTS:
+                    return
+            batch = None
+    finally:
+        _reply_readers[reply_id] -= 1
+        if _reply_readers[reply_id] <= 0:
+            del _reply_readers[reply_id]
+            if reply_id in _reply_tasks:
+                # The client went away mid-reply: give it time to resume, then stop generating
+                watcher = asyncio.create_task(_abandon_reply(reply_id))
+                _abandon_watchers.add(watcher)
+                watcher.add_done_callback(_abandon_watchers.discard)
+        if reader_id is not None and lease_renewed is not None:
+            await reply_buffer.release_reader(reply_id, reader_id)
+
+
+async def _abandon_reply(reply_id: str) -> None:
+    """
+    Cancel the production of a reply that nobody has resumed since its client went away,
+    on this worker or, through the reader leases of the reply buffer, on another one.
+    """
+    while True:
+        await asyncio.sleep(settings.REPLY_ABANDON_SECONDS)
+        task = _reply_tasks.get(reply_id)
+        if task is None or _reply_readers[reply_id]:
+            # Finished, or resumed here (the reader starts a new watch when it leaves)
+            return
+        if not await reply_buffer.has_reader(reply_id):
+            task.cancel()
+            return
+
+
+async def _resume_reply(reply_id: str, after: int) -> StreamingResponse:
+    """Stream a buffered reply from after `after`, or 404 if it is unknown or expired."""
+    batch = await reply_buffer.read(reply_id, after, timeout=0)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired reply")
+    return StreamingResponse(
+        _reply_events(reply_id, after, batch),
+        media_type="text/event-stream",
+        headers={**SSE_HEADERS, "X-Reply-ID": reply_id},
+    )
+
+
+@router.post("/chat/stream")
+async def chat_stream(
+    request: ChatRequest,
+    accept: Optional[str] = Header(default=None),
+    last_event_id: Optional[str] = Header(default=None)
+):
+    # A reconnect after a dropped SSE stream resumes the buffered reply: no new turn, no upstream call
+    resume = parse_event_id(last_event_id)
+    if resume is not None:
+        return await _resume_reply(*resume)
+
+    # Requests without a session id get a fresh session instead of sharing one
+    session_id = request.session_id or uuid.uuid4().hex
+    # Checked before the first await, so concurrent copies of a turn (double submits)
+    # are told apart from the original: they are not recorded in the session twice
+    turn = (session_id, request.message)
+    duplicate = turn in turns_in_progress
+    if not duplicate:
+        # One turn in flight per session (429 otherwise); copies of that turn share it
+        admission.begin_turn(session_id)
+    turns_in_progress[turn] += 1
+    turn_open = True
+    reply_started = False
+
+    def release_turn() -> None:
+        # Ended once, by whichever finishes first: the reply, the response or an error
+        nonlocal turn_open
+        if turn_open:
+            turn_open = False
+            _end_turn(turn)
+
+    def release_unstarted_turn() -> None:
+        # A reply that started ends the turn itself, after recording what was sent
+        if not reply_started:
+            release_turn()
+
+    try:
+        with span("session_store.get", "store"):
+            history = await session_store.get(session_id)
+        user_message = {"role": "user", "content": request.message}
+        # A retry of a message still waiting for its reply continues that turn
+        repeated = bool(history) and history[-1] == user_message
+        if history is None:
+            history = [{"role": "system", "content": SYSTEM_PROMPT}]
+            # A known session missing from the hot store (evicted, expired, restart) is reloaded from the archive
+            archived = await conversation_writer.load(session_id) if request.session_id else None
+            history.extend(archived or [])
+            if not duplicate:
+                await session_store.append(session_id, history + [user_message])
+        elif not (repeated or duplicate):
+            await session_store.append(session_id, [user_message])
+        if not repeated:
+            history.append(user_message)
+        if not (repeated or duplicate):
+            # Archived in the background (write-behind), never on the streaming path
+            await conversation_writer.put(session_id, "user", request.message)
+        with span("history.window", "step"):
+            messages = await history_manager.window(session_id, history)
+
+        # Questions go to a small model with a tight max_tokens, the itinerary to the large one (MODEL_PHASES)
+        phase = chat_phase(history)
+        model, max_tokens = model_policy.for_phase(phase)
+
+        # Identical deterministic requests (e.g. the opening exchange) are served from cache
+        cache_key = completion_cache.key(
+            model,
+            settings.OPENAI_TEMPERATURE,
+            messages,
+            max_tokens=max_tokens,
         )
+        cached_reply = await completion_cache.get(cache_key) if cache_key else None
+        source = "upstream" if cached_reply is None else "cache"
+        started = time.perf_counter()
+
+        async def record_reply(full_reply):
+            with span("session_store.append", "store"):
+                await session_store.append(session_id, [{
+                    "role": "assistant",
+                    "content": full_reply
+                }])
+            await conversation_writer.put(session_id, "assistant", full_reply)
+
+        async def record_partial_reply(partial_reply):
+            # Keeps the history consistent with what the user saw; never cached
+            try:
+                await record_reply(partial_reply + TRUNCATED_MARKER)
+            except Exception:
+                logger.warning("Could not record the truncated reply of session %s", session_id, exc_info=True)
+
+        # Set when a gathering reply turned out to be the itinerary and was asked again
+        escalated = False
+
+        async def open_upstream():
+            deltas = await open_phase_upstream(phase)
+            if phase == "gathering":
+                # An itinerary written on a turn classed as gathering is not cut at its max_tokens
+                return guard_gathering_reply(deltas, escalate)
+            return deltas
+
+        async def escalate(gathering_deltas):
+            nonlocal escalated
+            escalated = True
+            await gathering_deltas.aclose()
+            return await open_phase_upstream("itinerary")
+
+        async def open_phase_upstream(call_phase):
+            call_model, call_max_tokens = model_policy.for_phase(call_phase)
+            # Waits for a free upstream slot and the provider rate limits, or raises AdmissionRejected (429)
+            tokens = 0
+            if admission.limits_tokens:
+                tokens = count_message_tokens(messages, call_model) + call_max_tokens
+            with span("admission.acquire", "step"):
+                permit = await admission.acquire("chat_stream", tokens)
+            opened = time.perf_counter()
+            # Ended by upstream_deltas, which outlives this call
+            llm_span = start_span(
+                "llm.chat_stream", "llm", model=call_model, phase=call_phase, max_tokens=call_max_tokens
+            )
+            try:
+                response_stream = await client.chat.completions.create(
+                    model=call_model,
+                    messages=messages,
+                    temperature=settings.OPENAI_TEMPERATURE,
+                    max_tokens=call_max_tokens,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                )
+            except Exception as e:
+                permit.release()
+                upstream_requests_total.labels("chat_stream", "error").inc()
+                llm_span.end(e)
+                raise
+            return upstream_deltas(response_stream, permit, opened, llm_span, call_phase, call_model, call_max_tokens)
+
+        async def upstream_deltas(response_stream, permit, opened, llm_span, call_phase, call_model, call_max_tokens):
+            # Token usage reported in the final chunk of the upstream stream.
+            # Recorded here, once per upstream call, however many requests share it.
+            usage = {}
+            parts = []
+            outcome = "error"
+            try:
+                async for chunk in response_stream:
+                    if chunk.usage is not None:
+                        usage["prompt"] = chunk.usage.prompt_tokens
+                        usage["completion"] = chunk.usage.completion_tokens
+                    if chunk.choices and chunk.choices[0].delta.content is not None:
+                        if not parts:
+                            llm_span.set(ttft_ms=round((time.perf_counter() - opened) * 1000, 3))
+                        parts.append(chunk.choices[0].delta.content)
+                        yield chunk.choices[0].delta.content
+                outcome = "ok"
+            except (asyncio.CancelledError, GeneratorExit):
+                # Every reader went away (raw client disconnected, SSE reply abandoned)
+                outcome = "cancelled"
+                raise
+            finally:
+                # Closing the HTTP response drops the connection, which is what stops
+                # the provider generating (and billing) the rest of an aborted reply
+                await response_stream.close()
+                permit.release(sum(usage.values()) if usage else None)
+                upstream_requests_total.labels("chat_stream", outcome).inc()
+                llm_tokens_total.labels("chat_stream", "prompt").inc(usage.get("prompt", 0))
+                llm_tokens_total.labels("chat_stream", "completion").inc(usage.get("completion", 0))
+                model_policy.record(
+                    call_phase, call_model, time.perf_counter() - opened,
+                    usage.get("prompt", 0), usage.get("completion", 0)
+                )
+                llm_span.set(
+                    outcome=outcome,
+                    prompt_tokens=usage.get("prompt"),
+                    completion_tokens=usage.get("completion", len(parts)),
+                )
+                llm_span.end()
+                if outcome == "ok":
+                    completion_lengths.observe("chat_stream", usage.get("completion", len(parts)))
+                elif outcome == "cancelled":
+                    # One content chunk per token is what the provider streams
+                    completion_lengths.cancelled("chat_stream", len(parts), call_max_tokens)
+                    # An escalated gathering reply is replaced, not truncated
+                    if parts and not duplicate and not (escalated and call_phase == "gathering"):
+                        await record_partial_reply("".join(parts))
 
-        async def event_generator():
+            # Recorded with the upstream stream rather than with this client's response,
+            # so the reply is kept when the client has gone but a duplicate still reads it
+            full_reply = "".join(parts)
+            if not duplicate:
+                await record_reply(full_reply)
+            if cache_key:
+                await completion_cache.set(cache_key, full_reply)
+
+        if cached_reply is not None:
+            deltas = replay_stream(cached_reply)
+        elif settings.LLM_SINGLE_FLIGHT:
+            # Identical requests already in flight (double submits, retries, identical
+            # opening messages) share that upstream stream instead of opening another
+            flight_key = cache_key or completion_key(
+                model,
+                settings.OPENAI_TEMPERATURE,
+                messages,
+                max_tokens=max_tokens,
+            )
+            deltas, leader = await upstream_flights.stream(flight_key, open_upstream)
+            if not leader:
+                source = "coalesced"
+        else:
+            deltas = await open_upstream()
+
+        async def reply_deltas():
+            nonlocal reply_started
+            reply_started = True
             full_reply = ""
-            for chunk in response_stream:
-                if chunk.choices[0].delta.content is not None:
-                    content = chunk.choices[0].delta.content
-                    if content and content.strip():
+            first_token = True
+            chat_streams_in_flight.inc()
+            # The streaming loop of this reply, from the first read to the last delta
+            stream_span = start_span("chat.stream", "step", source=source)
+            try:
+                async for content in deltas:
+                    # Whitespace-only deltas matter too (spaces, markdown blank lines)
+                    if content:
+                        if first_token:
+                            chat_ttft_seconds.labels(source).observe(time.perf_counter() - started)
+                            stream_span.set(ttft_ms=round((time.perf_counter() - started) * 1000, 3))
+                            first_token = False
                         full_reply += content
                         yield content
+            except (asyncio.CancelledError, GeneratorExit):
+                # Upstream replies are recorded by upstream_deltas, and a duplicate's by the original request
+                if source != "upstream" and not duplicate and full_reply:
+                    await record_partial_reply(full_reply)
+                raise
+            finally:
+                # Recorded once per reply so the per-token loop stays allocation free
+                chat_streams_in_flight.dec()
+                release_turn()
+                chat_stream_duration_seconds.labels(source).observe(time.perf_counter() - started)
+                stream_span.set(characters=len(full_reply))
+                stream_span.end()
             
-            chat_history[session_id].append({
-                "role": "assistant",
-                "content": full_reply
-            })
+            # Upstream replies are recorded by upstream_deltas, and a duplicate's by the original request
+            if source != "upstream" and not duplicate:
+                await record_reply(full_reply)
+
+        # Batch deltas into larger writes (STREAM_COALESCE_MS / STREAM_COALESCE_BYTES)
+        use_sse = request.stream_format == "sse" or (
+            request.stream_format is None and "text/event-stream" in (accept or "")
+        )
+        chunks = coalesce(
+            reply_deltas(),
+            max_delay=settings.STREAM_COALESCE_MS / 1000,
+            max_bytes=settings.STREAM_COALESCE_BYTES,
+        )
 
-        return StreamingResponse(event_generator(), media_type="text/plain")
+        if use_sse:
+            # The reply is produced into the reply buffer independently of this connection,
+            # so that a client that drops can resume it with Last-Event-ID
+            reply_id = uuid.uuid4().hex
+            await reply_buffer.append(reply_id, 0, "start", {"session_id": session_id})
+            task = asyncio.create_task(_publish_reply(reply_id, chunks, session_id))
+            _reply_tasks[reply_id] = task
+            task.add_done_callback(lambda _: _reply_tasks.pop(reply_id, None))
+            # Ends the turn if the task is cancelled before it reads the reply
+            task.add_done_callback(lambda _: release_unstarted_turn())
+            return StreamingResponse(
+                _reply_events(reply_id, 0),
+                media_type="text/event-stream",
+                headers={**SSE_HEADERS, "X-Session-ID": session_id, "X-Reply-ID": reply_id},
+            )
+        # Ends the turn if the client leaves before the body is started
+        return ClosingStreamingResponse(
+            chunks,
+            media_type="text/plain",
+            headers={"X-Session-ID": session_id},
+            on_close=release_unstarted_turn,
+        )
+    except AdmissionRejected:
+        release_turn()
+        raise
     except Exception as e:
+        release_turn()
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/chat/replies/{reply_id}/stream")
+async def resume_reply(reply_id: str, last_event_id: Optional[str] = Header(default=None)):
+    """
+    Stream a buffered reply (its id is sent in X-Reply-ID) from the start, or after
+    the Last-Event-ID a reconnecting EventSource sends.
+    """
+    resume = parse_event_id(last_event_id)
+    return await _resume_reply(reply_id, resume[1] if resume and resume[0] == reply_id else 0)
+
+
+@router.get("/chat/sessions/stats")
+async def session_stats():
+    """
+    Counters of the session store (resident sessions, memory, evictions).
+    """
+    return await session_store.stats()
+
+
+@router.get("/chat/cache/stats")
+async def cache_stats():
+    """
+    Counters of the completion cache (entries, hits per tier, misses, evictions).
+    """
+    return completion_cache.stats()
+
+
+@router.get("/chat/models/stats")
+async def model_stats():
+    """
+    Model, calls, average latency, tokens and cost of each conversation phase.
+    """
+    return model_policy.stats()
+
+
+@router.get("/chat/sessions/{session_id}/transcript", response_model=ConversationRead)
+async def session_transcript(session_id: str, db: AsyncSession = Depends(get_async_db)):
+    """
+    Archived conversation of a session (requires PERSISTENCE_ENABLED).
+    Messages still waiting in the write-behind queue are not included yet.
+    """
+    if not settings.PERSISTENCE_ENABLED:
+        raise HTTPException(status_code=404, detail="Conversation persistence is disabled")
+    session = (await db.execute(
+        select(ConversationSession)
+        .where(ConversationSession.id == session_id)
+        .options(selectinload(ConversationSession.messages))
+    )).scalar_one_or_none()
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown session")
+    return session
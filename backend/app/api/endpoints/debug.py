@@ -0,0 +1,37 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+from app.core.tracing import tracer
+
+router = APIRouter()
+
+@router.get("/debug/traces")
+async def list_traces(limit: int = 50, min_ms: float = 0.0):
+    """
+    Recent traces of this worker, latest first (TRACE_MAX_TRACES are kept).
+
+    Args:
+        limit: Maximum traces returned
+        min_ms: Leave out requests faster than this
+    """
+    return [trace.summary() for trace in tracer.recent(limit, min_ms / 1000)]
+
+@router.get("/debug/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """
+    The spans of a trace (its id is sent in X-Trace-ID), by start time.
+    """
+    trace = tracer.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Unknown or evicted trace")
+    return trace.to_dict()
+
+@router.get("/debug/traces/{trace_id}/profile", response_class=PlainTextResponse)
+async def get_profile(trace_id: str):
+    """
+    Sampled stacks of a request sent with X-Profile: 1, in collapsed format
+    (flamegraph.pl, speedscope).
+    """
+    trace = tracer.get(trace_id)
+    if trace is None or trace.profile is None:
+        raise HTTPException(status_code=404, detail="No profile for this trace")
+    return PlainTextResponse(trace.profile)
@@ -0,0 +1,93 @@
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from app.core.config import settings
+from app.schemas.base import TravelPreferences
+from app.services.job_stream import FINISHED_STATUSES, TERMINAL_EVENTS, JobStreamStore, create_job_stream_store
+from app.services.jobs import enqueue, generate_booking_schema_task, generate_itinerary_task
+from app.services.sse import SSE_HEADERS, format_comment, format_event
+
+router = APIRouter()
+
+# Progress of background jobs, published by the Celery workers (see JOB_STREAM_BACKEND);
+# created in the application lifespan
+job_stream: Optional[JobStreamStore] = None
+
+def open_resources() -> None:
+    """
+    Create the job stream store read by the job endpoints.
+    """
+    global job_stream
+    job_stream = create_job_stream_store()
+
+async def close_resources() -> None:
+    """
+    Close the job stream store.
+    """
+    if job_stream is not None:
+        await job_stream.close()
+
+def _job_links(job_id: str) -> dict:
+    return {
+        "job_id": job_id,
+        "status_url": f"/api/v1/jobs/{job_id}",
+        "stream_url": f"/api/v1/jobs/{job_id}/stream",
+    }
+
+@router.post("/jobs/itinerary", status_code=202)
+async def create_itinerary_job(preferences: TravelPreferences):
+    """
+    Queue the generation of a day-by-day itinerary. The days are streamed
+    from the job's stream_url as they are generated.
+    """
+    job_id = await enqueue(generate_itinerary_task, (preferences.model_dump(mode="json"),), job_stream)
+    return _job_links(job_id)
+
+@router.post("/jobs/booking-schema", status_code=202)
+async def create_booking_schema_job(preferences: TravelPreferences):
+    """
+    Queue the generation of the booking schema handed to the Concierge agent.
+    """
+    job_id = await enqueue(generate_booking_schema_task, (preferences.model_dump(mode="json"),), job_stream)
+    return _job_links(job_id)
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    status = await job_stream.get_status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return {"job_id": job_id, **status}
+
+@router.get("/jobs/{job_id}/stream")
+async def stream_job(job_id: str, last_event_id: Optional[str] = Header(None)):
+    """
+    Stream the events of a job as Server-Sent Events until it is done or fails.
+    A reconnecting client resumes after the Last-Event-ID it sends.
+    """
+    if await job_stream.get_status(job_id) is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+
+    async def events():
+        after = last_event_id
+        finished = False
+        while True:
+            batch = await job_stream.read(job_id, after, timeout=settings.SSE_HEARTBEAT_SECONDS)
+            if not batch:
+                # A job that expired, or finished without its terminal event (a worker died,
+                # a task was lost), would otherwise get heartbeats forever
+                status = await job_stream.get_status(job_id)
+                if status is None or (finished and status.get("status") in FINISHED_STATUSES):
+                    yield format_event({"detail": "The job was lost or expired before it finished"}, event="error")
+                    return
+                # The final status is set just before the terminal event: that gets one more read
+                finished = status.get("status") in FINISHED_STATUSES
+                # Nothing new: keep the connection open through idle proxies
+                yield format_comment("heartbeat")
+                continue
+            for event_id, event_type, data in batch:
+                after = event_id
+                yield format_event(data, event=event_type, event_id=event_id)
+                if event_type in TERMINAL_EVENTS:
+                    return
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -0,0 +1,89 @@
+import logging
+import uuid
+from typing import TYPE_CHECKING, Optional
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from app.schemas.base import TravelPreferences
+from app.services.admission import admission
+from app.services.sse import SSE_HEADERS, ClosingStreamingResponse, format_event
+
+if TYPE_CHECKING:
+    from app.agents.pipeline import BookingPipeline
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Built on the first pipeline request: it loads the agents, which workers that
+# only serve chat never need
+_pipeline: Optional["BookingPipeline"] = None
+
+def get_pipeline() -> "BookingPipeline":
+    global _pipeline
+    if _pipeline is None:
+        from app.agents.pipeline import create_booking_pipeline
+        _pipeline = create_booking_pipeline()
+    return _pipeline
+
+class PipelineRunRequest(BaseModel):
+    run_id: Optional[str] = None  # Run to resume or replay; a new run gets one
+    preferences: Optional[TravelPreferences] = None  # Required to start a run
+    message: Optional[str] = None  # Booking request passed to Concierge
+
+@router.post("/pipeline/runs")
+async def run_pipeline(request: PipelineRunRequest):
+    """
+    Run the SiteSherpa -> Concierge booking pipeline, streaming its events as
+    Server-Sent Events: "run" (its id), "resumed", "token" (LLM tokens, with
+    the node producing them), "node" (a completed node and its output), then
+    "done" with the final state, or "error".
+
+    Posting again with the run_id of an unfinished run (error, disconnect,
+    worker restart) resumes it after its last completed node; a finished run
+    is replayed without calling the LLM again.
+    """
+    pipeline = get_pipeline()
+    run_id = request.run_id or str(uuid.uuid4())
+    if request.preferences is None and await pipeline.get_run(run_id) is None:
+        raise HTTPException(status_code=404, detail="Unknown pipeline run; send preferences to start one")
+
+    # One execution of a run at a time (429 otherwise): two would both write its checkpoints
+    turn = f"pipeline:{run_id}"
+    admission.begin_turn(turn)
+    started = False
+
+    async def events():
+        nonlocal started
+        started = True
+        try:
+            yield format_event({"run_id": run_id}, event="run")
+            async for event, data in pipeline.stream(run_id, request.preferences, request.message):
+                yield format_event(data, event=event)
+        except Exception as e:
+            logger.exception("Pipeline run %s failed", run_id)
+            # The checkpoints of the completed nodes are kept: posting the run_id again resumes
+            yield format_event({"run_id": run_id, "detail": str(e)}, event="error")
+        finally:
+            admission.end_turn(turn)
+
+    def release_unstarted_run() -> None:
+        # A run that started ends its turn itself, once its stream is closed
+        if not started:
+            admission.end_turn(turn)
+
+    # Ends the turn if the client leaves before the body is started
+    return ClosingStreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={**SSE_HEADERS, "X-Run-ID": run_id},
+        on_close=release_unstarted_run,
+    )
+
+@router.get("/pipeline/runs/{run_id}")
+async def get_pipeline_run(run_id: str):
+    """
+    State of a pipeline run: nodes completed and to come, and their outputs.
+    """
+    run = await get_pipeline().get_run(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Unknown pipeline run")
+    return run
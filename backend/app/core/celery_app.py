@@ -0,0 +1,27 @@
+"""
+Celery application for background jobs (itinerary and booking-schema generation).
+
+Start a worker with:
+    celery -A app.core.celery_app worker --loglevel=info
+"""
+
+from celery import Celery
+
+from app.core.config import settings
+
+# Create the Celery application; task modules are imported by the worker via `include`
+celery_app = Celery(
+    "triphelix",
+    broker=settings.CELERY_BROKER_URL,
+    backend=settings.CELERY_RESULT_BACKEND,
+    include=["app.services.jobs"],
+)
+
+celery_app.conf.update(
+    task_serializer="json",
+    result_serializer="json",
+    accept_content=["json"],
+    task_acks_late=True,  # Re-deliver a job if its worker dies mid-way
+    worker_prefetch_multiplier=1,  # Long jobs: do not let one worker hoard queued jobs
+    result_expires=settings.JOB_STREAM_TTL_SECONDS,
+)
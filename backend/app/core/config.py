@@ -1,6 +1,7 @@
 # Import necessary components from pydantic_settings for configuration management
+from functools import lru_cache
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 class Settings(BaseSettings):
     """
@@ -18,14 +19,130 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str = "postgres"  # PostgreSQL password
     POSTGRES_DB: str = "triphelix"  # PostgreSQL database name
     SQLALCHEMY_DATABASE_URI: Optional[str] = None  # Will be constructed if not provided
+    SQLALCHEMY_ASYNC_DATABASE_URI: Optional[str] = None  # Derived from SQLALCHEMY_DATABASE_URI if not provided (asyncpg / aiosqlite)
+    DB_POOL_SIZE: int = 10  # Connections kept open per worker
+    DB_MAX_OVERFLOW: int = 20  # Extra connections opened under load, closed when returned
+    DB_POOL_TIMEOUT: float = 30.0  # Maximum wait for a free connection before failing
+    DB_POOL_RECYCLE: int = 1800  # Reconnect connections older than this (seconds), before server-side timeouts
+    DB_POOL_PRE_PING: bool = True  # Check connections on checkout so that dropped ones are replaced transparently
+    DB_ECHO: bool = False  # Log SQL statements
     
     # Redis Settings
     REDIS_HOST: str = "localhost"  # Redis server hostname
     REDIS_PORT: int = 6379  # Redis server port
     
+    # Session Store Settings
+    SESSION_STORE_BACKEND: str = "memory"  # "memory" (per worker) or "redis" (shared by all workers)
+    SESSION_MAX_SESSIONS: int = 10000  # Maximum sessions kept by the in-memory store before LRU eviction
+    SESSION_TTL_SECONDS: int = 7200  # Idle time after which a session expires
+    
+    # Conversation Persistence Settings
+    PERSISTENCE_ENABLED: bool = False  # Archive conversations to the database (write-behind) and rehydrate them on store misses
+    PERSISTENCE_BATCH_SIZE: int = 200  # Maximum messages written per batch
+    PERSISTENCE_FLUSH_INTERVAL_SECONDS: float = 1.0  # Maximum time a queued message waits before its batch is written
+    PERSISTENCE_MAX_PENDING: int = 10000  # Queued messages before writers are made to wait (backpressure)
+    PERSISTENCE_CREATE_TABLES: bool = True  # Create the conversation tables at startup if they are missing
+    
+    # Background Job Settings
+    CELERY_BROKER_URL: Optional[str] = None  # Will be constructed from the Redis settings if not provided
+    CELERY_RESULT_BACKEND: Optional[str] = None  # Will be constructed from the Redis settings if not provided
+    CELERY_TASK_ALWAYS_EAGER: bool = False  # Run jobs in-process (local development and tests, no worker needed)
+    JOB_STREAM_BACKEND: str = "redis"  # Where workers publish job progress: "redis" (streams) or "memory" (same process only)
+    JOB_STREAM_TTL_SECONDS: int = 3600  # How long job progress is kept after the last update
+    JOBS_OFFLOAD_ITINERARY: bool = False  # SiteSherpa hands itinerary generation to a Celery worker
+    
+    # Booking Pipeline Settings
+    PIPELINE_CHECKPOINT_BACKEND: str = "memory"  # Where pipeline runs are checkpointed after each node: "memory" (per worker) or "database" (SQLALCHEMY_ASYNC_DATABASE_URI, SQLite or Postgres)
+    
     # AI Settings
-    OPENAI_API_KEY: Optional[str] = None  # OpenAI API key for GPT models
-    LANGCHAIN_API_KEY: Optional[str] = None  # LangChain API key for additional features
+    OPENAI_API_KEY: str = "your_openai_api_key"  # OpenAI API key for GPT models
+    OPENAI_MODEL: str = "gpt-4o"  # OpenAI model to use
+    OPENAI_TEMPERATURE: float = 0.7  # Temperature for AI responses (0.0 to 1.0)
+    OPENAI_MAX_TOKENS: int = 2000  # Maximum tokens in AI responses
+    OPENAI_BASE_URL: Optional[str] = None  # Override the OpenAI endpoint (e.g. a local fake upstream)
+    OPENAI_CONNECT_TIMEOUT: float = 5.0  # Seconds allowed to open a connection to the upstream
+    OPENAI_READ_TIMEOUT: float = 60.0  # Seconds allowed between two chunks of a streamed response
+    LLM_BACKENDS: List[Dict[str, str]] = []  # OpenAI-compatible backends to route between, as JSON [{"name", "base_url", "api_key", "model"}]; empty: OPENAI_BASE_URL only
+    LLM_BACKEND_COOLDOWN_SECONDS: float = 10.0  # Time a routed backend is skipped after a failure, unless no other is left
+    LLM_HEDGE: bool = False  # Also send a streamed completion to the next backend when the first is late to its first token
+    LLM_HEDGE_QUANTILE: float = 0.95  # A backend is late once past this quantile of its recent times to first token
+    LLM_HEDGE_MIN_DELAY_SECONDS: float = 0.1  # Never hedge before this delay
+    LANGCHAIN_API_KEY: str = "your_langchain_api_key"  # LangChain API key for additional features
+    AGENT_VERBOSE: bool = False  # Log every agent executor step (debugging only)
+    
+    # Model Routing Settings
+    MODEL_PHASES: Dict[str, Dict[str, Any]] = {
+        "gathering": {"model": "gpt-4o-mini", "max_tokens": 300},
+        "extraction": {"model": "gpt-4o-mini", "max_tokens": 300},
+    }  # Model and max_tokens per conversation phase (gathering, extraction, itinerary, booking); phases left out use OPENAI_MODEL and OPENAI_MAX_TOKENS
+    MODEL_PRICES: Dict[str, List[float]] = {
+        "gpt-4o": [2.5, 10.0],
+        "gpt-4o-mini": [0.15, 0.6],
+    }  # USD per million prompt and completion tokens of each model, for the per-phase cost metrics
+    
+    # Admission Control Settings (per worker)
+    ADMISSION_MAX_CONCURRENT: int = 64  # Upstream LLM calls allowed at once
+    ADMISSION_MAX_QUEUE: int = 256  # Calls allowed to wait for a slot; beyond that requests get a 429 at once
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 10.0  # Longest a call waits for a slot or for the rate limits before a 429
+    ADMISSION_RETRY_AFTER_SECONDS: float = 2.0  # Retry-After sent when the queue is full or timed out
+    PROVIDER_RPM: int = 0  # Provider requests-per-minute limit shared out to this worker (0: unlimited)
+    PROVIDER_TPM: int = 0  # Provider tokens-per-minute limit shared out to this worker (0: unlimited)
+    
+    # Streaming Settings
+    STREAM_COALESCE_MS: float = 20.0  # Maximum time a streamed delta is held back to batch it with others
+    STREAM_COALESCE_BYTES: int = 256  # Batched deltas are flushed as soon as they reach this size
+    STREAM_ITINERARY_EVENTS: bool = True  # Send the structure of streamed itineraries as SSE events (day_started, slot_started, activity, day_complete) next to the text
+    SSE_HEARTBEAT_SECONDS: float = 15.0  # Idle time after which an SSE heartbeat comment is sent
+    REPLY_BUFFER_BACKEND: str = "memory"  # Where SSE replies are buffered for resumption: "memory" (same worker) or "redis" (any worker)
+    REPLY_BUFFER_TTL_SECONDS: int = 300  # How long a reply can be resumed after its last chunk
+    REPLY_BUFFER_MAX_REPLIES: int = 1000  # Replies kept in the in-process tier
+    REPLY_ABANDON_SECONDS: float = 10.0  # How long an SSE reply keeps generating without a reader (waiting for a resume) before its upstream call is aborted
+    HEALTH_CHECK_UPSTREAM: bool = True  # Include the upstream in the /health readiness check
+    
+    # Itinerary Generation Settings
+    ITINERARY_PARALLEL: bool = False  # Plan a skeleton, then generate the days concurrently
+    ITINERARY_MAX_CONCURRENCY: int = 4  # Maximum days generated at once in parallel mode
+    
+    # Conversation History Settings
+    HISTORY_MAX_TOKENS: int = 6000  # Token budget of the history sent on each turn
+    HISTORY_KEEP_RECENT: int = 6  # Minimum number of recent messages always sent verbatim
+    HISTORY_SUMMARY_MODEL: Optional[str] = None  # Model used for rolling summaries (defaults to OPENAI_MODEL)
+    HISTORY_SUMMARY_MAX_TOKENS: int = 400  # Maximum length of a rolling summary
+    
+    # Agent Tool Settings
+    TOOL_TIMEOUT_SECONDS: float = 20.0  # Time limit of an agent tool call; a call that exceeds it returns an error to the model
+    TOOL_TIMEOUTS: Dict[str, float] = {}  # Time limits of specific tools, by tool name
+    TOOL_CACHE_TTLS: Dict[str, float] = {
+        "search_flights": 300.0,
+        "search_hotels": 900.0,
+        "search_transfers": 900.0,
+        "search_activities": 3600.0,
+    }  # Idempotent lookup tools whose results are cached, and for how many seconds; other tools always run
+    TOOL_CACHE_MAX_ENTRIES: int = 4096  # Tool results kept in the cache
+    
+    # Completion Cache Settings
+    LLM_CACHE_MAX_ENTRIES: int = 2048  # Completions kept in the per-process cache tier
+    LLM_CACHE_TTL_SECONDS: int = 3600  # Lifetime of a cached completion
+    LLM_CACHE_MAX_TEMPERATURE: float = 0.0  # Only cache calls at or below this temperature
+    LLM_CACHE_MAX_ENTRY_BYTES: int = 65536  # Larger completions are not cached
+    LLM_CACHE_REDIS: bool = False  # Add a Redis tier shared by all workers
+    LLM_SINGLE_FLIGHT: bool = True  # Identical concurrent chat requests share one upstream stream
+    
+    # Tracing Settings (per worker)
+    TRACING_ENABLED: bool = False  # Record spans of requests (agent steps, LLM calls, tools, store, database)
+    TRACE_DEBUG_ENDPOINTS: bool = False  # Serve recent traces and profiles at /api/v1/debug/traces (unauthenticated: private deployments only)
+    TRACE_SAMPLE_RATE: float = 1.0  # Fraction of requests traced
+    TRACE_MAX_TRACES: int = 200  # Recent traces kept in memory
+    TRACE_MAX_SPANS: int = 500  # Spans kept per trace
+    TRACE_EXPORT_PATH: Optional[str] = None  # Also append finished spans to this file, as JSON lines
+    TRACE_EXCLUDE_PATHS: List[str] = ["/health", "/metrics", "/api/v1/debug"]  # Path prefixes never traced
+    PROFILER_ENABLED: bool = False  # Profile requests sent with the X-Profile: 1 header (sampling the event loop thread)
+    PROFILER_INTERVAL_MS: float = 5.0  # Time between two stack samples
+    PROFILER_MIN_SECONDS: float = 0.0  # Profiles of requests faster than this are dropped
+    
+    # Security Settings
+    SECRET_KEY: str = "your_secret_key"  # Secret key for JWT tokens
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30  # JWT token expiration time in minutes
     
     class Config:
         """
@@ -46,6 +163,30 @@ class Settings(BaseSettings):
                 f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}"
                 f"@{self.POSTGRES_SERVER}/{self.POSTGRES_DB}"
             )
+        if not self.SQLALCHEMY_ASYNC_DATABASE_URI:
+            # Same database through the async drivers
+            self.SQLALCHEMY_ASYNC_DATABASE_URI = (
+                self.SQLALCHEMY_DATABASE_URI
+                .replace("postgresql://", "postgresql+asyncpg://", 1)
+                .replace("postgresql+psycopg2://", "postgresql+asyncpg://", 1)
+                .replace("sqlite://", "sqlite+aiosqlite://", 1)
+            )
+        if self.CELERY_TASK_ALWAYS_EAGER:
+            # Local mode: no broker process, jobs run in the API process
+            self.CELERY_BROKER_URL = self.CELERY_BROKER_URL or "memory://"
+            self.CELERY_RESULT_BACKEND = self.CELERY_RESULT_BACKEND or "cache+memory://"
+        if not self.CELERY_BROKER_URL:
+            self.CELERY_BROKER_URL = f"redis://{self.REDIS_HOST}:{self.REDIS_PORT}/0"
+        if not self.CELERY_RESULT_BACKEND:
+            self.CELERY_RESULT_BACKEND = f"redis://{self.REDIS_HOST}:{self.REDIS_PORT}/1"
+
+@lru_cache
+def get_settings() -> Settings:
+    """
+    Settings of this process, read from the environment and .env once.
+    Every module (and FastAPI dependencies) share this one instance.
+    """
+    return Settings()
 
 # Create a global settings instance
-settings = Settings()
+settings = get_settings()
@@ -1,13 +1,26 @@
 # Import SQLAlchemy components for database management
-from sqlalchemy import create_engine
+import time
+from typing import AsyncIterator, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
 
 # Import application settings
 from app.core.config import settings
+from app.core.metrics import (
+    db_pool_checkout_timeouts_total,
+    db_pool_checkout_wait_seconds,
+    db_pool_connections_idle,
+    db_pool_connections_in_use,
+)
+from app.core.tracing import start_span
 
 # Create SQLAlchemy engine with PostgreSQL connection
 # The engine manages the connection pool and database connections
+# Synchronous: for scripts and migrations only, async routes use get_async_db
 engine = create_engine(settings.SQLALCHEMY_DATABASE_URI)
 
 # Create a session factory
@@ -38,3 +51,115 @@ def get_db():
         yield db  # Provide the database session to the route
     finally:
         db.close()  # Ensure the session is closed after use
+
+class ObservedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Connection pool recording how long each checkout waited for a connection
+    (including opening a new one) and how many checkouts timed out.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            db_pool_checkout_timeouts_total.inc()
+            raise
+        finally:
+            db_pool_checkout_wait_seconds.observe(time.perf_counter() - start)
+
+# Async engine and session factory, created on first use so that importing this
+# module needs neither the async driver nor a reachable database
+_async_engine: Optional[AsyncEngine] = None
+_async_sessionmaker: Optional[async_sessionmaker] = None
+
+def _pool_options(url: str) -> dict:
+    """
+    Pool settings for the async engine.
+    An in-memory SQLite database only exists on its one connection, so it gets a static pool.
+    """
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/").endswith(":")):
+        return {"poolclass": StaticPool}
+    return {
+        "poolclass": ObservedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,  # Connections kept open
+        "max_overflow": settings.DB_MAX_OVERFLOW,  # Extra connections under load
+        "pool_timeout": settings.DB_POOL_TIMEOUT,  # Wait for a free connection before failing
+        "pool_recycle": settings.DB_POOL_RECYCLE,  # Replace old connections before the server drops them
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,  # Replace connections that died while idle
+    }
+
+def _trace_statements(engine: AsyncEngine) -> None:
+    """
+    Record a span for every statement run by a traced request (see app/core/tracing.py).
+    """
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_execute(connection, cursor, statement, parameters, context, executemany):
+        context._trace_span = start_span("db.query", "db", statement=statement[:200], executemany=executemany)
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_execute(connection, cursor, statement, parameters, context, executemany):
+        context._trace_span.end()
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def execute_failed(exception_context):
+        trace_span = getattr(exception_context.execution_context, "_trace_span", None)
+        if trace_span is not None:
+            trace_span.end(exception_context.original_exception)
+
+def get_async_engine() -> AsyncEngine:
+    """
+    Get the async engine of this process, creating it on first use.
+    
+    Returns:
+        The engine for SQLALCHEMY_ASYNC_DATABASE_URI
+    """
+    global _async_engine
+    if _async_engine is None:
+        url = settings.SQLALCHEMY_ASYNC_DATABASE_URI
+        _async_engine = create_async_engine(url, echo=settings.DB_ECHO, **_pool_options(url))
+        pool = _async_engine.pool
+        # Pool occupancy, read at scrape time (static pools do not track it)
+        if hasattr(pool, "checkedout"):
+            db_pool_connections_in_use.set_function(pool.checkedout)
+            db_pool_connections_idle.set_function(pool.checkedin)
+        if settings.TRACING_ENABLED:
+            _trace_statements(_async_engine)
+    return _async_engine
+
+def get_async_sessionmaker() -> async_sessionmaker:
+    """
+    Get the factory of async sessions bound to the async engine.
+    """
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        _async_sessionmaker = async_sessionmaker(
+            get_async_engine(),
+            autoflush=False,  # Don't automatically flush changes
+            expire_on_commit=False  # Keep loaded objects usable after commit without another query
+        )
+    return _async_sessionmaker
+
+# Async database dependency for FastAPI
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """
+    Async generator that yields database sessions, for async routes.
+    A connection is only taken from the pool when the session first runs a query.
+    
+    Usage:
+    @app.get("/items")
+    async def get_items(db: AsyncSession = Depends(get_async_db)):
+        return (await db.execute(select(Item))).scalars().all()
+    """
+    async with get_async_sessionmaker()() as session:
+        yield session  # The session is closed and its connection returned on exit
+
+async def dispose_async_engine() -> None:
+    """
+    Close the pooled connections of the async engine, if it was created.
+    """
+    global _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _async_sessionmaker = None
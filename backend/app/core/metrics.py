@@ -0,0 +1,400 @@
+"""
+Minimal Prometheus-style metrics registry.
+
+Counters, gauges and histograms are plain Python objects updated in place, so
+recording a value is a dictionary lookup and an addition. Callers on hot paths
+(e.g. token streaming) accumulate locally and record once per request rather
+than once per token. `registry.render()` produces the Prometheus text format
+served at /metrics.
+"""
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Default histogram buckets, in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+DURATION_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # One slot per bucket plus the +Inf bucket; counts are not cumulative
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class _Metric:
+    """Base class of a metric family with optional labels."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._default = self._new_child()
+            self._children[()] = self._default
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """
+        Return the child metric for the given label values, creating it on first use.
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing value."""
+
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+    def set_total(self, value: float, *labelvalues: str) -> None:
+        """
+        Mirror a running total kept by another component (e.g. Redis eviction counts).
+        """
+        self.labels(*labelvalues).value = value
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+            for values, child in self._children.items()
+        ]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, or be computed at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._function: Optional[Callable[[], float]] = None
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default.dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """
+        Compute the (unlabelled) value by calling `function` at scrape time.
+        """
+        self._function = function
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            self._default.set(self._function())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+            for values, child in self._children.items()
+        ]
+
+
+class Histogram(_Metric):
+    """Distribution of observations in fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def samples(self) -> List[str]:
+        lines = []
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), child.counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, values, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Collection of metrics rendered together at /metrics.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+        """
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+# Global registry served at /metrics
+registry = MetricsRegistry()
+
+# Chat streaming
+chat_ttft_seconds = registry.histogram(
+    "triphelix_chat_ttft_seconds", "Time from request to first streamed token", ["source"]
+)
+chat_stream_duration_seconds = registry.histogram(
+    "triphelix_chat_stream_duration_seconds", "Duration of a streamed chat reply", ["source"],
+    buckets=DURATION_BUCKETS
+)
+chat_streams_in_flight = registry.gauge(
+    "triphelix_chat_streams_in_flight", "Chat replies currently being streamed"
+)
+
+# Upstream LLM calls
+upstream_requests_total = registry.counter(
+    "triphelix_upstream_requests_total", "Upstream LLM requests by caller and outcome", ["caller", "outcome"]
+)
+llm_tokens_total = registry.counter(
+    "triphelix_llm_tokens_total", "Prompt and completion tokens used, by caller", ["caller", "kind"]
+)
+llm_backend_requests_total = registry.counter(
+    "triphelix_llm_backend_requests_total",
+    "Requests sent to each routed LLM backend, by outcome (ok, error, cancelled)", ["backend", "outcome"]
+)
+llm_backend_ttft_seconds = registry.histogram(
+    "triphelix_llm_backend_ttft_seconds",
+    "Time to the first response chunk of a routed LLM backend, for streamed and complete responses",
+    ["backend", "kind"]
+)
+llm_hedges_total = registry.counter(
+    "triphelix_llm_hedges_total", "Hedged LLM requests, by the request that answered first", ["winner"]
+)
+llm_phase_requests_total = registry.counter(
+    "triphelix_llm_phase_requests_total", "LLM calls by conversation phase and model", ["phase", "model"]
+)
+llm_phase_seconds = registry.histogram(
+    "triphelix_llm_phase_seconds", "Duration of LLM calls by conversation phase", ["phase"],
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+)
+llm_phase_cost_usd_total = registry.counter(
+    "triphelix_llm_phase_cost_usd_total", "Estimated LLM cost in USD (MODEL_PRICES) by conversation phase and model",
+    ["phase", "model"]
+)
+upstream_cancelled_total = registry.counter(
+    "triphelix_upstream_cancelled_total", "Upstream LLM calls aborted because their client went away", ["caller"]
+)
+upstream_cancelled_tokens_saved_total = registry.counter(
+    "triphelix_upstream_cancelled_tokens_saved_total",
+    "Estimated completion tokens not generated thanks to aborted upstream calls", ["caller"]
+)
+upstream_slots_in_use = registry.gauge(
+    "triphelix_upstream_slots_in_use", "Upstream LLM calls holding an admission slot"
+)
+admission_queue_depth = registry.gauge(
+    "triphelix_admission_queue_depth", "Upstream LLM calls waiting for admission (slot or rate limit)"
+)
+admission_wait_seconds = registry.histogram(
+    "triphelix_admission_wait_seconds", "Time spent waiting for admission, by caller", ["caller"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+admission_rejections_total = registry.counter(
+    "triphelix_admission_rejections_total", "Requests rejected with a 429, by reason", ["reason"]
+)
+single_flight_requests_total = registry.counter(
+    "triphelix_single_flight_requests_total",
+    "Requests that started an upstream call (leader) or shared one already in flight (joined)",
+    ["caller", "role"]
+)
+
+# Agents
+agent_turn_seconds = registry.histogram(
+    "triphelix_agent_turn_seconds", "Duration of BaseAgent.process_message", ["agent"],
+    buckets=DURATION_BUCKETS
+)
+agent_turn_errors_total = registry.counter(
+    "triphelix_agent_turn_errors_total", "Agent turns that raised an exception", ["agent"]
+)
+itinerary_generation_seconds = registry.histogram(
+    "triphelix_itinerary_generation_seconds", "Duration of SiteSherpa itinerary generation", ["mode"],
+    buckets=DURATION_BUCKETS
+)
+tool_calls_total = registry.counter(
+    "triphelix_tool_calls_total", "Agent tool calls by tool and outcome (ok, cached, joined, error, timeout)",
+    ["tool", "outcome"]
+)
+tool_seconds = registry.histogram(
+    "triphelix_tool_seconds", "Duration of agent tool calls that ran (cache hits excluded)", ["tool"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+)
+pipeline_runs_total = registry.counter(
+    "triphelix_pipeline_runs_total",
+    "Booking pipeline runs started, resumed, replayed (already complete), completed and failed", ["outcome"]
+)
+pipeline_node_seconds = registry.histogram(
+    "triphelix_pipeline_node_seconds", "Duration of the nodes of the booking pipeline", ["node"],
+    buckets=DURATION_BUCKETS
+)
+
+# Session store and completion cache, refreshed from their stats() at scrape time
+sessions_resident = registry.gauge(
+    "triphelix_sessions", "Sessions held by the session store"
+)
+session_store_memory_bytes = registry.gauge(
+    "triphelix_session_store_memory_bytes", "Approximate memory used by the in-memory session store"
+)
+session_store_evictions_total = registry.counter(
+    "triphelix_session_store_evictions_total", "Sessions evicted by the in-memory session store since start"
+)
+# With the Redis session store: figures of the whole Redis instance, shared with the caches, reply buffers and jobs
+redis_memory_bytes = registry.gauge(
+    "triphelix_redis_instance_memory_bytes", "Memory used by the whole Redis instance"
+)
+redis_evictions_total = registry.counter(
+    "triphelix_redis_instance_evictions_total", "Keys of any kind evicted by the Redis instance"
+)
+completion_cache_lookups_total = registry.counter(
+    "triphelix_completion_cache_lookups_total", "Completion cache lookups since start", ["result"]
+)
+
+# Database connection pool
+db_pool_checkout_wait_seconds = registry.histogram(
+    "triphelix_db_pool_checkout_wait_seconds", "Time spent waiting for a pooled database connection",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+)
+db_pool_checkout_timeouts_total = registry.counter(
+    "triphelix_db_pool_checkout_timeouts_total", "Connection checkouts that gave up after DB_POOL_TIMEOUT"
+)
+db_pool_connections_in_use = registry.gauge(
+    "triphelix_db_pool_connections_in_use", "Database connections checked out of the pool"
+)
+db_pool_connections_idle = registry.gauge(
+    "triphelix_db_pool_connections_idle", "Open database connections idle in the pool"
+)
+
+# Conversation persistence (write-behind)
+persistence_queue_depth = registry.gauge(
+    "triphelix_persistence_queue_depth", "Messages waiting to be written to the database"
+)
+persisted_messages_total = registry.counter(
+    "triphelix_persisted_messages_total", "Messages handed to the conversation writer, by outcome", ["outcome"]
+)
+persistence_flush_seconds = registry.histogram(
+    "triphelix_persistence_flush_seconds", "Duration of a batched conversation write"
+)
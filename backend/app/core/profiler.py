@@ -0,0 +1,85 @@
+"""
+Sampling profiler for single requests.
+
+A background thread reads the stack of the thread running the event loop
+every PROFILER_INTERVAL_MS (sys._current_frames) and counts each distinct
+stack. The result is in the collapsed format ("frame;frame;frame count" per
+line) read by flamegraph.pl, speedscope and most flame graph viewers.
+
+Stacks are sampled whatever the loop is doing: other requests served by the
+worker at the same time show up too, and time spent waiting for I/O shows up
+as the loop's select call. It is meant for one slow request at a time on a
+quiet worker, with the trace telling which spans to look at.
+"""
+
+import os
+import sys
+import threading
+from collections import Counter
+from typing import Dict, Optional
+
+# Frame labels by (file name, function name)
+_labels: Dict[tuple, str] = {}
+
+
+def _label(code) -> str:
+    key = (code.co_filename, code.co_name)
+    label = _labels.get(key)
+    if label is None:
+        path = code.co_filename
+        # Paths from the package root: site-packages/langchain_core/... -> langchain_core/...
+        for marker in ("site-packages" + os.sep, "lib" + os.sep + "python"):
+            if marker in path:
+                path = path.rsplit(marker, 1)[1]
+                break
+        else:
+            path = os.path.relpath(path) if path.startswith(os.getcwd()) else path
+        label = f"{getattr(code, 'co_qualname', code.co_name)} ({path})"
+        _labels[key] = label
+    return label
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread until stopped.
+    """
+
+    def __init__(self, interval: float = 0.005, thread_id: Optional[int] = None, max_depth: int = 128):
+        """
+        Args:
+            interval: Seconds between samples
+            thread_id: Thread to sample (defaults to the calling thread)
+            max_depth: Frames kept per sample, from the innermost
+        """
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.max_depth = max_depth
+        self.samples: Counter = Counter()
+        self.total = 0
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                stack.append(_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                stack.reverse()
+                self.samples[";".join(stack)] += 1
+                self.total += 1
+
+    def collapsed(self) -> str:
+        """The samples in collapsed format, most frequent stacks first."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
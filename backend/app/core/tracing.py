@@ -0,0 +1,345 @@
+"""
+Request tracing: where the time of a request goes.
+
+`TracingMiddleware` opens a root span for every sampled HTTP request
+(TRACE_SAMPLE_RATE), and the code on the request path opens child spans with
+`span()` / `start_span()`: agent turns and runs, LLM calls (model, time to
+first token, tokens), tools, admission, the session store and database
+queries. Spans are plain objects kept in process. The last TRACE_MAX_TRACES
+traces stay in a ring buffer served by the debug endpoints
+(app/api/endpoints/debug.py, when TRACE_DEBUG_ENDPOINTS), and finished spans can also be appended to a
+JSON lines file (TRACE_EXPORT_PATH).
+
+Outside a sampled request (background jobs, requests left out by sampling)
+spans are a shared no-op object, so instrumented code costs one context
+variable lookup.
+
+A request sent with `X-Profile: 1`, when PROFILER_ENABLED, is also sampled by
+app/core/profiler.py for its duration; its collapsed stacks are kept with its
+trace.
+"""
+
+import json
+import random
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.core.config import settings
+
+
+class Trace:
+    """
+    The spans of one request, in the order they finished.
+    """
+
+    __slots__ = ("trace_id", "name", "timestamp", "started", "spans", "dropped", "max_spans", "profile", "tracer")
+
+    def __init__(self, tracer: "Tracer", name: str, max_spans: int):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.timestamp = time.time()
+        self.started = time.perf_counter()
+        self.spans: List["Span"] = []
+        self.dropped = 0  # Spans past max_spans, not kept
+        self.max_spans = max_spans
+        self.profile: Optional[str] = None  # Collapsed stacks, when profiled
+        self.tracer = tracer
+
+    def add(self, span: "Span") -> None:
+        if len(self.spans) < self.max_spans:
+            self.spans.append(span)
+        else:
+            self.dropped += 1
+        self.tracer.export(span)
+
+    @property
+    def root(self) -> Optional["Span"]:
+        return next((span for span in reversed(self.spans) if span.parent_id is None), None)
+
+    def summary(self) -> Dict[str, Any]:
+        root = self.root
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "timestamp": self.timestamp,
+            # None while the request is still running
+            "duration_ms": None if root is None else round(root.duration * 1000, 3),
+            "status": None if root is None else root.attributes.get("status"),
+            "spans": len(self.spans),
+            "profiled": self.profile is not None,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **self.summary(),
+            "dropped_spans": self.dropped,
+            "spans": [span.to_dict() for span in sorted(self.spans, key=lambda span: span.start)],
+        }
+
+
+class Span:
+    """
+    One timed operation of a trace. `start` is its offset from the start of
+    the trace and `duration` is set when it ends, both in seconds.
+    """
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "start", "duration", "attributes", "error", "_started")
+
+    def __init__(self, trace: Trace, name: str, kind: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self._started = time.perf_counter()
+        self.start = self._started - trace.started
+        self.duration: Optional[float] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def elapsed(self) -> float:
+        """Seconds since the span started."""
+        return time.perf_counter() - self._started
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        """End the span (once), recording `error` if it failed."""
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._started
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}" if str(error) else type(error).__name__
+        self.trace.add(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ms": round(self.start * 1000, 3),
+            "duration_ms": None if self.duration is None else round(self.duration * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Span of untraced code: records nothing."""
+
+    __slots__ = ()
+    trace = None
+    span_id = None
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+    def elapsed(self) -> float:
+        return 0.0
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+# Span of the operation in progress in this context (None outside traced requests)
+_current: ContextVar[Optional[Span]] = ContextVar("trace_span", default=None)
+
+
+class Tracer:
+    """
+    Ring buffer of the recent traces of this worker, and their optional JSON lines export.
+    """
+
+    def __init__(self, max_traces: int, max_spans: int, export_path: Optional[str] = None):
+        """
+        Args:
+            max_traces: Traces kept; the oldest is dropped for a new one
+            max_spans: Spans kept per trace
+            export_path: File every finished span is appended to, as a JSON line
+        """
+        self.max_traces = max_traces
+        self.max_spans = max_spans
+        self.export_path = export_path
+        self._traces: "OrderedDict[str, Trace]" = OrderedDict()
+        self._export_file = None
+
+    def start_trace(self, name: str, kind: str = "request", **attributes: Any) -> Span:
+        """
+        Start a trace and return its root span, which is not made current.
+        """
+        trace = Trace(self, name, self.max_spans)
+        self._traces[trace.trace_id] = trace
+        while len(self._traces) > self.max_traces:
+            self._traces.popitem(last=False)
+        return Span(trace, name, kind, None, attributes)
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        return self._traces.get(trace_id)
+
+    def recent(self, limit: int = 50, min_duration: float = 0.0) -> List[Trace]:
+        """The latest traces first, leaving out finished ones shorter than `min_duration` seconds."""
+        traces = []
+        for trace in reversed(self._traces.values()):
+            root = trace.root
+            if root is not None and root.duration < min_duration:
+                continue
+            traces.append(trace)
+            if len(traces) >= limit:
+                break
+        return traces
+
+    def export(self, span: Span) -> None:
+        if not self.export_path:
+            return
+        if self._export_file is None:
+            self._export_file = open(self.export_path, "a", encoding="utf-8")
+        self._export_file.write(json.dumps(
+            {"trace_id": span.trace.trace_id, "timestamp": span.trace.timestamp, **span.to_dict()},
+            default=str
+        ) + "\n")
+        if span.parent_id is None:
+            # Written through once per request
+            self._export_file.flush()
+
+    def close(self) -> None:
+        if self._export_file is not None:
+            self._export_file.close()
+            self._export_file = None
+
+
+def current_span() -> Optional[Span]:
+    """The span in progress in this context, if the request is traced."""
+    return _current.get()
+
+
+def start_span(name: str, kind: str, parent: Optional[Span] = None, **attributes: Any) -> Span:
+    """
+    Start a child of `parent` (defaults to the current span) without making it
+    current; the caller ends it. Suits spans crossing the yields of a generator.
+
+    Args:
+        name: What the span times
+        kind: "request", "agent", "step", "llm", "tool", "store" or "db"
+        parent: The span to attach it to
+        attributes: Initial attributes
+    """
+    parent = parent or _current.get()
+    if parent is None or parent.trace is None:
+        return NOOP_SPAN
+    return Span(parent.trace, name, kind, parent.span_id, attributes)
+
+
+@contextmanager
+def span(name: str, kind: str, **attributes: Any) -> Iterator[Span]:
+    """
+    Time the block as a child of the current span, current inside the block.
+    An exception escaping the block is recorded on the span.
+    """
+    child = start_span(name, kind, **attributes)
+    if child is NOOP_SPAN:
+        yield child
+        return
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.end(e)
+        raise
+    else:
+        child.end()
+    finally:
+        _current.reset(token)
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware tracing sampled requests (TRACE_SAMPLE_RATE) and profiling
+    the ones that ask for it. The trace id is returned in X-Trace-ID.
+    """
+
+    def __init__(self, app, tracer: "Tracer"):
+        self.app = app
+        self.tracer = tracer
+
+    @staticmethod
+    def _name(root: Span, scope) -> None:
+        """
+        Name the trace after the route template matched (POST /api/v1/pipeline/runs/{run_id}),
+        never the raw path: it carries session, reply and run ids.
+        """
+        route = scope.get("route")
+        root.name = root.trace.name = f"{scope['method']} {getattr(route, 'path', '<unmatched>')}"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(tuple(settings.TRACE_EXCLUDE_PATHS)):
+            await self.app(scope, receive, send)
+            return
+        profile = settings.PROFILER_ENABLED and dict(scope["headers"]).get(b"x-profile", b"").lower() in (b"1", b"true")
+        if not profile and random.random() >= settings.TRACE_SAMPLE_RATE:
+            await self.app(scope, receive, send)
+            return
+
+        # Named after its route once routing has matched one (set in the scope by FastAPI)
+        root = self.tracer.start_trace(scope["method"], method=scope["method"])
+        trace_id = root.trace.trace_id.encode()
+        first_byte = True
+
+        async def traced_send(message):
+            nonlocal first_byte
+            if message["type"] == "http.response.start":
+                self._name(root, scope)
+                root.set(status=message["status"])
+                message = {**message, "headers": [*message.get("headers", ()), (b"x-trace-id", trace_id)]}
+            elif message["type"] == "http.response.body" and first_byte and message.get("body"):
+                # Time to the first byte of the body (first token of streamed replies)
+                root.set(ttfb_ms=round(root.elapsed() * 1000, 3))
+                first_byte = False
+            await send(message)
+
+        profiler = None
+        if profile:
+            from app.core.profiler import SamplingProfiler
+
+            profiler = SamplingProfiler(interval=settings.PROFILER_INTERVAL_MS / 1000)
+            profiler.start()
+        token = _current.set(root)
+        try:
+            await self.app(scope, receive, traced_send)
+        except BaseException as e:
+            self._name(root, scope)
+            root.end(e)
+            raise
+        else:
+            self._name(root, scope)
+            root.end()
+        finally:
+            _current.reset(token)
+            if profiler is not None:
+                profiler.stop()
+                # Only slow requests keep theirs (PROFILER_MIN_SECONDS)
+                if root.duration >= settings.PROFILER_MIN_SECONDS:
+                    root.trace.profile = profiler.collapsed()
+                    root.set(profile_samples=profiler.total)
+
+
+def create_tracer() -> Tracer:
+    """
+    Build the tracer of this worker from the tracing settings.
+    """
+    return Tracer(
+        max_traces=settings.TRACE_MAX_TRACES,
+        max_spans=settings.TRACE_MAX_SPANS,
+        export_path=settings.TRACE_EXPORT_PATH,
+    )
+
+
+# Global tracer instance
+tracer = create_tracer()
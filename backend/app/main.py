@@ -4,21 +4,55 @@ This file serves as the entry point for the FastAPI application and sets up all
 """
 
 # Import necessary FastAPI components and utilities
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 import asyncio
-from typing import AsyncGenerator
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Optional
 
 # Import routers from the API endpoints
-from app.api.endpoints import chat
+from app.api.endpoints import chat, debug, jobs, pipeline
+from app.core.config import settings
+from app.core.database import dispose_async_engine
+from app.core.tracing import TracingMiddleware, tracer
+from app.core.metrics import (
+    completion_cache_lookups_total,
+    redis_evictions_total,
+    redis_memory_bytes,
+    registry,
+    session_store_evictions_total,
+    session_store_memory_bytes,
+    sessions_resident,
+)
+from app.services.admission import AdmissionRejected
+from app.services.persistence import conversation_writer
+from app.services.readiness import UpstreamProbe
+
+# Application lifespan - creates the shared clients, prepares the database and releases them when the worker shuts down
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global upstream_probe
+    # Clients are created here rather than at import, keeping worker cold start short
+    chat.open_resources()
+    jobs.open_resources()
+    upstream_probe = UpstreamProbe(chat.client)
+    await conversation_writer.start()
+    yield
+    await chat.close_resources()
+    await jobs.close_resources()
+    # Write the conversations still queued before closing the database pool
+    await conversation_writer.close()
+    await dispose_async_engine()
+    tracer.close()
 
 # Initialize the FastAPI application with metadata
 # This creates the main application instance with title, description, and version information
 app = FastAPI(
     title="TripHelix API",  # API title for documentation
     description="AI-powered travel assistant API",  # API description
-    version="0.1.0"  # API version
+    version="0.1.0",  # API version
+    lifespan=lifespan  # Startup/shutdown hooks
 )
 
 # Configure Cross-Origin Resource Sharing (CORS)
@@ -30,23 +64,79 @@ app.add_middleware(
     allow_credentials=True,  # Allow cookies and authentication headers
     allow_methods=["*"],  # Allow all HTTP methods
     allow_headers=["*"],  # Allow all headers
+    expose_headers=["X-Session-ID", "X-Reply-ID", "X-Run-ID", "X-Trace-ID"],  # Let the frontend read the session, reply, pipeline run and trace ids assigned by the API
 )
 
+# Per-request spans (TRACING_ENABLED), and sampling profiles of requests sent with X-Profile (PROFILER_ENABLED)
+if settings.TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware, tracer=tracer)
+
+# Requests refused by admission control (busy session, full queue, provider rate limits)
+# get a fast 429 telling the client when to retry, instead of waiting until they time out
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "reason": exc.reason},
+        headers={"Retry-After": exc.retry_after_header},
+    )
+
 # Include the chat router with a prefix and tags for API documentation
 # This mounts the chat endpoints under the /api/v1 path
 app.include_router(chat.router, prefix="/api/v1", tags=["chat"])
 
+# Background jobs (itinerary and booking schema) and their progress streams
+app.include_router(jobs.router, prefix="/api/v1", tags=["jobs"])
+
+# SiteSherpa -> Concierge booking pipeline, checkpointed after every step
+app.include_router(pipeline.router, prefix="/api/v1", tags=["pipeline"])
+
+# Recent traces and profiles of this worker, opted into separately: they are not authenticated
+if settings.TRACING_ENABLED and settings.TRACE_DEBUG_ENDPOINTS:
+    app.include_router(debug.router, prefix="/api/v1", tags=["debug"])
+
 # Root endpoint - serves as a welcome message
 # This endpoint returns a simple JSON response when accessing the root URL
 @app.get("/")
 async def root():
     return {"message": "Welcome to TripHelix API"}
 
+# Cached probe of the LLM upstream, shared by all health checks of this worker (created in the lifespan)
+upstream_probe: Optional[UpstreamProbe] = None
+
 # Health check endpoint - used for monitoring and load balancing
-# This endpoint allows external services to check if the API is running properly
+# Acts as a readiness check: returns 503 while the session store or the LLM upstream is unavailable
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    checks = {"session_store": await chat.session_store.ping()}
+    if settings.HEALTH_CHECK_UPSTREAM:
+        checks["upstream"] = await upstream_probe.check()
+    healthy = all(checks.values())
+    return JSONResponse(
+        status_code=200 if healthy else 503,
+        content={"status": "healthy" if healthy else "unavailable", "checks": checks}
+    )
+
+# Metrics endpoint - Prometheus text format
+# Session store and cache counters are read from their stats() when scraped
+@app.get("/metrics")
+async def metrics():
+    try:
+        store = await chat.session_store.stats()
+        sessions_resident.set(store["sessions"])
+        if store["backend"] == "redis":
+            redis_memory_bytes.set(store["instance_memory_bytes"])
+            redis_evictions_total.set_total(store["instance_evictions"])
+        else:
+            session_store_memory_bytes.set(store["memory_bytes"])
+            session_store_evictions_total.set_total(store["evictions"])
+    except Exception:
+        pass  # An unreachable store must not break the scrape; /health reports it
+    cache = chat.completion_cache.stats()
+    completion_cache_lookups_total.set_total(cache["memory_hits"], "memory_hit")
+    completion_cache_lookups_total.set_total(cache["redis_hits"], "redis_hit")
+    completion_cache_lookups_total.set_total(cache["misses"], "miss")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 # Example Server-Sent Events (SSE) generator
 # This demonstrates how we'll stream AI responses to the frontend
@@ -0,0 +1,85 @@
+# Import SQLAlchemy column types and the declarative base shared by all models
+from datetime import datetime, timezone
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, LargeBinary, String, Text
+from sqlalchemy.orm import relationship
+
+from app.core.database import Base
+
+def utcnow() -> datetime:
+    """Timezone-aware current time, used for all stored timestamps"""
+    return datetime.now(timezone.utc)
+
+class ConversationSession(Base):
+    """
+    A conversation: a chat session or the history of one agent session.
+    Rows are written in batches by the conversation writer (app/services/persistence.py).
+    """
+    __tablename__ = "conversation_sessions"
+
+    id = Column(String(128), primary_key=True)  # Session id ("<agent>:<session id>" for agents)
+    source = Column(String(32), nullable=False, default="chat")  # "chat" or the agent name
+    created_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)  # Time of the last message
+
+    # Messages in the order they were written
+    messages = relationship(
+        "ConversationMessage",
+        back_populates="session",
+        order_by="ConversationMessage.id",
+        cascade="all, delete-orphan"
+    )
+
+class ConversationMessage(Base):
+    """
+    One message of a conversation. Ids increase in write order, which is
+    the conversation order since each session's messages are queued in order.
+    """
+    __tablename__ = "conversation_messages"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    session_id = Column(String(128), ForeignKey("conversation_sessions.id", ondelete="CASCADE"), nullable=False)
+    role = Column(String(16), nullable=False)  # "user" or "assistant"
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)
+
+    session = relationship("ConversationSession", back_populates="messages")
+
+    __table_args__ = (
+        # Rehydration reads a whole session in order
+        Index("ix_conversation_messages_session_id_id", "session_id", "id"),
+    )
+
+class PipelineCheckpoint(Base):
+    """
+    A checkpoint of a booking pipeline run (LangGraph state after a step),
+    written by the database checkpoint saver (app/services/checkpoints.py).
+    """
+    __tablename__ = "pipeline_checkpoints"
+
+    thread_id = Column(String(128), primary_key=True)  # Pipeline run id
+    checkpoint_ns = Column(String(255), primary_key=True, default="")  # Subgraph namespace ("" for the pipeline itself)
+    checkpoint_id = Column(String(64), primary_key=True)  # Increases with every checkpoint of a run
+    parent_checkpoint_id = Column(String(64), nullable=True)
+    type = Column(String(32), nullable=False)  # Serializer format of `checkpoint`
+    checkpoint = Column(LargeBinary, nullable=False)  # Serialized checkpoint, channel values included
+    metadata_type = Column(String(32), nullable=False)
+    checkpoint_metadata = Column("metadata", LargeBinary, nullable=False)  # Serialized CheckpointMetadata
+    created_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)
+
+class PipelineCheckpointWrite(Base):
+    """
+    An output of a pipeline node not yet folded into a checkpoint: the writes
+    of the nodes that completed in a step whose checkpoint was never taken
+    (e.g. a sibling node failed), which are not run again on resume.
+    """
+    __tablename__ = "pipeline_checkpoint_writes"
+
+    thread_id = Column(String(128), primary_key=True)
+    checkpoint_ns = Column(String(255), primary_key=True, default="")
+    checkpoint_id = Column(String(64), primary_key=True)  # Checkpoint the writing step started from
+    task_id = Column(String(64), primary_key=True)
+    idx = Column(Integer, primary_key=True)  # Position in the task's writes (negative for special channels)
+    channel = Column(String(255), nullable=False)
+    type = Column(String(32), nullable=False)
+    value = Column(LargeBinary, nullable=False)
+    task_path = Column(String(255), nullable=False, default="")
@@ -0,0 +1,45 @@
+# Import pydantic components for request/response schemas
+from datetime import datetime
+from typing import List
+from pydantic import BaseModel, ConfigDict, Field
+
+from app.models.base import utcnow
+
+class TravelPreferences(BaseModel):
+    """Structured data model for travel preferences"""
+    destination: str = Field(..., description="Main travel destination")
+    start_date: datetime = Field(..., description="Travel start date")
+    end_date: datetime = Field(..., description="Travel end date")
+    budget: float = Field(..., description="Total budget for the trip")
+    accommodation_type: str = Field(..., description="Preferred type of accommodation")
+    travel_style: str = Field(..., description="Travel style (e.g., luxury, budget, adventure)")
+    interests: List[str] = Field(..., description="List of interests and activities")
+    special_requirements: List[str] = Field(default_factory=list, description="Any special requirements")
+    group_size: int = Field(..., description="Number of people traveling")
+    dietary_restrictions: List[str] = Field(default_factory=list, description="Any dietary restrictions")
+
+class MessageCreate(BaseModel):
+    """A message queued for persistence"""
+    session_id: str = Field(..., description="Conversation the message belongs to")
+    source: str = Field("chat", description="'chat' or the name of the agent")
+    role: str = Field(..., description="'user' or 'assistant'")
+    content: str = Field(..., description="Message text")
+    created_at: datetime = Field(default_factory=utcnow, description="Time the message was produced")
+
+class MessageRead(BaseModel):
+    """A stored message"""
+    model_config = ConfigDict(from_attributes=True)
+
+    role: str
+    content: str
+    created_at: datetime
+
+class ConversationRead(BaseModel):
+    """A stored conversation with its messages in order"""
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    source: str
+    created_at: datetime
+    updated_at: datetime
+    messages: List[MessageRead] = Field(default_factory=list)
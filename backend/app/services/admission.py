@@ -0,0 +1,281 @@
+"""
+Admission control in front of the upstream LLM.
+
+Without a limit, a burst of requests opens as many upstream streams as there
+are requests, runs into the provider's rate limits and fails all at once.
+The AdmissionController of a worker bounds this:
+
+- one turn in flight per session (`begin_turn`/`end_turn`, or `turn()`);
+  a second turn sent while the first is being answered is rejected
+- at most ADMISSION_MAX_CONCURRENT upstream calls at once (`acquire`/`slot()`);
+  callers beyond that wait in a queue of ADMISSION_MAX_QUEUE entries for at
+  most ADMISSION_QUEUE_TIMEOUT_SECONDS
+- token buckets pacing the calls to the provider's requests and tokens per
+  minute (PROVIDER_RPM / PROVIDER_TPM, 0 disables them). Tokens are reserved
+  up front (prompt + max completion) and the unused part is given back once
+  the actual usage is known
+
+Requests that cannot be admitted fail fast with AdmissionRejected, which the
+API turns into a 429 response with a Retry-After header, instead of piling up
+until they time out.
+"""
+
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator, Optional, Set
+
+from app.core.config import settings
+from app.core.metrics import (
+    admission_queue_depth,
+    admission_rejections_total,
+    admission_wait_seconds,
+    upstream_slots_in_use,
+)
+
+
+class AdmissionRejected(Exception):
+    """
+    A request was not admitted; it may be retried after `retry_after` seconds.
+    """
+
+    def __init__(self, reason: str, retry_after: float):
+        """
+        Args:
+            reason: "session_busy", "queue_full", "queue_timeout" or "rate_limited"
+            retry_after: Suggested delay before retrying, in seconds
+        """
+        super().__init__(f"Request not admitted ({reason}), retry after {retry_after:.0f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        """Value of the Retry-After header (whole seconds, at least 1)"""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """
+    Refills at `per_minute / 60` units per second up to one minute's worth.
+    Acquisitions are reservations: the level may go negative, and later callers
+    wait for the debt to be paid back, so waiters are served in arrival order.
+    """
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float, max_wait: float) -> float:
+        """
+        Reserve `amount` units if they are available within `max_wait` seconds.
+
+        Returns:
+            The time to wait before using them
+
+        Raises:
+            AdmissionRejected: If they are not available in time
+        """
+        self._refill()
+        # A single request larger than the bucket can never fit: let it wait for a full bucket
+        amount = min(amount, self.capacity)
+        wait = max(0.0, (amount - self.level) / self.rate)
+        if wait > max_wait:
+            raise AdmissionRejected("rate_limited", wait)
+        self.level -= amount
+        return wait
+
+    def refund(self, amount: float) -> None:
+        """Give back units reserved but not used."""
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class Permit:
+    """
+    An admitted upstream call. Release it once when the call is over.
+    """
+
+    def __init__(self, controller: "AdmissionController", tokens: int):
+        self._controller = controller
+        self.tokens = tokens
+        self._released = False
+
+    def release(self, used_tokens: Optional[int] = None) -> None:
+        """
+        Free the concurrency slot.
+
+        Args:
+            used_tokens: Tokens the call actually used, if known; the rest of
+                the reservation is returned to the TPM bucket
+        """
+        if self._released:
+            return
+        self._released = True
+        self._controller._release(self, used_tokens)
+
+
+class AdmissionController:
+    """
+    Per-worker limits on sessions, concurrent upstream calls and provider rate.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_queue: int,
+        queue_timeout: float,
+        rpm: int = 0,
+        tpm: int = 0,
+        retry_after: float = 1.0
+    ):
+        """
+        Args:
+            max_concurrent: Upstream calls allowed at once
+            max_queue: Callers allowed to wait for a slot or for the rate limits
+            queue_timeout: Longest a caller waits before being rejected, in seconds
+            rpm: Provider requests per minute (0: unlimited)
+            tpm: Provider tokens per minute (0: unlimited)
+            retry_after: Retry-After suggested when the queue is full or timed out
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.in_use = 0
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._sessions: Set[str] = set()
+        admission_queue_depth.set_function(lambda: self.waiting)
+        upstream_slots_in_use.set_function(lambda: self.in_use)
+
+    @property
+    def limits_tokens(self) -> bool:
+        """Whether callers must pass the tokens of their calls to `acquire` (PROVIDER_TPM is set)"""
+        return self.tokens is not None
+
+    def begin_turn(self, session_key: str) -> None:
+        """
+        Mark a session as having a turn in flight.
+
+        Raises:
+            AdmissionRejected: If it already has one
+        """
+        if session_key in self._sessions:
+            admission_rejections_total.labels("session_busy").inc()
+            raise AdmissionRejected("session_busy", self.retry_after)
+        self._sessions.add(session_key)
+
+    def end_turn(self, session_key: str) -> None:
+        """Mark the turn of a session as finished."""
+        self._sessions.discard(session_key)
+
+    @contextmanager
+    def turn(self, session_key: str) -> Iterator[None]:
+        """`begin_turn` and `end_turn` around a block."""
+        self.begin_turn(session_key)
+        try:
+            yield
+        finally:
+            self.end_turn(session_key)
+
+    async def acquire(self, caller: str, tokens: int = 0) -> Permit:
+        """
+        Wait for the rate limits and a concurrency slot.
+
+        Args:
+            caller: Metrics label identifying the call site
+            tokens: Tokens the call may use (prompt plus maximum completion)
+
+        Raises:
+            AdmissionRejected: If the queue is full, the rate limits cannot be
+                met in time, or no slot frees up before the deadline
+        """
+        start = time.monotonic()
+        if self._slots.locked() and self.waiting >= self.max_queue:
+            admission_rejections_total.labels("queue_full").inc()
+            raise AdmissionRejected("queue_full", self.retry_after)
+
+        self.waiting += 1
+        reserved_request = reserved_tokens = False
+        try:
+            # Pace before taking a slot, so slots are not held while sleeping
+            wait = 0.0
+            try:
+                if self.requests is not None:
+                    wait = self.requests.reserve(1, self.queue_timeout)
+                    reserved_request = True
+                if self.tokens is not None and tokens:
+                    wait = max(wait, self.tokens.reserve(tokens, self.queue_timeout))
+                    reserved_tokens = True
+            except AdmissionRejected:
+                admission_rejections_total.labels("rate_limited").inc()
+                raise
+            if wait:
+                await asyncio.sleep(wait)
+
+            remaining = self.queue_timeout - (time.monotonic() - start)
+            try:
+                await asyncio.wait_for(self._slots.acquire(), max(remaining, 0))
+            except asyncio.TimeoutError:
+                admission_rejections_total.labels("queue_timeout").inc()
+                raise AdmissionRejected("queue_timeout", self.retry_after) from None
+        except BaseException:
+            # Not admitted: give the reservations back
+            if reserved_request:
+                self.requests.refund(1)
+            if reserved_tokens:
+                self.tokens.refund(tokens)
+            raise
+        finally:
+            self.waiting -= 1
+            admission_wait_seconds.labels(caller).observe(time.monotonic() - start)
+
+        self.in_use += 1
+        return Permit(self, tokens if reserved_tokens else 0)
+
+    def _release(self, permit: Permit, used_tokens: Optional[int]) -> None:
+        self.in_use -= 1
+        self._slots.release()
+        if permit.tokens and used_tokens is not None and used_tokens < permit.tokens:
+            self.tokens.refund(permit.tokens - used_tokens)
+
+    @asynccontextmanager
+    async def slot(self, caller: str, tokens: int = 0) -> AsyncIterator[Permit]:
+        """
+        `acquire` and `release` around a block. The block may call
+        `permit.release(used_tokens)` itself to report the actual usage.
+        """
+        permit = await self.acquire(caller, tokens)
+        try:
+            yield permit
+        finally:
+            permit.release()
+
+
+def create_admission_controller() -> AdmissionController:
+    """
+    Build the admission controller from settings.
+    """
+    return AdmissionController(
+        max_concurrent=settings.ADMISSION_MAX_CONCURRENT,
+        max_queue=settings.ADMISSION_MAX_QUEUE,
+        queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+        rpm=settings.PROVIDER_RPM,
+        tpm=settings.PROVIDER_TPM,
+        retry_after=settings.ADMISSION_RETRY_AFTER_SECONDS,
+    )
+
+
+# Shared by the chat endpoint and the agents of this process
+admission = create_admission_controller()
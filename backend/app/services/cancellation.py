@@ -0,0 +1,66 @@
+"""
+Accounting for upstream LLM calls aborted because their client went away.
+
+When a client disconnects mid-reply, the upstream call is cancelled and its
+HTTP connection closed, so the provider stops generating (and billing) the
+rest of the completion. How many tokens that saves cannot be known exactly;
+it is estimated from the average completion length of the same caller, minus
+what had already been streamed.
+"""
+
+from typing import Dict, Optional
+
+from app.core.metrics import upstream_cancelled_tokens_saved_total, upstream_cancelled_total
+
+# Appended to a reply recorded in the history after its generation was aborted
+TRUNCATED_MARKER = "\n\n[truncated]"
+
+
+class CompletionLengths:
+    """
+    Exponentially weighted average of the completion tokens of each caller.
+    """
+
+    def __init__(self, alpha: float = 0.1):
+        """
+        Args:
+            alpha: Weight of the latest completion in the average
+        """
+        self.alpha = alpha
+        self._average: Dict[str, float] = {}
+
+    def observe(self, caller: str, completion_tokens: int) -> None:
+        """Record the length of a completed call."""
+        average = self._average.get(caller)
+        if average is None:
+            self._average[caller] = float(completion_tokens)
+        else:
+            self._average[caller] = average + self.alpha * (completion_tokens - average)
+
+    def expected(self, caller: str) -> Optional[float]:
+        """Average completion tokens of the caller, or None before its first completion."""
+        return self._average.get(caller)
+
+    def cancelled(self, caller: str, streamed_tokens: int, max_tokens: Optional[int] = None) -> int:
+        """
+        Record an aborted call and the tokens it is estimated to have saved.
+
+        Args:
+            caller: Metrics label identifying the call site
+            streamed_tokens: Completion tokens received before the abort
+            max_tokens: Completion limit of the call, caps the estimate
+
+        Returns:
+            The estimated tokens saved (0 until the caller has completed a call)
+        """
+        expected = self._average.get(caller, 0.0)
+        if max_tokens is not None:
+            expected = min(expected, max_tokens)
+        saved = max(0, round(expected - streamed_tokens))
+        upstream_cancelled_total.labels(caller).inc()
+        upstream_cancelled_tokens_saved_total.labels(caller).inc(saved)
+        return saved
+
+
+# Shared by the chat endpoint and the agents of this process
+completion_lengths = CompletionLengths()
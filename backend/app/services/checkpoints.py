@@ -0,0 +1,255 @@
+"""
+Checkpoint stores of the booking pipeline (app/agents/pipeline.py).
+
+LangGraph saves the state of a run after every step. When a run fails or its
+worker dies, running it again with the same run id resumes after the last node
+that completed, so the LLM calls already made are not paid for twice. Where
+the checkpoints live is chosen by PIPELINE_CHECKPOINT_BACKEND:
+
+- memory: LangGraph's in-memory saver; a failed run can be retried in the same
+  worker, but nothing survives a restart
+- database: the tables `pipeline_checkpoints` and `pipeline_checkpoint_writes`
+  of the application database (SQLALCHEMY_ASYNC_DATABASE_URI, so SQLite or
+  Postgres), shared by every worker and surviving restarts
+
+The pipeline only runs asynchronously, so the database saver only implements
+the async half of the saver interface.
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.core.config import settings
+from app.core.database import get_async_sessionmaker
+from app.models.base import PipelineCheckpoint, PipelineCheckpointWrite
+
+
+def _config(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> RunnableConfig:
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}}
+
+
+class DatabaseCheckpointSaver(BaseCheckpointSaver):
+    """
+    LangGraph checkpoint saver writing to the application database through the
+    async SQLAlchemy engine.
+    """
+
+    def __init__(self, sessionmaker: Callable[[], Any], create_tables: bool = False):
+        """
+        Args:
+            sessionmaker: Returns the async_sessionmaker to use (called on first use)
+            create_tables: Create the checkpoint tables on first use if they are missing
+        """
+        super().__init__()
+        self._sessionmaker = sessionmaker
+        self.create_tables = create_tables
+        self._tables_ready = not create_tables
+        self._tables_lock = asyncio.Lock()
+
+    async def _session(self):
+        if not self._tables_ready:
+            async with self._tables_lock:
+                if not self._tables_ready:
+                    async with self._sessionmaker()() as db:
+                        connection = await db.connection()
+                        await connection.run_sync(
+                            lambda sync_connection: PipelineCheckpoint.metadata.create_all(
+                                sync_connection,
+                                tables=[PipelineCheckpoint.__table__, PipelineCheckpointWrite.__table__]
+                            )
+                        )
+                        await db.commit()
+                    self._tables_ready = True
+        return self._sessionmaker()()
+
+    async def _tuple(self, db, row: PipelineCheckpoint) -> CheckpointTuple:
+        """Checkpoint tuple of a row, with the pending writes of its step."""
+        writes = (await db.execute(
+            select(PipelineCheckpointWrite)
+            .where(
+                PipelineCheckpointWrite.thread_id == row.thread_id,
+                PipelineCheckpointWrite.checkpoint_ns == row.checkpoint_ns,
+                PipelineCheckpointWrite.checkpoint_id == row.checkpoint_id,
+            )
+            .order_by(PipelineCheckpointWrite.task_id, PipelineCheckpointWrite.idx)
+        )).scalars().all()
+        return CheckpointTuple(
+            config=_config(row.thread_id, row.checkpoint_ns, row.checkpoint_id),
+            checkpoint=self.serde.loads_typed((row.type, row.checkpoint)),
+            metadata=self.serde.loads_typed((row.metadata_type, row.checkpoint_metadata)),
+            parent_config=(
+                _config(row.thread_id, row.checkpoint_ns, row.parent_checkpoint_id)
+                if row.parent_checkpoint_id else None
+            ),
+            pending_writes=[
+                (write.task_id, write.channel, self.serde.loads_typed((write.type, write.value)))
+                for write in writes
+            ],
+        )
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        configurable = config["configurable"]
+        query = select(PipelineCheckpoint).where(
+            PipelineCheckpoint.thread_id == configurable["thread_id"],
+            PipelineCheckpoint.checkpoint_ns == configurable.get("checkpoint_ns", ""),
+        )
+        checkpoint_id = get_checkpoint_id(config)
+        if checkpoint_id:
+            query = query.where(PipelineCheckpoint.checkpoint_id == checkpoint_id)
+        else:
+            # Checkpoint ids increase: the latest one
+            query = query.order_by(PipelineCheckpoint.checkpoint_id.desc()).limit(1)
+        async with await self._session() as db:
+            row = (await db.execute(query)).scalars().first()
+            return None if row is None else await self._tuple(db, row)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        query = select(PipelineCheckpoint).order_by(PipelineCheckpoint.checkpoint_id.desc())
+        if config:
+            configurable = config["configurable"]
+            query = query.where(PipelineCheckpoint.thread_id == configurable["thread_id"])
+            if configurable.get("checkpoint_ns") is not None:
+                query = query.where(PipelineCheckpoint.checkpoint_ns == configurable["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                query = query.where(PipelineCheckpoint.checkpoint_id == get_checkpoint_id(config))
+        if before and get_checkpoint_id(before):
+            query = query.where(PipelineCheckpoint.checkpoint_id < get_checkpoint_id(before))
+        async with await self._session() as db:
+            rows = (await db.execute(query)).scalars().all()
+            for row in rows:
+                if limit is not None and limit <= 0:
+                    return
+                checkpoint_tuple = await self._tuple(db, row)
+                # Metadata is stored serialized: filtered here
+                if filter and not all(checkpoint_tuple.metadata.get(key) == value for key, value in filter.items()):
+                    continue
+                if limit is not None:
+                    limit -= 1
+                yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        checkpoint_type, checkpoint_blob = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        async with await self._session() as db:
+            async with db.begin():
+                upsert = self._insert(db, PipelineCheckpoint).values(
+                    thread_id=thread_id,
+                    checkpoint_ns=checkpoint_ns,
+                    checkpoint_id=checkpoint["id"],
+                    parent_checkpoint_id=configurable.get("checkpoint_id"),
+                    type=checkpoint_type,
+                    checkpoint=checkpoint_blob,
+                    metadata_type=metadata_type,
+                    checkpoint_metadata=metadata_blob,
+                )
+                await db.execute(upsert.on_conflict_do_update(
+                    index_elements=["thread_id", "checkpoint_ns", "checkpoint_id"],
+                    set_={
+                        "type": upsert.excluded.type,
+                        "checkpoint": upsert.excluded.checkpoint,
+                        "metadata_type": upsert.excluded.metadata_type,
+                        "metadata": upsert.excluded.metadata,
+                    }
+                ))
+        return _config(thread_id, checkpoint_ns, checkpoint["id"])
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        configurable = config["configurable"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            value_type, value_blob = self.serde.dumps_typed(value)
+            rows.append({
+                "thread_id": configurable["thread_id"],
+                "checkpoint_ns": configurable.get("checkpoint_ns", ""),
+                "checkpoint_id": configurable["checkpoint_id"],
+                "task_id": task_id,
+                "idx": WRITES_IDX_MAP.get(channel, idx),
+                "channel": channel,
+                "type": value_type,
+                "value": value_blob,
+                "task_path": task_path,
+            })
+        if not rows:
+            return
+        index_elements = ["thread_id", "checkpoint_ns", "checkpoint_id", "task_id", "idx"]
+        # Writes to special channels (errors, interrupts) replace the previous one;
+        # regular writes of a task are kept as first recorded
+        special = [row for row in rows if row["idx"] < 0]
+        regular = [row for row in rows if row["idx"] >= 0]
+        async with await self._session() as db:
+            async with db.begin():
+                if special:
+                    statement = self._insert(db, PipelineCheckpointWrite)
+                    await db.execute(
+                        statement.on_conflict_do_update(
+                            index_elements=index_elements,
+                            set_={
+                                "channel": statement.excluded.channel,
+                                "type": statement.excluded.type,
+                                "value": statement.excluded.value,
+                            }
+                        ),
+                        special
+                    )
+                if regular:
+                    statement = self._insert(db, PipelineCheckpointWrite)
+                    await db.execute(statement.on_conflict_do_nothing(index_elements=index_elements), regular)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        async with await self._session() as db:
+            async with db.begin():
+                await db.execute(delete(PipelineCheckpointWrite).where(PipelineCheckpointWrite.thread_id == thread_id))
+                await db.execute(delete(PipelineCheckpoint).where(PipelineCheckpoint.thread_id == thread_id))
+
+    @staticmethod
+    def _insert(db, model):
+        return (postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert)(model)
+
+
+def create_checkpointer() -> BaseCheckpointSaver:
+    """
+    Build the checkpoint saver selected by PIPELINE_CHECKPOINT_BACKEND.
+    """
+    if settings.PIPELINE_CHECKPOINT_BACKEND == "database":
+        return DatabaseCheckpointSaver(get_async_sessionmaker, create_tables=settings.PERSISTENCE_CREATE_TABLES)
+    if settings.PIPELINE_CHECKPOINT_BACKEND == "memory":
+        from langgraph.checkpoint.memory import InMemorySaver
+
+        return InMemorySaver()
+    raise ValueError(f"Unknown PIPELINE_CHECKPOINT_BACKEND: {settings.PIPELINE_CHECKPOINT_BACKEND}")
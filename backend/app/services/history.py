@@ -0,0 +1,252 @@
+"""
+Token-budgeted conversation history.
+
+Sending the whole transcript on every turn makes prompt tokens, latency and cost
+grow linearly with the length of a conversation. HistoryManager keeps the system
+prompt and the most recent turns verbatim and folds older turns into a rolling
+summary that is cached per conversation and only extended with the turns that
+fall out of the window, so each summarization call only reads new messages.
+
+It is used by the raw chat endpoint and by the SiteSherpa/Concierge agents.
+"""
+
+import logging
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Message = Dict[str, str]
+
+# Async callable folding new messages into an existing summary (None for the first fold)
+Summarizer = Callable[[Optional[str], List[Message]], Awaitable[str]]
+
+# Per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+SUMMARIZE_INSTRUCTIONS = (
+    "You maintain a running summary of a travel planning conversation. "
+    "Update the summary with the new messages. Keep every fact the traveller gave "
+    "(destination, dates, budget, travel style, accommodation, interests, group size, "
+    "special requirements, dietary restrictions) and any decisions already made. "
+    "Be concise and reply with the updated summary only."
+)
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str) -> Any:
+    """
+    Return the tiktoken encoding for a model, loaded once per process.
+
+    Falls back to the gpt-4o encoding for unknown models, and to None when
+    tiktoken is unavailable, in which case tokens are estimated from length.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # Encoding files could not be loaded (e.g. no network access on first use)
+        return None
+
+
+@lru_cache(maxsize=65536)
+def count_tokens(text: str, model: str) -> int:
+    """
+    Count the tokens of a string, caching the result per (text, model).
+
+    Args:
+        text: The text to count
+        model: The model whose tokenizer should be used
+    """
+    encoding = get_encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages: List[Message], model: str) -> int:
+    """
+    Count the prompt tokens used by a list of chat messages.
+
+    Args:
+        messages: Messages in OpenAI format
+        model: The model whose tokenizer should be used
+    """
+    return sum(count_tokens(m["content"], model) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def format_transcript(messages: List[Message]) -> str:
+    """Render messages as a plain "role: content" transcript."""
+    return "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+
+
+def summarize_with_openai(client: Any, model: str, max_tokens: int) -> Summarizer:
+    """
+    Build a summarizer backed by an `AsyncOpenAI` client.
+
+    Args:
+        client: The AsyncOpenAI client
+        model: Model used for summaries
+        max_tokens: Maximum length of a summary
+    """
+    async def summarize(previous: Optional[str], messages: List[Message]) -> str:
+        response = await client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": SUMMARIZE_INSTRUCTIONS},
+                {"role": "user", "content": _summary_request(previous, messages)},
+            ],
+            temperature=0,
+            max_tokens=max_tokens,
+        )
+        return response.choices[0].message.content or ""
+
+    return summarize
+
+
+def summarize_with_chat_model(llm: Any) -> Summarizer:
+    """
+    Build a summarizer backed by a LangChain chat model.
+
+    Args:
+        llm: Any LangChain chat model supporting `ainvoke`
+    """
+    async def summarize(previous: Optional[str], messages: List[Message]) -> str:
+        response = await llm.ainvoke([
+            ("system", SUMMARIZE_INSTRUCTIONS),
+            ("human", _summary_request(previous, messages)),
+        ])
+        return response.content
+
+    return summarize
+
+
+def _summary_request(previous: Optional[str], messages: List[Message]) -> str:
+    return (
+        f"Current summary:\n{previous or '(none)'}\n\n"
+        f"New messages:\n{format_transcript(messages)}"
+    )
+
+
+class HistoryManager:
+    """
+    Builds the message window sent to the model for a conversation.
+
+    The window is: system prompt (if any), rolling summary of folded turns (if any),
+    then the most recent turns verbatim. When the window exceeds `max_tokens`,
+    older turns are folded into the summary until the verbatim part is back under
+    half of the budget, so the summary is only updated every few turns.
+    """
+
+    def __init__(
+        self,
+        summarizer: Summarizer,
+        model: str,
+        max_tokens: int,
+        keep_recent: int,
+        max_conversations: int = 10000,
+    ):
+        """
+        Args:
+            summarizer: Callable folding messages into the rolling summary
+            model: Model whose tokenizer is used for counting
+            max_tokens: Token budget of the history sent to the model
+            keep_recent: Minimum number of recent messages always sent verbatim
+            max_conversations: Number of cached summaries kept (LRU)
+        """
+        self.summarizer = summarizer
+        self.model = model
+        self.max_tokens = max_tokens
+        self.keep_recent = keep_recent
+        self.max_conversations = max_conversations
+        # conversation key -> (number of turns folded, summary)
+        self._summaries: "OrderedDict[str, Tuple[int, str]]" = OrderedDict()
+
+    def _cached_summary(self, key: str, turn_count: int) -> Tuple[int, Optional[str]]:
+        entry = self._summaries.get(key)
+        if entry is None or entry[0] > turn_count:
+            # Unknown conversation, or the history was reset since the summary was made
+            return 0, None
+        self._summaries.move_to_end(key)
+        return entry
+
+    def _store_summary(self, key: str, folded: int, summary: str) -> None:
+        self._summaries[key] = (folded, summary)
+        self._summaries.move_to_end(key)
+        while len(self._summaries) > self.max_conversations:
+            self._summaries.popitem(last=False)
+
+    @staticmethod
+    def _summary_message(summary: str) -> Message:
+        return {"role": "system", "content": SUMMARY_PREFIX + summary}
+
+    def forget(self, key: str) -> None:
+        """
+        Drop the cached summary of a conversation.
+
+        Args:
+            key: The conversation key
+        """
+        self._summaries.pop(key, None)
+
+    async def window(
+        self,
+        key: str,
+        messages: List[Message],
+        reserved_tokens: int = 0,
+    ) -> List[Message]:
+        """
+        Return the messages to send for a conversation, within the token budget.
+
+        Args:
+            key: Stable identifier of the conversation (e.g. the session id)
+            messages: Full history, optionally starting with the system prompt
+            reserved_tokens: Tokens already used by prompt parts not in `messages`
+
+        Returns:
+            The windowed list of messages
+        """
+        system = messages[:1] if messages and messages[0]["role"] == "system" else []
+        turns = messages[len(system):]
+        budget = self.max_tokens - reserved_tokens - count_message_tokens(system, self.model)
+
+        folded, summary = self._cached_summary(key, len(turns))
+        if not summary and count_message_tokens(turns, self.model) <= budget:
+            return messages
+
+        recent = turns[folded:]
+        summary_tokens = count_message_tokens([self._summary_message(summary)], self.model) if summary else 0
+        if summary_tokens + count_message_tokens(recent, self.model) > budget:
+            # Fold the oldest verbatim turns until they fit in half of the budget
+            target = budget // 2 - summary_tokens
+            recent_tokens = count_message_tokens(recent, self.model)
+            fold_to = folded
+            while len(turns) - fold_to > self.keep_recent and recent_tokens > target:
+                recent_tokens -= count_message_tokens([turns[fold_to]], self.model)
+                fold_to += 1
+            if fold_to > folded:
+                try:
+                    summary = await self.summarizer(summary, turns[folded:fold_to])
+                except Exception:
+                    # The turn goes on without those turns: the previous summary is kept and
+                    # the fold is retried on the next turn
+                    logger.exception("Summarizing conversation %s failed; truncating its history", key)
+                    recent = turns[fold_to:]
+                else:
+                    folded = fold_to
+                    self._store_summary(key, folded, summary)
+                    recent = turns[folded:]
+
+        window = list(system)
+        if summary:
+            window.append(self._summary_message(summary))
+        window.extend(recent)
+        return window
@@ -0,0 +1,137 @@
+"""
+Incremental parser of the markdown itinerary template of the chat system prompt.
+
+Itineraries stream as markdown in a fixed shape:
+
+    # Lisbon Itinerary: June 3 – June 6
+
+    ## Day 1: Wednesday, June 3
+
+    ### Morning
+    - Activity
+    - Activity
+
+    ### Afternoon
+    ...
+
+`ItineraryStreamParser` consumes the deltas of a reply once, as they arrive:
+it only keeps the line being received, and handles each line when its newline
+comes in. It turns the structure into events sent next to the raw text, so
+clients can render the days without re-parsing the whole reply on every token:
+
+- itinerary_started: {"title"} on the "# ..." heading
+- day_started: {"day", "title"} on a "## Day N" heading
+- slot_started: {"day", "slot"} on a "### ..." heading inside a day
+- activity: {"day", "slot", "text"} for every bullet of a slot
+- day_complete: {"day", "title", "slots"} with the activities of every slot,
+  when the next day (or another section) starts or the reply ends
+
+Replies without the template (questions, small talk) produce no events.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# (event type, payload)
+ItineraryEvent = Tuple[str, Dict[str, Any]]
+
+# "Day 3: Friday, June 5", "Day 3 - Sintra", "Day 3"
+DAY_HEADING = re.compile(r"day\s+(\d+)\b\s*[:.\-–—]?\s*(.*)", re.IGNORECASE)
+
+# "- text", "* text", "+ text", "• text"
+BULLET = re.compile(r"[-*+•]\s+(.*)")
+
+
+class ItineraryStreamParser:
+    """
+    Parses one streamed reply. Not thread-safe; use one parser per reply.
+    """
+
+    def __init__(self):
+        self._pending: List[str] = []  # Deltas of the line being received
+        self.title: Optional[str] = None
+        self.day: Optional[Dict[str, Any]] = None  # Day being received: number, title, slots
+        self.slot: Optional[str] = None
+        self.days: List[Dict[str, Any]] = []  # Completed days
+
+    def feed(self, delta: str) -> List[ItineraryEvent]:
+        """
+        Consume the next delta of the reply.
+
+        Returns:
+            The events of the lines it completes
+        """
+        events: List[ItineraryEvent] = []
+        start = 0
+        end = delta.find("\n")
+        while end >= 0:
+            self._pending.append(delta[start:end])
+            self._line("".join(self._pending), events)
+            self._pending.clear()
+            start = end + 1
+            end = delta.find("\n", start)
+        if start < len(delta):
+            self._pending.append(delta[start:])
+        return events
+
+    def close(self) -> List[ItineraryEvent]:
+        """
+        End of the reply: parse its last line and complete the current day.
+
+        Returns:
+            The remaining events
+        """
+        events: List[ItineraryEvent] = []
+        if self._pending:
+            self._line("".join(self._pending), events)
+            self._pending.clear()
+        self._end_day(events)
+        return events
+
+    def _line(self, line: str, events: List[ItineraryEvent]) -> None:
+        # Trailing spaces are markdown line breaks
+        text = line.strip()
+        if not text:
+            return
+        if text.startswith("#"):
+            heading = text.lstrip("#")
+            level = len(text) - len(heading)
+            heading = heading.strip()
+            if level == 1:
+                self._end_day(events)
+                self.title = heading
+                events.append(("itinerary_started", {"title": heading}))
+            elif level == 2:
+                # Any level 2 heading ends the day; only "Day N" ones start one
+                self._end_day(events)
+                match = DAY_HEADING.fullmatch(heading)
+                if match:
+                    self.day = {"day": int(match.group(1)), "title": match.group(2).strip(), "slots": {}}
+                    events.append(("day_started", {"day": self.day["day"], "title": self.day["title"]}))
+            elif self.day is not None:
+                self.slot = heading
+                self.day["slots"].setdefault(heading, [])
+                events.append(("slot_started", {"day": self.day["day"], "slot": heading}))
+            return
+        match = BULLET.match(text)
+        if match and self.slot is not None:
+            activity = match.group(1).strip()
+            self.day["slots"][self.slot].append(activity)
+            events.append(("activity", {"day": self.day["day"], "slot": self.slot, "text": activity}))
+
+    def _end_day(self, events: List[ItineraryEvent]) -> None:
+        if self.day is not None:
+            self.days.append(self.day)
+            events.append(("day_complete", self.day))
+        self.day = None
+        self.slot = None
+
+
+def parse_itinerary(text: str) -> List[Dict[str, Any]]:
+    """
+    Days of a complete itinerary reply, as in the day_complete events.
+    """
+    parser = ItineraryStreamParser()
+    parser.feed(text)
+    parser.close()
+    return parser.days
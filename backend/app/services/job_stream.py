@@ -0,0 +1,234 @@
+"""
+Progress streams of background jobs.
+
+Celery workers publish job events (status changes, output chunks, results,
+errors) to a JobStreamStore, and the API reads them back to stream them to the
+client. Every event gets an id that the client can resume from.
+
+- RedisJobStreamStore: one Redis stream per job, shared by workers and API processes
+- InMemoryJobStreamStore: stand-in for local mode, where jobs run inside the API process
+"""
+
+import asyncio
+import json
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+# (event id, event type, payload)
+JobEvent = Tuple[str, str, Dict[str, Any]]
+
+# Event types that end a job stream
+TERMINAL_EVENTS = ("done", "error")
+
+# Statuses of jobs that will publish nothing more than their terminal event
+FINISHED_STATUSES = ("done", "failed")
+
+# Redis stream entry ids ("1712-0", or the milliseconds part alone)
+_REDIS_ID = re.compile(r"\d+(-\d+)?")
+
+
+class JobStreamStore(ABC):
+    """
+    Abstract interface for publishing and reading job events.
+    """
+
+    @abstractmethod
+    async def publish(self, job_id: str, event_type: str, data: Dict[str, Any]) -> str:
+        """
+        Append an event to a job's stream.
+
+        Args:
+            job_id: The job identifier
+            event_type: "status", "chunk", "result", "done" or "error"
+            data: JSON-serialisable payload
+
+        Returns:
+            The id of the new event
+        """
+
+    @abstractmethod
+    async def read(self, job_id: str, after: Optional[str], timeout: float) -> List[JobEvent]:
+        """
+        Return the events published after `after`, waiting up to `timeout`
+        seconds for new ones if there are none yet.
+
+        Args:
+            job_id: The job identifier
+            after: Id of the last event already seen, or None to start from the beginning
+            timeout: Maximum time to wait, in seconds
+        """
+
+    @abstractmethod
+    async def set_status(self, job_id: str, status: Dict[str, Any]) -> None:
+        """
+        Record the current status of a job.
+
+        Args:
+            job_id: The job identifier
+            status: Status document (at least {"status": ...})
+        """
+
+    @abstractmethod
+    async def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the current status of a job, or None if the job is unknown.
+
+        Args:
+            job_id: The job identifier
+        """
+
+    async def close(self) -> None:
+        """
+        Release any resources held by the store.
+        """
+
+
+class InMemoryJobStreamStore(JobStreamStore):
+    """
+    Job streams kept in this process.
+
+    Used in local mode, where jobs run in a thread of the API process, so the
+    store is guarded by a thread lock and readers poll for new events.
+    """
+
+    def __init__(self, ttl_seconds: float, poll_interval: float = 0.05):
+        """
+        Args:
+            ttl_seconds: How long a job is kept after its last update
+            poll_interval: How often readers check for new events, in seconds
+        """
+        self.ttl_seconds = ttl_seconds
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        # job_id -> (last update, events, status)
+        self._jobs: Dict[str, Tuple[float, List[JobEvent], Optional[Dict[str, Any]]]] = {}
+
+    def _purge_expired(self, now: float) -> None:
+        expired = [job_id for job_id, (updated, _, _) in self._jobs.items() if now - updated > self.ttl_seconds]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    async def publish(self, job_id: str, event_type: str, data: Dict[str, Any]) -> str:
+        with self._lock:
+            now = time.monotonic()
+            self._purge_expired(now)
+            _, events, status = self._jobs.get(job_id, (now, [], None))
+            event_id = str(len(events) + 1)
+            events.append((event_id, event_type, data))
+            self._jobs[job_id] = (now, events, status)
+            return event_id
+
+    @staticmethod
+    def _position(after: Optional[str]) -> int:
+        # Ids of this store are event counts; any other Last-Event-ID resumes from the start
+        try:
+            return max(0, int(after)) if after else 0
+        except ValueError:
+            return 0
+
+    async def read(self, job_id: str, after: Optional[str], timeout: float) -> List[JobEvent]:
+        start = self._position(after)
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                _, events, _ = self._jobs.get(job_id, (0.0, [], None))
+                new_events = events[start:]
+            if new_events or time.monotonic() >= deadline:
+                return new_events
+            await asyncio.sleep(self.poll_interval)
+
+    async def set_status(self, job_id: str, status: Dict[str, Any]) -> None:
+        with self._lock:
+            now = time.monotonic()
+            _, events, _ = self._jobs.get(job_id, (now, [], None))
+            self._jobs[job_id] = (now, events, status)
+
+    async def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._purge_expired(time.monotonic())
+            entry = self._jobs.get(job_id)
+            return entry[2] if entry else None
+
+
+class RedisJobStreamStore(JobStreamStore):
+    """
+    Job streams stored as Redis streams, so events published by any worker
+    can be read by any API process.
+    """
+
+    def __init__(self, redis: Any, ttl_seconds: int, max_events: int = 10000, key_prefix: str = "triphelix:job:"):
+        """
+        Args:
+            redis: A `redis.asyncio.Redis` client
+            ttl_seconds: How long a job is kept after its last update
+            max_events: Approximate maximum length of a job's stream
+            key_prefix: Prefix of the Redis keys
+        """
+        self.redis = redis
+        self.ttl_seconds = ttl_seconds
+        self.max_events = max_events
+        self.key_prefix = key_prefix
+
+    def _events_key(self, job_id: str) -> str:
+        return f"{self.key_prefix}{job_id}:events"
+
+    def _status_key(self, job_id: str) -> str:
+        return f"{self.key_prefix}{job_id}:status"
+
+    async def publish(self, job_id: str, event_type: str, data: Dict[str, Any]) -> str:
+        key = self._events_key(job_id)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.xadd(key, {"type": event_type, "data": json.dumps(data)}, maxlen=self.max_events, approximate=True)
+            pipe.expire(key, self.ttl_seconds)
+            event_id, _ = await pipe.execute()
+        return event_id
+
+    async def read(self, job_id: str, after: Optional[str], timeout: float) -> List[JobEvent]:
+        # Ids that are not stream ids (a client's stale or garbled Last-Event-ID) resume from the start
+        if not after or not _REDIS_ID.fullmatch(after):
+            after = "0-0"
+        response = await self.redis.xread(
+            {self._events_key(job_id): after},
+            count=100,
+            block=max(1, int(timeout * 1000)),
+        )
+        events = []
+        for _, entries in response or []:
+            for event_id, fields in entries:
+                events.append((event_id, fields["type"], json.loads(fields["data"])))
+        return events
+
+    async def set_status(self, job_id: str, status: Dict[str, Any]) -> None:
+        await self.redis.set(self._status_key(job_id), json.dumps(status), ex=self.ttl_seconds)
+
+    async def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raw = await self.redis.get(self._status_key(job_id))
+        return json.loads(raw) if raw else None
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+
+# Shared by the API and in-process jobs in local mode
+_memory_store = InMemoryJobStreamStore(ttl_seconds=settings.JOB_STREAM_TTL_SECONDS)
+
+
+def create_job_stream_store() -> JobStreamStore:
+    """
+    Build the job stream store selected by `JOB_STREAM_BACKEND` ("redis" or "memory").
+    Redis stores hold a client bound to the current event loop, so workers create
+    one per job; the in-memory store is a process-wide singleton.
+    """
+    if settings.JOB_STREAM_BACKEND == "memory":
+        return _memory_store
+    if settings.JOB_STREAM_BACKEND == "redis":
+        from redis.asyncio import Redis
+
+        redis = Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, decode_responses=True)
+        return RedisJobStreamStore(redis, ttl_seconds=settings.JOB_STREAM_TTL_SECONDS)
+    raise ValueError(f"Unknown JOB_STREAM_BACKEND: {settings.JOB_STREAM_BACKEND!r}")
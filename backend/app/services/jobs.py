@@ -0,0 +1,129 @@
+"""
+Background jobs run by Celery workers.
+
+Long generations (itineraries) run in workers instead of API processes. A job
+publishes its progress to the job stream store as it goes:
+- status: {"status": "running"}
+- chunk: {"html": ...} for every itinerary day, in order
+- result: {...} for the booking schema
+- done / error: end of the job
+
+The API streams these events to the client (see app/api/endpoints/jobs.py).
+"""
+
+import asyncio
+import functools
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.celery_app import celery_app
+from app.core.config import settings
+from app.services.job_stream import JobStreamStore, create_job_stream_store
+
+
+async def _run_job(job_id: str, kind: str, body) -> None:
+    """
+    Run a job body, recording its status and publishing its terminal event.
+
+    Args:
+        job_id: The job identifier
+        kind: Job type, stored in the status
+        body: Async callable receiving the store, publishing the job's output
+    """
+    store = create_job_stream_store()
+    try:
+        await store.set_status(job_id, {"status": "running", "kind": kind})
+        await store.publish(job_id, "status", {"status": "running"})
+        try:
+            await body(store)
+        except Exception as e:
+            await store.set_status(job_id, {"status": "failed", "kind": kind, "error": str(e)})
+            await store.publish(job_id, "error", {"detail": str(e)})
+            raise
+        await store.set_status(job_id, {"status": "done", "kind": kind})
+        await store.publish(job_id, "done", {})
+    finally:
+        await store.close()
+
+
+def _site_sherpa(preferences: Dict[str, Any]):
+    # Imported here so that the API process only loads the agents if it runs jobs itself
+    from app.agents.site_sherpa import SiteSherpa, TravelPreferences
+
+    sherpa = SiteSherpa(tools=[])
+    sherpa.travel_preferences = TravelPreferences.model_validate(preferences)
+    return sherpa
+
+
+@celery_app.task(name="triphelix.generate_itinerary")
+def generate_itinerary_task(job_id: str, preferences: Dict[str, Any]) -> None:
+    """
+    Generate an itinerary day by day, publishing each day as a chunk.
+
+    Args:
+        job_id: The job identifier
+        preferences: TravelPreferences as JSON
+    """
+    async def body(store: JobStreamStore) -> None:
+        sherpa = _site_sherpa(preferences)
+        async for day in sherpa.stream_itinerary():
+            await store.publish(job_id, "chunk", {"html": day})
+
+    asyncio.run(_run_job(job_id, "generate_itinerary", body))
+
+
+@celery_app.task(name="triphelix.generate_booking_schema")
+def generate_booking_schema_task(job_id: str, preferences: Dict[str, Any]) -> None:
+    """
+    Build the booking schema handed to the Concierge agent.
+
+    Args:
+        job_id: The job identifier
+        preferences: TravelPreferences as JSON
+    """
+    async def body(store: JobStreamStore) -> None:
+        sherpa = _site_sherpa(preferences)
+        await store.publish(job_id, "result", sherpa._generate_booking_schema())
+
+    asyncio.run(_run_job(job_id, "generate_booking_schema", body))
+
+
+# Jobs started in local mode, kept referenced until they finish
+_local_jobs = set()
+
+
+async def enqueue(task, args: Tuple[Any, ...], store: Optional[JobStreamStore] = None) -> str:
+    """
+    Queue a job and return its id.
+
+    With CELERY_TASK_ALWAYS_EAGER the job runs in a thread of this process
+    instead of a worker, which is enough for local development and tests.
+
+    Args:
+        task: The Celery task to run
+        args: Task arguments after the job id
+        store: Job stream store to record the queued status in (a new one if not provided)
+    """
+    job_id = uuid.uuid4().hex
+    own_store = store is None
+    store = store or create_job_stream_store()
+    try:
+        await store.set_status(job_id, {"status": "queued", "kind": task.name.split(".")[-1]})
+    finally:
+        if own_store:
+            await store.close()
+
+    loop = asyncio.get_running_loop()
+    call = functools.partial(
+        task.apply if settings.CELERY_TASK_ALWAYS_EAGER else task.apply_async,
+        args=(job_id, *args),
+        task_id=job_id,
+    )
+    if settings.CELERY_TASK_ALWAYS_EAGER:
+        future = loop.run_in_executor(None, call)
+        _local_jobs.add(future)
+        future.add_done_callback(_local_jobs.discard)
+    else:
+        # Publishing to the broker is blocking network I/O
+        await loop.run_in_executor(None, call)
+    return job_id
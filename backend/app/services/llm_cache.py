@@ -0,0 +1,233 @@
+"""
+Two-tier cache for LLM completions.
+
+Completions are keyed on the model, the temperature and the normalized message
+list. Lookups go to a per-process LRU tier first and then to an optional Redis
+tier shared by every worker; Redis hits are promoted into the LRU tier.
+
+Caching is opt-in per call site: a caller computes a key with `key()` (which
+returns None when the call is not cacheable, e.g. a sampling temperature above
+LLM_CACHE_MAX_TEMPERATURE) and then uses `get()`/`set()`. Streaming endpoints
+replay a cached completion with `replay_stream()` so clients see no difference.
+"""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+Message = Dict[str, str]
+
+
+def normalize_messages(messages: List[Message]) -> List[Tuple[str, str]]:
+    """
+    Normalize messages for keying: collapse whitespace and ignore case so that
+    "Hi!" and " hi! " share an entry.
+
+    Args:
+        messages: Messages in OpenAI format
+    """
+    return [(m["role"], " ".join(m["content"].split()).casefold()) for m in messages]
+
+
+def completion_key(model: str, temperature: Optional[float], messages: List[Message], **params: Any) -> str:
+    """
+    Hash of a completion request: model, temperature, normalized messages and
+    the other parameters affecting the output (e.g. max_tokens).
+    """
+    payload = json.dumps(
+        [model, temperature, normalize_messages(messages), sorted(params.items())],
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class _LRUTier:
+    """Per-process tier: LRU-ordered entries with an absolute expiry."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # key -> (expires_at, completion)
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: str, value: str) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class CompletionCache:
+    """
+    LRU tier in front of an optional Redis tier, with TTLs, size limits and
+    hit/miss counters.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        max_temperature: float,
+        max_entry_bytes: int,
+        redis: Any = None,
+        redis_ttl_seconds: Optional[int] = None,
+        key_prefix: str = "triphelix:llm:",
+    ):
+        """
+        Args:
+            max_entries: Maximum entries kept in the per-process tier
+            ttl_seconds: Lifetime of an entry in the per-process tier
+            max_temperature: Highest sampling temperature whose outputs are cached
+            max_entry_bytes: Completions larger than this are not cached
+            redis: Optional `redis.asyncio.Redis` client for the shared tier
+            redis_ttl_seconds: Lifetime of an entry in Redis (defaults to ttl_seconds)
+            key_prefix: Prefix of the Redis keys
+        """
+        self.memory = _LRUTier(max_entries, ttl_seconds)
+        self.max_temperature = max_temperature
+        self.max_entry_bytes = max_entry_bytes
+        self.redis = redis
+        self.redis_ttl_seconds = int(redis_ttl_seconds or ttl_seconds)
+        self.key_prefix = key_prefix
+        self.memory_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.skipped = 0
+
+    def key(
+        self,
+        model: str,
+        temperature: Optional[float],
+        messages: List[Message],
+        **params: Any
+    ) -> Optional[str]:
+        """
+        Compute the cache key of a completion request.
+
+        Args:
+            model: Model name
+            temperature: Sampling temperature of the request
+            messages: Messages in OpenAI format
+            params: Other request parameters affecting the output (e.g. max_tokens)
+
+        Returns:
+            The key, or None if requests at this temperature must not be cached
+        """
+        if temperature is not None and temperature > self.max_temperature:
+            return None
+        return completion_key(model, temperature, messages, **params)
+
+    async def get(self, key: str) -> Optional[str]:
+        """
+        Look a completion up, trying the per-process tier before Redis.
+
+        Args:
+            key: Key returned by `key()`
+        """
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value
+        if self.redis is not None:
+            try:
+                value = await self.redis.get(self.key_prefix + key)
+            except Exception:
+                # A Redis outage degrades to the per-process tier only
+                value = None
+            if value is not None:
+                self.redis_hits += 1
+                self.memory.set(key, value)
+                return value
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: str) -> None:
+        """
+        Store a completion in both tiers.
+
+        Args:
+            key: Key returned by `key()`
+            value: The completion text
+        """
+        if not value or len(value.encode()) > self.max_entry_bytes:
+            self.skipped += 1
+            return
+        self.memory.set(key, value)
+        self.stores += 1
+        if self.redis is not None:
+            try:
+                await self.redis.set(self.key_prefix + key, value, ex=self.redis_ttl_seconds)
+            except Exception:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the cache counters.
+        """
+        lookups = self.memory_hits + self.redis_hits + self.misses
+        return {
+            "entries": len(self.memory),
+            "max_entries": self.memory.max_entries,
+            "memory_hits": self.memory_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.memory_hits + self.redis_hits) / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "skipped": self.skipped,
+            "evictions": self.memory.evictions,
+        }
+
+
+async def replay_stream(text: str, chunk_chars: int = 24) -> AsyncIterator[str]:
+    """
+    Replay a cached completion as a stream of chunks.
+
+    Args:
+        text: The cached completion
+        chunk_chars: Number of characters per chunk
+    """
+    for start in range(0, len(text), chunk_chars):
+        yield text[start:start + chunk_chars]
+
+
+def create_completion_cache() -> CompletionCache:
+    """
+    Build the completion cache from settings, with a Redis tier if LLM_CACHE_REDIS is set.
+    """
+    redis = None
+    if settings.LLM_CACHE_REDIS:
+        from redis.asyncio import Redis
+
+        redis = Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, decode_responses=True)
+    return CompletionCache(
+        max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+        max_temperature=settings.LLM_CACHE_MAX_TEMPERATURE,
+        max_entry_bytes=settings.LLM_CACHE_MAX_ENTRY_BYTES,
+        redis=redis,
+    )
+
+
+# Shared by every call site that opts into caching
+completion_cache = create_completion_cache()
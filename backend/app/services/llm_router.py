@@ -0,0 +1,406 @@
+"""
+Routing of OpenAI-compatible requests across several LLM backends.
+
+With LLM_BACKENDS set, the OpenAI clients of the chat endpoint and the agents
+send their requests to a virtual base URL served by an LLMRouter, an httpx
+transport, instead of to a single endpoint. For each request the router:
+
+- ranks the backends by expected time to first chunk: an EWMA of the times
+  observed on each, inflated by its EWMA error rate. Backends that just failed
+  sit out LLM_BACKEND_COOLDOWN_SECONDS unless no other is left, and a small
+  fraction of requests goes to a random backend so that every backend keeps
+  being measured
+- fails over to the next backend when one cannot be reached or answers with
+  a 429 or 5xx, as long as nothing has been returned to the client yet
+- hedges streamed completions (LLM_HEDGE): if the first backend has not sent
+  its first chunk by the LLM_HEDGE_QUANTILE of its recent times, the request
+  is also sent to the next backend. The first response to produce a chunk is
+  used and the other one is cancelled (its connection closed)
+
+Each backend has its own API key and may rename the model (e.g. a self-hosted
+copy of the same model). Backend statistics are shared by all the routers of
+a process; connection pools belong to each router, i.e. to one client.
+"""
+
+import asyncio
+import json
+import random
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+from app.core.metrics import llm_backend_requests_total, llm_backend_ttft_seconds, llm_hedges_total
+
+# Base URL given to the OpenAI clients when they go through a router
+ROUTER_BASE_URL = "http://llm-router/v1"
+_ROUTER_PATH = httpx.URL(ROUTER_BASE_URL).path
+
+# Last event of a streamed completion; OpenAI clients close the response on it
+_STREAM_DONE = b"data: [DONE]"
+
+# Times observed before a backend's quantiles are trusted for hedging
+MIN_SAMPLES = 20
+
+
+class BackendStats:
+    """
+    EWMAs of the time to first chunk and of the error rate of one kind of
+    request, with a window of recent times for quantiles.
+    """
+
+    def __init__(self, alpha: float = 0.2, window: int = 200):
+        """
+        Args:
+            alpha: Weight of the latest observation in the averages
+            window: Recent times kept for quantiles
+        """
+        self.alpha = alpha
+        self.ttft: Optional[float] = None
+        self.error_rate = 0.0
+        self.recent: Deque[float] = deque(maxlen=window)
+
+    def success(self, ttft: float) -> None:
+        self.ttft = ttft if self.ttft is None else self.ttft + self.alpha * (ttft - self.ttft)
+        self.error_rate -= self.alpha * self.error_rate
+        self.recent.append(ttft)
+
+    def failure(self) -> None:
+        self.error_rate += self.alpha * (1.0 - self.error_rate)
+
+    def expected_ttft(self) -> float:
+        """Average time to first chunk including retries; 0 before the first answer, so new backends are tried."""
+        return (self.ttft or 0.0) / (1.0 - min(self.error_rate, 0.9))
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Quantile `q` of the recent times, or None until MIN_SAMPLES have been seen."""
+        if len(self.recent) < MIN_SAMPLES:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LLMBackend:
+    """
+    One OpenAI-compatible endpoint and what has been observed of it.
+    """
+
+    def __init__(self, name: str, base_url: str, api_key: str, model: Optional[str] = None):
+        """
+        Args:
+            name: Label of the backend in the metrics
+            base_url: Base URL of its API (e.g. http://host:8000/v1)
+            api_key: Key sent to it
+            model: Model name replacing the one of the requests (None: keep it)
+        """
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+        # Streamed completions and complete responses have very different first-chunk times
+        self.stats = {"stream": BackendStats(), "complete": BackendStats()}
+        self.down_until = 0.0
+
+
+class BackendUnavailable(Exception):
+    """
+    A backend could not serve a request: unreachable, timed out or answering a 429 or 5xx.
+    """
+
+    def __init__(self, backend: LLMBackend, response: Optional[httpx.Response] = None,
+                 error: Optional[Exception] = None):
+        super().__init__(f"LLM backend {backend.name} unavailable: {error or response.status_code}")
+        self.backend = backend
+        self.response = response
+        self.error = error
+
+
+class _RoutedStream(httpx.AsyncByteStream):
+    """
+    Body of a backend response whose first chunk has already been read.
+    """
+
+    def __init__(self, router: "LLMRouter", backend: LLMBackend, kind: str,
+                 first: bytes, chunks: AsyncIterator[bytes], stream: httpx.AsyncByteStream):
+        self._router = router
+        self._backend = backend
+        self._kind = kind
+        self._first = first
+        self._chunks = chunks
+        self._stream = stream
+        self._last = first
+        self._finished = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        try:
+            if self._first:
+                yield self._first
+            async for chunk in self._chunks:
+                self._last = chunk
+                yield chunk
+        except httpx.TransportError:
+            # Too late to fail over: the client has part of the response already
+            self._finish("error")
+            raise
+        self._finish("ok")
+
+    async def aclose(self) -> None:
+        # Closed before the end of the body: complete if the stream was, otherwise
+        # the client stopped reading (e.g. it disconnected)
+        self._finish("ok" if self._last.rstrip().endswith(_STREAM_DONE) else "cancelled")
+        await self._stream.aclose()
+
+    def _finish(self, outcome: str) -> None:
+        if self._finished:
+            return
+        self._finished = True
+        if outcome == "error":
+            self._router._failed(self._backend, self._kind)
+        llm_backend_requests_total.labels(self._backend.name, outcome).inc()
+
+
+class LLMRouter(httpx.AsyncBaseTransport):
+    """
+    httpx transport spreading the requests made to ROUTER_BASE_URL over several backends.
+    """
+
+    def __init__(
+        self,
+        backends: List[LLMBackend],
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_delay: float = 0.1,
+        cooldown: float = 10.0,
+        explore: float = 0.05
+    ):
+        """
+        Args:
+            backends: Backends to route between, in order of preference while nothing is known about them
+            hedge: Race a second backend when a streamed completion is late to its first chunk
+            hedge_quantile: Quantile of the first backend's recent times after which it is late
+            hedge_min_delay: Never hedge before this delay, in seconds
+            cooldown: Time a backend is skipped after a failure, in seconds
+            explore: Fraction of requests that try the backends in random order
+        """
+        if not backends:
+            raise ValueError("LLMRouter needs at least one backend")
+        self.backends = backends
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.cooldown = cooldown
+        self.explore = explore
+        # Same connection limits as the OpenAI SDK's own client, per backend
+        limits = httpx.Limits(max_connections=1000, max_keepalive_connections=100)
+        self._transports = {backend.name: httpx.AsyncHTTPTransport(limits=limits) for backend in backends}
+
+    def ranked(self, kind: str) -> List[LLMBackend]:
+        """Backends in the order they should be tried for a request of this kind."""
+        now = time.monotonic()
+        available = [backend for backend in self.backends if backend.down_until <= now]
+        if random.random() < self.explore:
+            random.shuffle(available)
+        else:
+            available.sort(key=lambda backend: backend.stats[kind].expected_ttft())
+        cooling = sorted(
+            (backend for backend in self.backends if backend.down_until > now),
+            key=lambda backend: backend.down_until,
+        )
+        return available + cooling
+
+    def hedge_delay(self, backend: LLMBackend, kind: str) -> Optional[float]:
+        """Time after which a request to `backend` is hedged, or None if it is not."""
+        if not self.hedge or kind != "stream" or len(self.backends) < 2:
+            return None
+        late = backend.stats[kind].quantile(self.hedge_quantile)
+        return None if late is None else max(self.hedge_min_delay, late)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        content = await request.aread()
+        payload = None
+        if content and request.headers.get("content-type", "").startswith("application/json"):
+            try:
+                payload = json.loads(content)
+            except ValueError:
+                pass
+        kind = "stream" if isinstance(payload, dict) and payload.get("stream") else "complete"
+        backends = self.ranked(kind)
+        return await self._route(request, content, payload, kind, backends, self.hedge_delay(backends[0], kind))
+
+    async def _route(
+        self,
+        request: httpx.Request,
+        content: bytes,
+        payload: Any,
+        kind: str,
+        backends: List[LLMBackend],
+        hedge_after: Optional[float]
+    ) -> httpx.Response:
+        candidates: Iterator[LLMBackend] = iter(backends)
+        # Attempt in flight -> whether it is a hedge
+        attempts: Dict[asyncio.Task, bool] = {}
+        hedged = False
+        last_error: Optional[BackendUnavailable] = None
+
+        def start(is_hedge: bool) -> None:
+            backend = next(candidates, None)
+            if backend is not None:
+                outgoing = self._rewrite(request, backend, content, payload)
+                attempts[asyncio.create_task(self._send(backend, outgoing, kind))] = is_hedge
+
+        start(False)
+        try:
+            while attempts:
+                done, _ = await asyncio.wait(
+                    attempts,
+                    timeout=None if hedged else hedge_after,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    # No first chunk by the deadline: race the next backend
+                    hedged = True
+                    start(True)
+                    continue
+                for task in done:
+                    is_hedge = attempts.pop(task)
+                    try:
+                        response = task.result()
+                    except BackendUnavailable as e:
+                        last_error = e
+                        continue
+                    if hedged:
+                        llm_hedges_total.labels("hedge" if is_hedge else "primary").inc()
+                    return response
+                if not attempts:
+                    # Every attempt so far failed: fail over to the next backend
+                    start(False)
+        finally:
+            for task in attempts:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled() and task.exception() is None:
+                    # Answered at the same time as the one returned
+                    await task.result().aclose()
+
+        # No backend could serve it: hand the client the last error as a backend would
+        if last_error.response is not None:
+            return last_error.response
+        raise last_error.error
+
+    def _rewrite(self, request: httpx.Request, backend: LLMBackend, content: bytes, payload: Any) -> httpx.Request:
+        """The request as sent to `backend`: its URL, key and model."""
+        path = request.url.raw_path.decode()
+        url = httpx.URL(backend.base_url + path[len(_ROUTER_PATH):])
+        headers = request.headers.copy()
+        # Recomputed for the new URL and body
+        headers.pop("host", None)
+        headers.pop("content-length", None)
+        headers["authorization"] = f"Bearer {backend.api_key}"
+        if backend.model and isinstance(payload, dict) and "model" in payload:
+            content = json.dumps({**payload, "model": backend.model}).encode()
+        return httpx.Request(request.method, url, headers=headers, content=content, extensions=request.extensions)
+
+    async def _send(self, backend: LLMBackend, request: httpx.Request, kind: str) -> httpx.Response:
+        """
+        Send a request to one backend and wait for the first chunk of its response.
+
+        Raises:
+            BackendUnavailable: If the backend cannot serve it
+        """
+        started = time.monotonic()
+        response = None
+        try:
+            response = await self._transports[backend.name].handle_async_request(request)
+            if response.status_code == 429 or response.status_code >= 500:
+                body = await response.aread()
+                await response.aclose()
+                self._failed(backend, kind)
+                llm_backend_requests_total.labels(backend.name, "error").inc()
+                error_response = httpx.Response(response.status_code, headers=response.headers, content=body)
+                raise BackendUnavailable(backend, response=error_response)
+            chunks = response.stream.__aiter__()
+            try:
+                first = await chunks.__anext__()
+            except StopAsyncIteration:
+                first = b""
+        except httpx.TransportError as e:
+            if response is not None:
+                await response.aclose()
+            self._failed(backend, kind)
+            llm_backend_requests_total.labels(backend.name, "error").inc()
+            raise BackendUnavailable(backend, error=e) from e
+        except asyncio.CancelledError:
+            # Lost a hedge race: drop the connection so the backend stops generating
+            if response is not None:
+                await response.aclose()
+            llm_backend_requests_total.labels(backend.name, "cancelled").inc()
+            raise
+
+        ttft = time.monotonic() - started
+        backend.stats[kind].success(ttft)
+        llm_backend_ttft_seconds.labels(backend.name, kind).observe(ttft)
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_RoutedStream(self, backend, kind, first, chunks, response.stream),
+            extensions=response.extensions,
+        )
+
+    def _failed(self, backend: LLMBackend, kind: str) -> None:
+        backend.stats[kind].failure()
+        backend.down_until = time.monotonic() + self.cooldown
+
+    async def aclose(self) -> None:
+        for transport in self._transports.values():
+            await transport.aclose()
+
+
+def create_llm_backends() -> List[LLMBackend]:
+    """
+    Build the backends listed in `LLM_BACKENDS`, with OPENAI_API_KEY as the default key.
+    """
+    backends = []
+    for i, spec in enumerate(settings.LLM_BACKENDS):
+        if "base_url" not in spec:
+            raise ValueError(f"LLM_BACKENDS entry {i} has no base_url")
+        backends.append(LLMBackend(
+            name=spec.get("name") or f"backend-{i}",
+            base_url=spec["base_url"],
+            api_key=spec.get("api_key") or settings.OPENAI_API_KEY,
+            model=spec.get("model"),
+        ))
+    return backends
+
+
+# Shared by the routers of this process, so that every client benefits from what the others observed
+llm_backends = create_llm_backends()
+
+
+def create_llm_router() -> Optional[LLMRouter]:
+    """
+    Build a router over `llm_backends` from settings, or None if LLM_BACKENDS is empty.
+    """
+    if not llm_backends:
+        return None
+    return LLMRouter(
+        llm_backends,
+        hedge=settings.LLM_HEDGE,
+        hedge_quantile=settings.LLM_HEDGE_QUANTILE,
+        hedge_min_delay=settings.LLM_HEDGE_MIN_DELAY_SECONDS,
+        cooldown=settings.LLM_BACKEND_COOLDOWN_SECONDS,
+    )
+
+
+def openai_endpoint() -> Tuple[Optional[str], Optional[httpx.AsyncClient]]:
+    """
+    Base URL and HTTP client for a new OpenAI client (AsyncOpenAI's `http_client`,
+    ChatOpenAI's `http_async_client`): a router when LLM_BACKENDS is set,
+    otherwise OPENAI_BASE_URL and the SDK's default client.
+    """
+    router = create_llm_router()
+    if router is None:
+        return settings.OPENAI_BASE_URL, None
+    timeout = httpx.Timeout(settings.OPENAI_READ_TIMEOUT, connect=settings.OPENAI_CONNECT_TIMEOUT)
+    return ROUTER_BASE_URL, httpx.AsyncClient(transport=router, timeout=timeout)
@@ -0,0 +1,111 @@
+"""
+Compact in-memory representation of conversation messages.
+
+A message held for a session is a StoredMessage (two slots, no per-instance
+dict) whose role is an interned string. System prompts registered with
+`system_prompts.register()` are kept once per version as a SystemPrompt and
+every session refers to that object instead of holding the text; in Redis a
+reference is stored as {"role": "system", "prompt": <version>} and the text
+once under its own key.
+
+Messages are converted to the OpenAI format (`to_openai()`) only when a
+request is built.
+"""
+
+import hashlib
+import sys
+from typing import Dict, Optional, Union
+
+Message = Dict[str, str]
+
+# Roles are shared by every message rather than stored as a fresh string each
+ROLES = {role: sys.intern(role) for role in ("system", "user", "assistant", "tool")}
+
+
+def intern_role(role: str) -> str:
+    """Return the shared instance of a role name."""
+    return ROLES.get(role) or sys.intern(role)
+
+
+class SystemPrompt:
+    """
+    A registered system prompt, identified by a version derived from its text.
+    """
+
+    __slots__ = ("version", "text")
+
+    def __init__(self, text: str):
+        self.version = hashlib.sha256(text.encode()).hexdigest()[:16]
+        self.text = text
+
+
+class SystemPromptRegistry:
+    """
+    System prompts of this process, by text and by version.
+    """
+
+    def __init__(self):
+        self._by_text: Dict[str, SystemPrompt] = {}
+        self._by_version: Dict[str, SystemPrompt] = {}
+
+    def register(self, text: str) -> str:
+        """
+        Register a prompt so that sessions share it instead of copying it.
+
+        Returns:
+            The registered text (the instance every session refers to)
+        """
+        prompt = self._by_text.get(text)
+        if prompt is None:
+            prompt = SystemPrompt(text)
+            self._by_text[text] = prompt
+            self._by_version[prompt.version] = prompt
+        return prompt.text
+
+    def find(self, text: str) -> Optional[SystemPrompt]:
+        """Return the registered prompt with this text, if any."""
+        return self._by_text.get(text)
+
+    def get(self, version: str) -> Optional[SystemPrompt]:
+        """Return the registered prompt with this version, if any."""
+        return self._by_version.get(version)
+
+
+# Prompts registered by the modules that define them (e.g. the chat endpoint)
+system_prompts = SystemPromptRegistry()
+
+
+class StoredMessage:
+    """
+    One message of a session: an interned role and either its text or a
+    shared SystemPrompt.
+    """
+
+    __slots__ = ("role", "content")
+
+    def __init__(self, role: str, content: Union[str, SystemPrompt]):
+        self.role = intern_role(role)
+        self.content = content
+
+    @classmethod
+    def from_openai(cls, message: Message) -> "StoredMessage":
+        """Convert a message in the OpenAI format, sharing registered system prompts."""
+        content = message["content"]
+        if message["role"] == "system":
+            content = system_prompts.find(content) or content
+        return cls(message["role"], content)
+
+    @property
+    def text(self) -> str:
+        content = self.content
+        return content.text if isinstance(content, SystemPrompt) else content
+
+    def to_openai(self) -> Message:
+        """Return the message in the OpenAI format (a new dict)."""
+        return {"role": self.role, "content": self.text}
+
+    def size(self) -> int:
+        """Approximate bytes this message adds to a session (shared prompts count as 0)."""
+        if isinstance(self.content, SystemPrompt):
+            return sys.getsizeof(self)
+        return sys.getsizeof(self) + sys.getsizeof(self.content)
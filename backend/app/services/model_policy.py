@@ -0,0 +1,251 @@
+"""
+Choice of model by conversation phase.
+
+Most turns of a conversation are short questions ("what are your dates?")
+that a small model answers as well as a large one, faster and for a fraction
+of the price; only the itinerary and the bookings need the large model. Every
+LLM call names the phase it belongs to and gets that phase's model and
+max_tokens from MODEL_PHASES (phases left out use OPENAI_MODEL and
+OPENAI_MAX_TOKENS):
+
+- gathering: the questions asked while travel information is missing
+- extraction: parsing the preferences stated in a user message
+- itinerary: generating or revising the itinerary
+- booking: Concierge turns
+
+Calls are reported per phase: latency, tokens and cost (MODEL_PRICES), as
+metrics and in `stats()`.
+
+The chat endpoint guesses its phase from the transcript (`chat_phase()`). A
+guess can miss the turn on which the itinerary is written, so its gathering
+replies go through `guard_gathering_reply()`: one that opens with the
+itinerary heading is asked again on the itinerary phase instead of being cut
+at the gathering max_tokens.
+"""
+
+import re
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from app.core.config import settings
+from app.core.metrics import llm_phase_cost_usd_total, llm_phase_requests_total, llm_phase_seconds
+
+PHASES = ("gathering", "extraction", "itinerary", "booking")
+
+# Words of a user message, or of the assistant question it answers, that call for the itinerary
+ITINERARY_CUES = ("itinerary", "day by day", "day-by-day", "plan my trip", "plan the trip", "schedule")
+
+# What the chat prompt asks about before it writes the itinerary, by whole words of the questions asking it.
+# Missing a wording only delays the switch to the guard (guard_gathering_reply), so common words are left out
+GATHERING_TOPICS = (
+    ("destination", "destinations"),
+    ("date", "dates"),
+    ("style",),
+    ("accommodation", "accommodations", "hotel", "hotels"),
+    ("interest", "interests", "interested", "activity", "activities"),
+    ("group", "travelling with", "traveling with"),
+    ("dietary", "requirement", "requirements"),
+    ("budget",),
+)
+_TOPIC_PATTERNS = [re.compile(r"\b(?:" + "|".join(words) + r")\b") for words in GATHERING_TOPICS]
+
+# First line of the itinerary template of the chat prompt ("# Lisbon Itinerary: June 3 - June 6")
+ITINERARY_HEADING = re.compile(r"#[^\S\n]+[^\n]*\bitinerary\b", re.IGNORECASE)
+
+# Longest first line held back while deciding whether a reply starts the itinerary
+MAX_HEADING_CHARS = 200
+
+
+class PhaseModel(NamedTuple):
+    model: str
+    max_tokens: int
+
+
+class _PhaseStats:
+    __slots__ = ("calls", "seconds", "prompt_tokens", "completion_tokens", "cost")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+
+
+class ModelPolicy:
+    """
+    Model and max_tokens of each phase, and what the calls of each phase cost.
+    """
+
+    def __init__(
+        self,
+        phases: Dict[str, Dict[str, Any]],
+        default: PhaseModel,
+        prices: Dict[str, Sequence[float]]
+    ):
+        """
+        Args:
+            phases: Phase -> {"model", "max_tokens"}; missing keys use `default`
+            default: Model of the phases not configured
+            prices: Model -> (USD per million prompt tokens, USD per million completion tokens)
+        """
+        unknown = set(phases) - set(PHASES)
+        if unknown:
+            raise ValueError(f"Unknown phases in MODEL_PHASES: {', '.join(sorted(unknown))}")
+        self.default = default
+        self.prices = prices
+        self._models = {
+            phase: PhaseModel(
+                model=phases.get(phase, {}).get("model") or default.model,
+                max_tokens=int(phases.get(phase, {}).get("max_tokens") or default.max_tokens),
+            )
+            for phase in PHASES
+        }
+        self._stats = {phase: _PhaseStats() for phase in PHASES}
+
+    def for_phase(self, phase: str) -> PhaseModel:
+        """Model and max_tokens of a phase."""
+        return self._models[phase]
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        """Price of a call in USD (0 for models without a price)."""
+        prompt_price, completion_price = self.prices.get(model, (0.0, 0.0))
+        return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+    def record(self, phase: str, model: str, seconds: float, prompt_tokens: int = 0, completion_tokens: int = 0) -> None:
+        """
+        Record a finished call.
+
+        Args:
+            phase: Phase the call belonged to
+            model: Model that answered it
+            seconds: Duration of the call
+            prompt_tokens: Prompt tokens used, if known
+            completion_tokens: Completion tokens used, if known
+        """
+        cost = self.cost(model, prompt_tokens, completion_tokens)
+        llm_phase_requests_total.labels(phase, model).inc()
+        llm_phase_seconds.labels(phase).observe(seconds)
+        llm_phase_cost_usd_total.labels(phase, model).inc(cost)
+        stats = self._stats[phase]
+        stats.calls += 1
+        stats.seconds += seconds
+        stats.prompt_tokens += prompt_tokens
+        stats.completion_tokens += completion_tokens
+        stats.cost += cost
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Model, calls, average latency, tokens and cost of each phase since startup."""
+        return {
+            phase: {
+                "model": self._models[phase].model,
+                "max_tokens": self._models[phase].max_tokens,
+                "calls": stats.calls,
+                "avg_seconds": stats.seconds / stats.calls if stats.calls else 0.0,
+                "prompt_tokens": stats.prompt_tokens,
+                "completion_tokens": stats.completion_tokens,
+                "cost_usd": round(stats.cost, 6),
+            }
+            for phase, stats in self._stats.items()
+        }
+
+
+def chat_phase(messages: List[Dict[str, str]]) -> str:
+    """
+    Phase of a turn of the chat endpoint, which tracks no preferences: the
+    itinerary once the user asks for it, answers an offer to write it or the
+    last of the questions the prompt asks first (GATHERING_TOPICS), which the
+    itinerary follows, or follows up on one; gathering otherwise.
+
+    Args:
+        messages: The conversation, ending with the new user message
+    """
+    user = assistant = ""
+    for message in reversed(messages):
+        if message["role"] == "user" and not user:
+            user = message["content"].lower()
+        elif message["role"] == "assistant":
+            assistant = message["content"].lower()
+            break
+    if any(cue in user for cue in ITINERARY_CUES):
+        return "itinerary"
+    # An itinerary was just presented (its "## Day" headings): the user is revising it
+    if "## day" in assistant:
+        return "itinerary"
+    if assistant.rstrip().endswith("?") and any(cue in assistant for cue in ITINERARY_CUES):
+        return "itinerary"
+    # Every topic has been asked about: the user answered the last question
+    questions = [
+        message["content"].lower() for message in messages
+        if message["role"] == "assistant" and "?" in message["content"]
+    ]
+    if questions and all(any(pattern.search(question) for question in questions) for pattern in _TOPIC_PATTERNS):
+        return "itinerary"
+    return "gathering"
+
+
+def starts_itinerary(head: str) -> Optional[bool]:
+    """
+    Whether a reply beginning with `head` starts the itinerary template, or
+    None while that cannot be told yet (a "#" heading whose line is incomplete).
+    """
+    text = head.lstrip()
+    if not text:
+        return None
+    if not text.startswith("#"):
+        return False
+    line, newline, _ = text.partition("\n")
+    if ITINERARY_HEADING.match(line):
+        return True
+    return False if newline or len(line) > MAX_HEADING_CHARS else None
+
+
+async def guard_gathering_reply(
+    deltas: AsyncIterator[str],
+    escalate: Callable[[AsyncIterator[str]], Awaitable[AsyncIterator[str]]]
+) -> AsyncIterator[str]:
+    """
+    Deltas of a gathering-phase reply, unless it starts the itinerary template:
+    then `escalate(deltas)` closes that stream and returns the deltas of the
+    same request on the itinerary phase, which are streamed instead. Only
+    replies opening with "#" are held back, until their first line is complete.
+
+    Args:
+        deltas: Deltas of the gathering-phase call
+        escalate: Replaces the gathering-phase call by an itinerary-phase one
+    """
+    stream = deltas
+    try:
+        head = ""
+        async for delta in stream:
+            head += delta
+            decision = starts_itinerary(head)
+            if decision is None:
+                continue
+            if decision:
+                stream = await escalate(deltas)
+            else:
+                yield head
+            break
+        else:
+            if head:
+                yield head
+            return
+        async for delta in stream:
+            yield delta
+    finally:
+        await stream.aclose()
+
+
+def create_model_policy() -> ModelPolicy:
+    """
+    Build the model policy from settings.
+    """
+    return ModelPolicy(
+        phases=settings.MODEL_PHASES,
+        default=PhaseModel(settings.OPENAI_MODEL, settings.OPENAI_MAX_TOKENS),
+        prices=settings.MODEL_PRICES,
+    )
+
+
+# Shared by the chat endpoint and the agents of this process
+model_policy = create_model_policy()
@@ -0,0 +1,264 @@
+"""
+Durable conversation history.
+
+Messages are archived to the database behind the hot session store, without
+adding database latency to each turn: callers queue messages and a background
+task writes them in bulk, whenever PERSISTENCE_BATCH_SIZE messages are waiting
+or PERSISTENCE_FLUSH_INTERVAL_SECONDS have passed. The queue is bounded; when
+the database falls behind, `put` waits for room (backpressure) and `submit`,
+used from synchronous code, drops the message and counts it. Everything queued
+is written on shutdown by `close()`.
+
+Archived conversations are read back with `load()` to rehydrate sessions that
+are no longer in the hot store (evicted, expired, or lost in a restart).
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.core.config import settings
+from app.core.database import get_async_sessionmaker
+from app.core.metrics import persisted_messages_total, persistence_flush_seconds, persistence_queue_depth
+from app.models.base import ConversationMessage, ConversationSession
+from app.schemas.base import MessageCreate
+
+logger = logging.getLogger(__name__)
+
+# Message in the OpenAI chat format used by the session store
+Message = Dict[str, str]
+
+
+class ConversationWriter:
+    """
+    Persistence disabled: messages are discarded and nothing can be rehydrated.
+    Base class of the write-behind writer, so callers never check which one they have.
+    """
+
+    async def put(self, session_id: str, role: str, content: str, source: str = "chat") -> None:
+        """
+        Queue a message for persistence, waiting for room if the queue is full.
+
+        Args:
+            session_id: Conversation the message belongs to
+            role: "user" or "assistant"
+            content: Message text
+            source: "chat" or the name of the agent
+        """
+
+    def submit(self, session_id: str, role: str, content: str, source: str = "chat") -> None:
+        """
+        Queue a message without waiting, for synchronous callers.
+        The message is dropped (and counted) if the queue is full.
+        """
+
+    async def load(self, session_id: str) -> Optional[List[Message]]:
+        """
+        Read an archived conversation.
+
+        Args:
+            session_id: The conversation to read
+
+        Returns:
+            Its messages in order, or None if nothing was archived
+        """
+        return None
+
+    async def start(self) -> None:
+        """
+        Prepare the writer (e.g. create missing tables) at application startup.
+        """
+
+    async def close(self) -> None:
+        """
+        Write everything still queued, then stop.
+        """
+
+
+class WriteBehindConversationWriter(ConversationWriter):
+    """
+    Bounded queue of messages written to the database in batches by a background task.
+    """
+
+    def __init__(
+        self,
+        sessionmaker: Callable[[], Any],
+        batch_size: int,
+        flush_interval: float,
+        max_pending: int,
+        create_tables: bool = False,
+        max_attempts: int = 3
+    ):
+        """
+        Args:
+            sessionmaker: Returns the async_sessionmaker to write with (called on first use)
+            batch_size: Maximum messages written per batch
+            flush_interval: Maximum time a queued message waits for its batch, in seconds
+            max_pending: Capacity of the queue
+            create_tables: Create the conversation tables in start() if they are missing
+            max_attempts: Attempts per batch before its messages are dropped
+        """
+        self._sessionmaker = sessionmaker
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.create_tables = create_tables
+        self.max_attempts = max_attempts
+        # Created on first use, inside the event loop that runs the writer
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _ensure_running(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            persistence_queue_depth.set_function(self._queue.qsize)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return self._queue
+
+    async def put(self, session_id: str, role: str, content: str, source: str = "chat") -> None:
+        await self._ensure_running().put(
+            MessageCreate(session_id=session_id, source=source, role=role, content=content)
+        )
+
+    def submit(self, session_id: str, role: str, content: str, source: str = "chat") -> None:
+        try:
+            self._ensure_running().put_nowait(
+                MessageCreate(session_id=session_id, source=source, role=role, content=content)
+            )
+        except (asyncio.QueueFull, RuntimeError):
+            # Queue full, or called outside an event loop
+            persisted_messages_total.labels("dropped").inc()
+
+    async def _next_batch(self) -> List[MessageCreate]:
+        """Wait for a message, then collect more until the batch is full or the interval has passed."""
+        queue = self._queue
+        batch = [await queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            # Take whatever is already queued before waiting again
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            remaining = deadline - time.monotonic()
+            if len(batch) >= self.batch_size or remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._write_with_retries(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write_with_retries(self, batch: List[MessageCreate]) -> None:
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                with persistence_flush_seconds.time():
+                    await self._write(batch)
+                persisted_messages_total.labels("written").inc(len(batch))
+                return
+            except Exception:
+                if attempt == self.max_attempts:
+                    logger.exception("Dropping %d conversation messages after %d attempts", len(batch), attempt)
+                    persisted_messages_total.labels("failed").inc(len(batch))
+                    return
+                await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+
+    async def _write(self, batch: List[MessageCreate]) -> None:
+        """Upsert the sessions of the batch and insert its messages in one transaction."""
+        sessions: Dict[str, Dict[str, Any]] = {}
+        for message in batch:
+            session = sessions.setdefault(message.session_id, {
+                "id": message.session_id,
+                "source": message.source,
+                "created_at": message.created_at,
+            })
+            session["updated_at"] = message.created_at
+
+        async with self._sessionmaker()() as db:
+            async with db.begin():
+                dialect = db.bind.dialect.name
+                upsert = (postgresql.insert if dialect == "postgresql" else sqlite.insert)(ConversationSession)
+                await db.execute(
+                    upsert.on_conflict_do_update(
+                        index_elements=["id"],
+                        set_={"updated_at": upsert.excluded.updated_at}
+                    ),
+                    list(sessions.values())
+                )
+                await db.execute(
+                    insert(ConversationMessage),
+                    [
+                        {
+                            "session_id": message.session_id,
+                            "role": message.role,
+                            "content": message.content,
+                            "created_at": message.created_at,
+                        }
+                        for message in batch
+                    ]
+                )
+
+    async def load(self, session_id: str) -> Optional[List[Message]]:
+        async with self._sessionmaker()() as db:
+            rows = (await db.execute(
+                select(ConversationMessage.role, ConversationMessage.content)
+                .where(ConversationMessage.session_id == session_id)
+                .order_by(ConversationMessage.id)
+            )).all()
+        if not rows:
+            return None
+        return [{"role": role, "content": content} for role, content in rows]
+
+    async def start(self) -> None:
+        if self.create_tables:
+            async with self._sessionmaker()() as db:
+                connection = await db.connection()
+                await connection.run_sync(
+                    lambda sync_connection: ConversationSession.metadata.create_all(
+                        sync_connection,
+                        tables=[ConversationSession.__table__, ConversationMessage.__table__]
+                    )
+                )
+                await db.commit()
+
+    async def close(self) -> None:
+        if self._queue is None:
+            return
+        # Wait until every queued message has been written (or given up on)
+        await self._queue.join()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+def create_conversation_writer() -> ConversationWriter:
+    """
+    Build the conversation writer: write-behind to the database when
+    `PERSISTENCE_ENABLED` is set, a no-op writer otherwise.
+    """
+    if not settings.PERSISTENCE_ENABLED:
+        return ConversationWriter()
+    return WriteBehindConversationWriter(
+        get_async_sessionmaker,
+        batch_size=settings.PERSISTENCE_BATCH_SIZE,
+        flush_interval=settings.PERSISTENCE_FLUSH_INTERVAL_SECONDS,
+        max_pending=settings.PERSISTENCE_MAX_PENDING,
+        create_tables=settings.PERSISTENCE_CREATE_TABLES,
+    )
+
+
+# Shared by the chat endpoint and the agents of this process
+conversation_writer = create_conversation_writer()
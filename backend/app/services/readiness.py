@@ -0,0 +1,43 @@
+"""
+Readiness checks used by /health.
+"""
+
+import asyncio
+import time
+from typing import Any
+
+
+class UpstreamProbe:
+    """
+    Checks that the OpenAI-compatible upstream answers, caching the result so
+    that frequent health checks do not turn into a stream of upstream calls.
+    """
+
+    def __init__(self, client: Any, ttl_seconds: float = 15.0, timeout_seconds: float = 2.0):
+        """
+        Args:
+            client: An `AsyncOpenAI` client
+            ttl_seconds: How long a probe result is reused
+            timeout_seconds: Maximum time allowed for a probe
+        """
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.timeout_seconds = timeout_seconds
+        self._checked_at = float("-inf")
+        self._healthy = False
+        self._lock = asyncio.Lock()
+
+    async def check(self) -> bool:
+        """
+        Return whether the upstream is reachable, probing it at most once per TTL.
+        """
+        async with self._lock:
+            if time.monotonic() - self._checked_at < self.ttl_seconds:
+                return self._healthy
+            try:
+                await asyncio.wait_for(self.client.models.list(), self.timeout_seconds)
+                self._healthy = True
+            except Exception:
+                self._healthy = False
+            self._checked_at = time.monotonic()
+            return self._healthy
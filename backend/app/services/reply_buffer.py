@@ -0,0 +1,293 @@
+"""
+Buffered chat replies that clients can resume after a dropped connection.
+
+Streamed chat replies are produced by a background task that appends each
+chunk, with a sequence number, to a ReplyBuffer; the HTTP response only reads
+the buffer. When the connection drops the reply keeps being buffered, and a
+reconnect sending `Last-Event-ID: <reply id>:<seq>` reads on from that point
+without a new upstream call or a second user message.
+
+- InMemoryReplyBuffer: replies of this worker, readers woken as chunks arrive
+- RedisReplyBuffer: one Redis stream per reply (entry id `<seq>-1`), readable
+  from any worker
+- TieredReplyBuffer: writes to both, reads locally when the reply is held by
+  this worker and from Redis otherwise (a reconnect landing on another worker)
+
+Readers of a reply produced by another worker hold a lease on it in the shared
+store (`touch_reader`), so that the producing worker does not abandon a reply
+that is still being read elsewhere (`has_reader`).
+"""
+
+import asyncio
+import json
+import logging
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# (sequence number, event type, payload)
+ReplyEvent = Tuple[int, str, Dict[str, Any]]
+
+# Event types that end a reply
+TERMINAL_EVENTS = ("done", "error")
+
+
+def parse_event_id(event_id: Optional[str]) -> Optional[Tuple[str, int]]:
+    """
+    Split a `<reply id>:<seq>` event id, as sent back in Last-Event-ID.
+
+    Returns:
+        (reply id, sequence number), or None if it is not a reply event id
+    """
+    if not event_id or ":" not in event_id:
+        return None
+    reply_id, _, seq = event_id.rpartition(":")
+    return (reply_id, int(seq)) if seq.isdigit() and reply_id else None
+
+
+class ReplyBuffer(ABC):
+    """
+    Abstract interface for appending and reading the events of replies.
+    """
+
+    @abstractmethod
+    async def append(self, reply_id: str, seq: int, event_type: str, data: Dict[str, Any]) -> None:
+        """
+        Append an event to a reply. Sequence numbers start at 0 and increase by one.
+
+        Args:
+            reply_id: The reply identifier
+            seq: Sequence number of the event
+            event_type: "start", "message", "done" or "error", or an itinerary
+                event (see app/services/itinerary_stream.py)
+            data: JSON-serialisable payload
+        """
+
+    @abstractmethod
+    async def read(self, reply_id: str, after: int, timeout: float) -> Optional[List[ReplyEvent]]:
+        """
+        Return the events after sequence number `after`, waiting up to `timeout`
+        seconds for new ones if there are none yet.
+
+        Returns:
+            The events (empty on timeout), or None if the reply is unknown or expired
+        """
+
+    async def touch_reader(self, reply_id: str, reader_id: str, ttl: float) -> None:
+        """
+        Record that a reader is reading a reply, for the next `ttl` seconds.
+        Buffers that are not shared between workers need not track readers.
+
+        Args:
+            reply_id: The reply identifier
+            reader_id: Identifier of the reader, unique per response
+            ttl: Seconds after which the lease lapses unless touched again
+        """
+
+    async def release_reader(self, reply_id: str, reader_id: str) -> None:
+        """
+        End the lease of a reader that stopped reading a reply.
+        """
+
+    async def has_reader(self, reply_id: str) -> bool:
+        """
+        Whether a reader holds an unexpired lease on a reply.
+        """
+        return False
+
+    async def close(self) -> None:
+        """
+        Release any resources held by the buffer.
+        """
+
+
+class _Reply:
+    __slots__ = ("events", "updated", "changed")
+
+    def __init__(self):
+        self.events: List[ReplyEvent] = []
+        self.updated = time.monotonic()
+        self.changed = asyncio.Event()
+
+
+class InMemoryReplyBuffer(ReplyBuffer):
+    """
+    Replies held by this worker, bounded in number and expired after a TTL.
+    """
+
+    def __init__(self, ttl_seconds: float, max_replies: int):
+        """
+        Args:
+            ttl_seconds: How long a reply is kept after its last event
+            max_replies: Replies kept at most; the least recently updated are dropped first
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_replies = max_replies
+        self._replies: "OrderedDict[str, _Reply]" = OrderedDict()
+
+    def _get(self, reply_id: str) -> Optional[_Reply]:
+        reply = self._replies.get(reply_id)
+        if reply is not None and time.monotonic() - reply.updated > self.ttl_seconds:
+            del self._replies[reply_id]
+            return None
+        return reply
+
+    def __contains__(self, reply_id: str) -> bool:
+        return self._get(reply_id) is not None
+
+    async def append(self, reply_id: str, seq: int, event_type: str, data: Dict[str, Any]) -> None:
+        reply = self._replies.get(reply_id)
+        if reply is None:
+            reply = self._replies[reply_id] = _Reply()
+            while len(self._replies) > self.max_replies:
+                self._replies.popitem(last=False)
+        reply.events.append((seq, event_type, data))
+        reply.updated = time.monotonic()
+        self._replies.move_to_end(reply_id)
+        # Wake the readers, then give the next ones a fresh event to wait on
+        reply.changed.set()
+        reply.changed = asyncio.Event()
+
+    async def read(self, reply_id: str, after: int, timeout: float) -> Optional[List[ReplyEvent]]:
+        reply = self._get(reply_id)
+        if reply is None:
+            return None
+        # Sequence numbers are list positions
+        if len(reply.events) <= after + 1:
+            try:
+                await asyncio.wait_for(reply.changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        return reply.events[after + 1:]
+
+
+class RedisReplyBuffer(ReplyBuffer):
+    """
+    Replies stored as Redis streams, so that any worker can resume them.
+    """
+
+    def __init__(
+        self,
+        redis: Any,
+        ttl_seconds: int,
+        key_prefix: str = "triphelix:reply:",
+        readers_prefix: str = "triphelix:reply-readers:"
+    ):
+        """
+        Args:
+            redis: A `redis.asyncio.Redis` client
+            ttl_seconds: How long a reply is kept after its last event
+            key_prefix: Prefix of the Redis keys of the replies
+            readers_prefix: Prefix of the sorted sets of reader leases (reader id -> expiry time)
+        """
+        self.redis = redis
+        self.ttl_seconds = ttl_seconds
+        self.key_prefix = key_prefix
+        self.readers_prefix = readers_prefix
+
+    async def append(self, reply_id: str, seq: int, event_type: str, data: Dict[str, Any]) -> None:
+        key = self.key_prefix + reply_id
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.xadd(key, {"type": event_type, "data": json.dumps(data)}, id=f"{seq}-1")
+            pipe.expire(key, self.ttl_seconds)
+            await pipe.execute()
+
+    async def read(self, reply_id: str, after: int, timeout: float) -> Optional[List[ReplyEvent]]:
+        key = self.key_prefix + reply_id
+        response = await self.redis.xread({key: f"{after}-1"}, count=100, block=max(1, int(timeout * 1000)))
+        events = []
+        for _, entries in response or []:
+            for entry_id, fields in entries:
+                events.append((int(entry_id.split("-")[0]), fields["type"], json.loads(fields["data"])))
+        if not events and not await self.redis.exists(key):
+            return None
+        return events
+
+    async def touch_reader(self, reply_id: str, reader_id: str, ttl: float) -> None:
+        key = self.readers_prefix + reply_id
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.zadd(key, {reader_id: time.time() + ttl})
+            pipe.expire(key, math.ceil(ttl))
+            await pipe.execute()
+
+    async def release_reader(self, reply_id: str, reader_id: str) -> None:
+        await self.redis.zrem(self.readers_prefix + reply_id, reader_id)
+
+    async def has_reader(self, reply_id: str) -> bool:
+        return await self.redis.zcount(self.readers_prefix + reply_id, time.time(), "+inf") > 0
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+
+class TieredReplyBuffer(ReplyBuffer):
+    """
+    In-process buffer in front of a shared one.
+    """
+
+    def __init__(self, local: InMemoryReplyBuffer, shared: ReplyBuffer):
+        self.local = local
+        self.shared = shared
+
+    async def append(self, reply_id: str, seq: int, event_type: str, data: Dict[str, Any]) -> None:
+        # Local readers first, so the shared write never delays this worker's clients
+        await self.local.append(reply_id, seq, event_type, data)
+        try:
+            await self.shared.append(reply_id, seq, event_type, data)
+        except Exception:
+            # A Redis outage only costs resumption from other workers
+            logger.warning("Could not buffer reply %s in the shared tier", reply_id, exc_info=True)
+
+    async def read(self, reply_id: str, after: int, timeout: float) -> Optional[List[ReplyEvent]]:
+        if reply_id in self.local:
+            return await self.local.read(reply_id, after, timeout)
+        return await self.shared.read(reply_id, after, timeout)
+
+    async def touch_reader(self, reply_id: str, reader_id: str, ttl: float) -> None:
+        try:
+            await self.shared.touch_reader(reply_id, reader_id, ttl)
+        except Exception:
+            # The producing worker may then abandon the reply as if nobody read it
+            logger.warning("Could not renew the reader lease of reply %s", reply_id, exc_info=True)
+
+    async def release_reader(self, reply_id: str, reader_id: str) -> None:
+        try:
+            await self.shared.release_reader(reply_id, reader_id)
+        except Exception:
+            # Lapses on its own after its ttl
+            logger.warning("Could not release the reader lease of reply %s", reply_id, exc_info=True)
+
+    async def has_reader(self, reply_id: str) -> bool:
+        try:
+            return await self.shared.has_reader(reply_id)
+        except Exception:
+            logger.warning("Could not check the reader leases of reply %s", reply_id, exc_info=True)
+            return False
+
+    async def close(self) -> None:
+        await self.shared.close()
+
+
+def create_reply_buffer() -> ReplyBuffer:
+    """
+    Build the reply buffer selected by `REPLY_BUFFER_BACKEND`: "memory" (resume on
+    the same worker only) or "redis" (in-process tier plus Redis, resume anywhere).
+    """
+    local = InMemoryReplyBuffer(
+        ttl_seconds=settings.REPLY_BUFFER_TTL_SECONDS,
+        max_replies=settings.REPLY_BUFFER_MAX_REPLIES,
+    )
+    if settings.REPLY_BUFFER_BACKEND == "memory":
+        return local
+    if settings.REPLY_BUFFER_BACKEND == "redis":
+        from redis.asyncio import Redis
+
+        redis = Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, decode_responses=True)
+        return TieredReplyBuffer(local, RedisReplyBuffer(redis, ttl_seconds=settings.REPLY_BUFFER_TTL_SECONDS))
+    raise ValueError(f"Unknown REPLY_BUFFER_BACKEND: {settings.REPLY_BUFFER_BACKEND!r}")
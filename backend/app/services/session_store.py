@@ -0,0 +1,377 @@
+"""
+Session storage for chat conversations.
+
+The chat endpoint keeps the message history of every session in a SessionStore.
+Two implementations are provided:
+- InMemorySessionStore: bounded per-process store with LRU eviction and a sliding TTL
+- RedisSessionStore: shared store so that every uvicorn worker sees the same sessions
+
+The agents keep their per-session state (histories, collected preferences) in
+SessionMap, which bounds it the way InMemorySessionStore does.
+
+Both expose counters through `stats()` so workers can be sized and scaled out.
+Messages are held in the compact form of app.services.messages (registered
+system prompts are stored once, not per session) and returned in the OpenAI
+format by `get()`.
+"""
+
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Generic, List, Optional, Set, Tuple, TypeVar
+
+from app.core.config import settings
+from app.services.messages import StoredMessage, SystemPrompt, system_prompts
+
+Message = Dict[str, str]
+
+V = TypeVar("V")
+
+
+class SessionStore(ABC):
+    """
+    Abstract interface for storing conversation histories keyed by session id.
+    """
+
+    @abstractmethod
+    async def get(self, session_id: str) -> Optional[List[Message]]:
+        """
+        Return the messages of a session, or None if it does not exist or has expired.
+
+        Args:
+            session_id: The session identifier
+        """
+
+    @abstractmethod
+    async def append(self, session_id: str, messages: List[Message]) -> None:
+        """
+        Append messages to a session, creating it if needed, and refresh its TTL.
+
+        Args:
+            session_id: The session identifier
+            messages: Messages to append, in order
+        """
+
+    @abstractmethod
+    async def delete(self, session_id: str) -> None:
+        """
+        Remove a session.
+
+        Args:
+            session_id: The session identifier
+        """
+
+    @abstractmethod
+    async def stats(self) -> Dict[str, Any]:
+        """
+        Return counters describing the store (sessions, memory, evictions, ...).
+        """
+
+    async def ping(self) -> bool:
+        """
+        Check that the store is reachable.
+        """
+        return True
+
+    async def close(self) -> None:
+        """
+        Release any resources held by the store.
+        """
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Per-process session store bounded by a maximum number of sessions.
+
+    Sessions are kept in least-recently-used order. When the store is full the
+    least recently used session is evicted, and sessions that have not been
+    touched for `ttl_seconds` are dropped when they are next looked at or when
+    they reach the front of the LRU order.
+    """
+
+    def __init__(self, max_sessions: int, ttl_seconds: float):
+        """
+        Args:
+            max_sessions: Maximum number of sessions kept resident
+            ttl_seconds: Idle time after which a session expires
+        """
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        # session_id -> (expires_at, messages, approximate size in bytes)
+        self._sessions: "OrderedDict[str, Tuple[float, List[StoredMessage], int]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _drop(self, session_id: str) -> None:
+        _, _, size = self._sessions.pop(session_id)
+        self._bytes -= size
+
+    def _purge_expired(self, now: float) -> None:
+        # The LRU order is also the expiry order, so expired sessions sit at the front
+        while self._sessions:
+            session_id, (expires_at, _, _) = next(iter(self._sessions.items()))
+            if expires_at > now:
+                break
+            self._drop(session_id)
+            self.expirations += 1
+
+    async def get(self, session_id: str) -> Optional[List[Message]]:
+        now = time.monotonic()
+        self._purge_expired(now)
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        _, messages, size = entry
+        self._sessions[session_id] = (now + self.ttl_seconds, messages, size)
+        self._sessions.move_to_end(session_id)
+        return [message.to_openai() for message in messages]
+
+    async def append(self, session_id: str, messages: List[Message]) -> None:
+        now = time.monotonic()
+        self._purge_expired(now)
+        _, stored, size = self._sessions.get(session_id, (0.0, [], 0))
+        compact = [StoredMessage.from_openai(message) for message in messages]
+        added = sum(message.size() for message in compact)
+        stored.extend(compact)
+        self._sessions[session_id] = (now + self.ttl_seconds, stored, size + added)
+        self._sessions.move_to_end(session_id)
+        self._bytes += added
+
+        while len(self._sessions) > self.max_sessions:
+            oldest = next(iter(self._sessions))
+            self._drop(oldest)
+            self.evictions += 1
+
+    async def delete(self, session_id: str) -> None:
+        if session_id in self._sessions:
+            self._drop(session_id)
+
+    async def stats(self) -> Dict[str, Any]:
+        self._purge_expired(time.monotonic())
+        return {
+            "backend": "memory",
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "memory_bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class SessionMap(Generic[V]):
+    """
+    Per-process map of session id -> value with the bounds of InMemorySessionStore:
+    least recently used sessions are evicted past `max_sessions`, and sessions
+    not touched for `ttl_seconds` expire.
+
+    Reading a session with `get()` or `setdefault()` (or writing it) touches it;
+    `in` does not.
+    """
+
+    def __init__(self, max_sessions: int, ttl_seconds: float):
+        """
+        Args:
+            max_sessions: Maximum number of sessions kept
+            ttl_seconds: Idle time after which a session expires
+        """
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        # session_id -> (expires_at, value)
+        self._entries: "OrderedDict[str, Tuple[float, V]]" = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+
+    def _purge_expired(self, now: float) -> None:
+        # The LRU order is also the expiry order, so expired sessions sit at the front
+        while self._entries:
+            session_id, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            del self._entries[session_id]
+            self.expirations += 1
+
+    def __contains__(self, session_id: str) -> bool:
+        self._purge_expired(time.monotonic())
+        return session_id in self._entries
+
+    def __len__(self) -> int:
+        self._purge_expired(time.monotonic())
+        return len(self._entries)
+
+    def get(self, session_id: str, default: Optional[V] = None) -> Optional[V]:
+        now = time.monotonic()
+        self._purge_expired(now)
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return default
+        self._entries[session_id] = (now + self.ttl_seconds, entry[1])
+        self._entries.move_to_end(session_id)
+        return entry[1]
+
+    def __setitem__(self, session_id: str, value: V) -> None:
+        now = time.monotonic()
+        self._purge_expired(now)
+        self._entries[session_id] = (now + self.ttl_seconds, value)
+        self._entries.move_to_end(session_id)
+        while len(self._entries) > self.max_sessions:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def setdefault(self, session_id: str, default: V) -> V:
+        value = self.get(session_id)
+        if value is None:
+            self[session_id] = value = default
+        return value
+
+    def pop(self, session_id: str, default: Optional[V] = None) -> Optional[V]:
+        entry = self._entries.pop(session_id, None)
+        return default if entry is None else entry[1]
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Session store backed by Redis, shared by every worker.
+
+    Each session is a Redis list of JSON-encoded messages with a sliding TTL.
+    A registered system prompt is pushed as a reference to its version and its
+    text is stored once, under `prompt_prefix`, for every session and worker.
+    Bounding memory is delegated to Redis (`maxmemory` with an LRU policy).
+    `stats()` counts the sessions under `key_prefix`; its memory and eviction
+    figures come from Redis itself and cover the whole instance (caches, reply
+    buffers, job streams and Celery keys included), hence their `instance_` names.
+    """
+
+    def __init__(
+        self,
+        redis: Any,
+        ttl_seconds: int,
+        key_prefix: str = "triphelix:session:",
+        prompt_prefix: str = "triphelix:prompt:"
+    ):
+        """
+        Args:
+            redis: A `redis.asyncio.Redis` client
+            ttl_seconds: Idle time after which a session expires
+            key_prefix: Prefix of the Redis keys holding sessions
+            prompt_prefix: Prefix of the Redis keys holding system prompts
+        """
+        self.redis = redis
+        self.ttl_seconds = ttl_seconds
+        self.key_prefix = key_prefix
+        self.prompt_prefix = prompt_prefix
+        # Versions of the prompts this process has already stored
+        self._saved_prompts: Set[str] = set()
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.key_prefix}{session_id}"
+
+    async def _save_prompt(self, prompt: SystemPrompt) -> None:
+        if prompt.version not in self._saved_prompts:
+            await self.redis.set(self.prompt_prefix + prompt.version, prompt.text, nx=True)
+            self._saved_prompts.add(prompt.version)
+
+    async def _load_prompt(self, version: str) -> str:
+        prompt = system_prompts.get(version)
+        if prompt is not None:
+            return prompt.text
+        # Stored by a worker running another prompt version (e.g. during a deploy)
+        text = await self.redis.get(self.prompt_prefix + version)
+        if text is None:
+            raise KeyError(f"Unknown system prompt version {version}")
+        return system_prompts.register(text)
+
+    async def _encode(self, message: Message) -> str:
+        compact = StoredMessage.from_openai(message)
+        if isinstance(compact.content, SystemPrompt):
+            await self._save_prompt(compact.content)
+            return json.dumps({"role": compact.role, "prompt": compact.content.version})
+        return json.dumps(message)
+
+    async def _decode(self, raw: str) -> Message:
+        message = json.loads(raw)
+        if "prompt" in message:
+            return {"role": message["role"], "content": await self._load_prompt(message.pop("prompt"))}
+        return message
+
+    async def get(self, session_id: str) -> Optional[List[Message]]:
+        key = self._key(session_id)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.lrange(key, 0, -1)
+            pipe.expire(key, self.ttl_seconds)
+            raw, _ = await pipe.execute()
+        if not raw:
+            return None
+        return [await self._decode(item) for item in raw]
+
+    async def append(self, session_id: str, messages: List[Message]) -> None:
+        if not messages:
+            return
+        key = self._key(session_id)
+        encoded = [await self._encode(message) for message in messages]
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.rpush(key, *encoded)
+            pipe.expire(key, self.ttl_seconds)
+            await pipe.execute()
+
+    async def delete(self, session_id: str) -> None:
+        await self.redis.delete(self._key(session_id))
+
+    async def ping(self) -> bool:
+        try:
+            return bool(await self.redis.ping())
+        except Exception:
+            return False
+
+    async def stats(self) -> Dict[str, Any]:
+        # Other keys share the database: only those under key_prefix are sessions
+        sessions = 0
+        async for _ in self.redis.scan_iter(match=f"{self.key_prefix}*", count=1000):
+            sessions += 1
+        memory = await self.redis.info("memory")
+        counters = await self.redis.info("stats")
+        return {
+            "backend": "redis",
+            "sessions": sessions,
+            "instance_memory_bytes": memory.get("used_memory", 0),
+            "instance_maxmemory_bytes": memory.get("maxmemory", 0),
+            "instance_hits": counters.get("keyspace_hits", 0),
+            "instance_misses": counters.get("keyspace_misses", 0),
+            "instance_evictions": counters.get("evicted_keys", 0),
+            "instance_expirations": counters.get("expired_keys", 0),
+        }
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+
+def create_session_store() -> SessionStore:
+    """
+    Build the session store selected by `SESSION_STORE_BACKEND` ("memory" or "redis").
+    """
+    if settings.SESSION_STORE_BACKEND == "redis":
+        from redis.asyncio import Redis
+
+        redis = Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, decode_responses=True)
+        return RedisSessionStore(redis, ttl_seconds=settings.SESSION_TTL_SECONDS)
+    if settings.SESSION_STORE_BACKEND == "memory":
+        return InMemorySessionStore(
+            max_sessions=settings.SESSION_MAX_SESSIONS,
+            ttl_seconds=settings.SESSION_TTL_SECONDS,
+        )
+    raise ValueError(f"Unknown SESSION_STORE_BACKEND: {settings.SESSION_STORE_BACKEND!r}")
+
+
+def create_session_map() -> SessionMap:
+    """
+    Build a per-session map bounded like the in-memory session store
+    (SESSION_MAX_SESSIONS, SESSION_TTL_SECONDS).
+    """
+    return SessionMap(max_sessions=settings.SESSION_MAX_SESSIONS, ttl_seconds=settings.SESSION_TTL_SECONDS)
@@ -0,0 +1,137 @@
+"""
+Single-flight coalescing of identical concurrent completion requests.
+
+When several requests with the same key (see `completion_key()`) are in flight
+at once, for example double submits, client retries or new sessions opening
+with the same message, only the first one (the leader) opens an upstream
+stream. Its deltas are appended to a shared buffer by a background task and
+every subscriber, leader included, reads the buffer from the start, so late
+joiners replay what was already streamed and then follow live.
+
+A flight is forgotten as soon as its upstream stream ends: requests arriving
+afterwards start a new one (deterministic calls are covered by the completion
+cache instead). When every subscriber has gone away before the end, the
+upstream stream is cancelled. Subscribers count from their first read, so a
+request that fails or disconnects before reading does not keep the stream open.
+"""
+
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.metrics import single_flight_requests_total
+
+
+class _Flight:
+    """Buffer of one shared upstream stream and the state of its readers."""
+
+    def __init__(self):
+        self.deltas: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0  # Subscriptions being read
+        self.task: Optional[asyncio.Task] = None
+        # Replaced after each update, so readers wait for the next one only
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def append(self, delta: str) -> None:
+        self.deltas.append(delta)
+        self._notify()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.done = True
+        self.error = error
+        self._notify()
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        # Counted once read: a subscription never iterated never runs its finally
+        self.subscribers += 1
+        position = 0
+        try:
+            while True:
+                # Catch up on the buffer, then wait for more
+                while position < len(self.deltas):
+                    yield self.deltas[position]
+                    position += 1
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await self._changed.wait()
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done and self.task is not None:
+                # Nobody is reading any more: stop paying for the upstream stream
+                self.task.cancel()
+
+
+class SingleFlight:
+    """
+    Registry of the flights in progress, keyed on the normalized request.
+    """
+
+    def __init__(self, caller: str):
+        """
+        Args:
+            caller: Label of the call site in the metrics (e.g. "chat_stream")
+        """
+        self.caller = caller
+        self._flights: Dict[str, _Flight] = {}
+
+    async def stream(
+        self,
+        key: str,
+        open_stream: Callable[[], Awaitable[AsyncIterator[str]]]
+    ) -> Tuple[AsyncIterator[str], bool]:
+        """
+        Join the flight of `key`, or start it if there is none.
+
+        Args:
+            key: Key of the request, e.g. from `completion_key()`
+            open_stream: Opens the upstream stream and returns its deltas; only
+                called by the leader. Errors raised while opening propagate to
+                the leader and end the stream of the requests that joined it.
+
+        Returns:
+            The deltas of the shared completion from its start, and whether
+            this request is the leader (the one that called the upstream)
+        """
+        flight = self._flights.get(key)
+        if flight is not None:
+            single_flight_requests_total.labels(self.caller, "joined").inc()
+            return flight.subscribe(), False
+
+        flight = _Flight()
+        self._flights[key] = flight
+        single_flight_requests_total.labels(self.caller, "leader").inc()
+        try:
+            deltas = await open_stream()
+        except BaseException as e:
+            self._flights.pop(key, None)
+            flight.finish(e)
+            raise
+        flight.task = asyncio.create_task(self._pump(key, flight, deltas))
+        return flight.subscribe(), True
+
+    async def _pump(self, key: str, flight: _Flight, deltas: AsyncIterator[str]) -> None:
+        error: Optional[BaseException] = None
+        try:
+            async for delta in deltas:
+                flight.append(delta)
+        except Exception as e:
+            # Handed to the subscribers instead of being left on the task
+            error = e
+        except asyncio.CancelledError as e:
+            error = e
+            raise
+        finally:
+            # Requests arriving from now on start a new flight
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            flight.finish(error)
+
+    def __len__(self) -> int:
+        return len(self._flights)
@@ -0,0 +1,134 @@
+"""
+Server-Sent Events framing for streamed replies.
+
+Upstream deltas are usually a few characters each. Sending each one as its own
+frame costs one ASGI send (and one syscall and proxy write) per token, so
+`coalesce()` merges deltas into frames that are flushed once they reach a
+byte threshold or once the oldest buffered delta is older than a time
+threshold. Heartbeats of idle event streams are comment lines
+(`format_comment()`) sent by the endpoints reading the reply buffer.
+"""
+
+import asyncio
+import json
+from typing import Any, AsyncIterator, Callable, Optional
+
+from starlette.responses import StreamingResponse
+
+# Marks the end of the source iterator inside coalesce()
+_END = object()
+
+# Response headers for event streams; X-Accel-Buffering disables nginx buffering
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+
+def format_event(data: Any, event: Optional[str] = None, event_id: Optional[str] = None) -> str:
+    """
+    Encode one SSE frame. The payload is JSON-encoded so that newlines and
+    leading spaces in the text survive the SSE line format.
+
+    Args:
+        data: JSON-serialisable payload
+        event: Optional event type (defaults to "message" on the client)
+        event_id: Optional event id, echoed back by clients in Last-Event-ID
+    """
+    frame = ""
+    if event_id is not None:
+        frame += f"id: {event_id}\n"
+    if event is not None:
+        frame += f"event: {event}\n"
+    return frame + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def format_comment(text: str = "") -> str:
+    """Encode an SSE comment line, ignored by clients (used for heartbeats)."""
+    return f": {text}\n\n"
+
+
+async def coalesce(
+    deltas: AsyncIterator[str],
+    max_delay: float,
+    max_bytes: int,
+) -> AsyncIterator[str]:
+    """
+    Merge small text deltas into larger chunks.
+
+    A chunk is flushed when it reaches `max_bytes` characters or when its first
+    delta has waited `max_delay` seconds, whichever comes first.
+
+    Args:
+        deltas: Source of text deltas
+        max_delay: Maximum time a delta is held back, in seconds
+        max_bytes: Size at which a chunk is flushed immediately
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump() -> None:
+        try:
+            async for delta in deltas:
+                queue.put_nowait(delta)
+            queue.put_nowait(_END)
+        except Exception as exc:
+            # Re-raised by the consumer, after flushing what was buffered
+            queue.put_nowait(exc)
+
+    loop = asyncio.get_running_loop()
+    task = asyncio.create_task(pump())
+    buffer = []
+    size = 0
+    flush_at = None
+    try:
+        while True:
+            # Nothing buffered: wait for the next delta however long it takes
+            timeout = max(0.0, flush_at - loop.time()) if buffer else None
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                yield "".join(buffer)
+                buffer, size, flush_at = [], 0, None
+                continue
+
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                if buffer:
+                    yield "".join(buffer)
+                raise item
+
+            buffer.append(item)
+            size += len(item)
+            if size >= max_bytes:
+                yield "".join(buffer)
+                buffer, size, flush_at = [], 0, None
+            elif flush_at is None:
+                flush_at = loop.time() + max_delay
+
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        if not task.done():
+            task.cancel()
+            # Wait for the source to be closed; its own errors are not interesting any more
+            await asyncio.gather(task, return_exceptions=True)
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that calls `on_close` once the response is over, however
+    it ends. Starlette neither iterates nor closes the body when the client is
+    gone before the first chunk (or sending the headers fails), so cleanup left
+    to the body generator's `finally` would never run.
+    """
+
+    def __init__(self, content, *, on_close: Callable[[], None], **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
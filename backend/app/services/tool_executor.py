@@ -0,0 +1,243 @@
+"""
+Execution layer for agent tools: time limits, result caching and batches.
+
+Every tool call goes through `ToolExecutor.run()`, which bounds it with the
+tool's time limit (TOOL_TIMEOUTS, else TOOL_TIMEOUT_SECONDS) and, for the
+idempotent lookup tools listed in TOOL_CACHE_TTLS, serves it from a cache
+keyed on the tool name and its normalized arguments: the same route and dates
+asked by two sessions cost one lookup. Identical calls already in flight are
+joined rather than started again.
+
+Agents hand `wrap(tool)` to their executor instead of the tool itself. Calls
+of one model step then run concurrently (the executor gathers them), and a
+failure or timeout becomes an error message for the model rather than failing
+the turn. `run_batch()` runs a list of known queries at once, without a model
+step (see Concierge.lookup_bookings).
+"""
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from langchain_core.tools import BaseTool, StructuredTool, ToolException
+
+from app.core.config import settings
+from app.core.metrics import tool_calls_total, tool_seconds
+from app.core.tracing import span
+
+
+class ToolTimeout(ToolException):
+    """A tool call ran past its time limit."""
+
+
+class ToolResult(NamedTuple):
+    name: str
+    output: Any  # None when the call failed
+    error: Optional[str]  # None when the call succeeded
+
+
+def normalize_args(value: Any) -> Any:
+    """
+    Normalize tool arguments for keying: collapse whitespace and ignore case in
+    strings, drop None values and sort mappings, so that {"destination": "Paris "}
+    and {"destination": "paris"} share an entry.
+    """
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    if isinstance(value, dict):
+        return {key: normalize_args(item) for key, item in sorted(value.items()) if item is not None}
+    if isinstance(value, (list, tuple)):
+        return [normalize_args(item) for item in value]
+    return value
+
+
+def tool_key(name: str, args: Dict[str, Any]) -> str:
+    """Cache key of a tool call: tool name and normalized arguments."""
+    return name + ":" + json.dumps(normalize_args(args), separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+class ToolResultCache:
+    """
+    Results of idempotent tool calls, each tool with its own lifetime, LRU-evicted
+    beyond `max_entries`.
+    """
+
+    def __init__(self, ttls: Dict[str, float], max_entries: int):
+        """
+        Args:
+            ttls: Tool name -> seconds its results are kept (tools left out are not cached)
+            max_entries: Results kept at most, all tools together
+        """
+        self.ttls = ttls
+        self.max_entries = max_entries
+        # key -> (expires_at, output)
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def cacheable(self, name: str) -> bool:
+        return self.ttls.get(name, 0) > 0
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """(True, output) for a live entry, (False, None) otherwise."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, entry[1]
+
+    def set(self, name: str, key: str, output: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttls[name], output)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class ToolExecutor:
+    """
+    Runs tool calls with time limits, caching and joining of identical calls.
+    """
+
+    def __init__(self, cache: ToolResultCache, timeout: float, timeouts: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            cache: Results of the idempotent tools
+            timeout: Time limit of a call, in seconds
+            timeouts: Time limits of specific tools, by name
+        """
+        self.cache = cache
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        # Cacheable calls in progress, by key: identical calls await the same task
+        self._in_flight: Dict[str, "asyncio.Task[Any]"] = {}
+        self.joined = 0
+
+    def timeout_for(self, name: str) -> float:
+        return self.timeouts.get(name, self.timeout)
+
+    async def _invoke(self, tool: BaseTool, args: Dict[str, Any]) -> Any:
+        timeout = self.timeout_for(tool.name)
+        started = time.perf_counter()
+        try:
+            output = await asyncio.wait_for(tool.ainvoke(args), timeout)
+        except asyncio.TimeoutError:
+            tool_calls_total.labels(tool.name, "timeout").inc()
+            raise ToolTimeout(f"{tool.name} did not answer within {timeout:g} seconds") from None
+        except Exception:
+            tool_calls_total.labels(tool.name, "error").inc()
+            raise
+        finally:
+            tool_seconds.labels(tool.name).observe(time.perf_counter() - started)
+        tool_calls_total.labels(tool.name, "ok").inc()
+        return output
+
+    async def run(self, tool: BaseTool, args: Dict[str, Any]) -> Any:
+        """
+        Run one tool call, or answer it from the cache.
+
+        Args:
+            tool: The tool to call
+            args: Its arguments
+
+        Returns:
+            The tool's output
+
+        Raises:
+            ToolTimeout: The call ran past the tool's time limit
+            Exception: Whatever the tool raised
+        """
+        with span(f"tool.{tool.name}", "tool", tool=tool.name) as tool_span:
+            if not self.cache.cacheable(tool.name):
+                return await self._invoke(tool, args)
+
+            key = tool_key(tool.name, args)
+            found, output = self.cache.get(key)
+            if found:
+                tool_calls_total.labels(tool.name, "cached").inc()
+                tool_span.set(outcome="cached")
+                return output
+            task = self._in_flight.get(key)
+            if task is not None:
+                self.joined += 1
+                tool_calls_total.labels(tool.name, "joined").inc()
+                tool_span.set(outcome="joined")
+            else:
+                task = asyncio.create_task(self._invoke(tool, args))
+                self._in_flight[key] = task
+
+                def done(task: "asyncio.Task[Any]") -> None:
+                    self._in_flight.pop(key, None)
+                    if not task.cancelled() and task.exception() is None:
+                        self.cache.set(tool.name, key, task.result())
+
+                task.add_done_callback(done)
+            # Shielded: a caller going away does not abort the lookup for the others (it is bounded by its time limit)
+            return await asyncio.shield(task)
+
+    async def run_batch(self, calls: Sequence[Tuple[BaseTool, Dict[str, Any]]]) -> List[ToolResult]:
+        """
+        Run independent tool calls concurrently.
+
+        Args:
+            calls: (tool, arguments) of each call
+
+        Returns:
+            The result of each call, in order; failures are reported in `error`
+        """
+        async def one(tool: BaseTool, args: Dict[str, Any]) -> ToolResult:
+            try:
+                return ToolResult(tool.name, await self.run(tool, args), None)
+            except Exception as error:
+                return ToolResult(tool.name, None, str(error) or type(error).__name__)
+
+        return list(await asyncio.gather(*(one(tool, args) for tool, args in calls)))
+
+    def stats(self) -> Dict[str, int]:
+        """Cache entries, hits and misses, and the misses that joined an identical call in flight."""
+        return {**self.cache.stats(), "joined": self.joined, "in_flight": len(self._in_flight)}
+
+    def wrap(self, tool: BaseTool) -> BaseTool:
+        """
+        A tool with the same name, description and arguments that runs through
+        this executor; its errors and timeouts are returned to the model.
+        """
+        async def call(**kwargs: Any) -> Any:
+            try:
+                return await self.run(tool, kwargs)
+            except ToolException:
+                raise
+            except Exception as error:
+                raise ToolException(f"{tool.name} failed: {error}") from error
+
+        return StructuredTool.from_function(
+            coroutine=call,
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            return_direct=tool.return_direct,
+            handle_tool_error=True,
+        )
+
+
+def create_tool_executor() -> ToolExecutor:
+    """
+    Build the tool executor from settings.
+    """
+    return ToolExecutor(
+        cache=ToolResultCache(settings.TOOL_CACHE_TTLS, settings.TOOL_CACHE_MAX_ENTRIES),
+        timeout=settings.TOOL_TIMEOUT_SECONDS,
+        timeouts=settings.TOOL_TIMEOUTS,
+    )
+
+
+# Shared by the agents of this process, so that sessions share cached lookups
+tool_executor = create_tool_executor()
@@ -0,0 +1,69 @@
+"""
+Microbenchmark of per-turn agent overhead, excluding LLM time.
+
+Runs Concierge turns against an instant fake chat model and compares building
+the prompt/agent/AgentExecutor on every message with reusing the cached executor.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_agent_overhead [--turns 500]
+"""
+
+import argparse
+import asyncio
+import time
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.tools import tool
+
+from app.agents.concierge import Concierge
+
+
+@tool
+def search_flights(origin: str, destination: str, date: str) -> str:
+    """Search flights between two cities on a date."""
+    return f"No flights from {origin} to {destination} on {date}"
+
+
+@tool
+def search_hotels(city: str, check_in: str, check_out: str) -> str:
+    """Search hotels in a city for the given dates."""
+    return f"No hotels in {city} from {check_in} to {check_out}"
+
+
+async def run(turns: int, rebuild: bool) -> float:
+    llm = FakeListChatModel(responses=["Booked."])
+    agent = Concierge(llm=llm, tools=[search_flights, search_hotels])
+    executor = agent.get_agent_executor()
+
+    start = time.perf_counter()
+    for i in range(turns):
+        if rebuild:
+            # Previous behaviour: a new prompt, agent and executor per message
+            executor = agent._create_agent()
+        else:
+            executor = agent.get_agent_executor()
+        await executor.ainvoke({"input": "Book it", "chat_history": []})
+    return (time.perf_counter() - start) / turns
+
+
+async def main_async(turns: int) -> None:
+    # Warm up imports and lazy initialisation before measuring
+    await run(10, rebuild=True)
+    await run(10, rebuild=False)
+
+    rebuilt = await run(turns, rebuild=True)
+    cached = await run(turns, rebuild=False)
+    print(f"rebuild per turn : {rebuilt * 1e6:9.1f} us/turn")
+    print(f"cached executor  : {cached * 1e6:9.1f} us/turn")
+    print(f"saved            : {(rebuilt - cached) * 1e6:9.1f} us/turn ({rebuilt / cached:.2f}x)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.turns))
+
+
+if __name__ == "__main__":
+    main()
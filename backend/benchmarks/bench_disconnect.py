@@ -0,0 +1,121 @@
+"""
+Benchmark of upstream cancellation when a chat client disconnects.
+
+Spawns the fake upstream (slow, long replies) and one API worker, streams a
+first reply to completion (so the worker knows the usual reply length), then
+repeatedly opens a chat stream, reads a few chunks and drops the connection.
+For each drop it measures the time until the fake upstream sees its own
+connection closed (`in_flight` back to 0 in its /stats):
+
+- raw: the upstream call is aborted as soon as the response is cancelled
+- sse: the reply keeps being generated for REPLY_ABANDON_SECONDS in case the
+  client resumes it, then the upstream call is aborted
+
+It fails if a connection stays open longer than the bound, and prints the
+tokens generated upstream versus full replies and the worker's cancellation
+metrics.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_disconnect [--runs 5] [--abandon-seconds 1.0]
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from contextlib import ExitStack
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.common import free_port, percentile, spawn
+
+
+async def upstream_stats(client: httpx.AsyncClient, upstream_url: str) -> Dict[str, int]:
+    response = await client.get(f"{upstream_url}/stats")
+    response.raise_for_status()
+    return response.json()
+
+
+async def wait_for_upstream_idle(client: httpx.AsyncClient, upstream_url: str, timeout: float) -> float:
+    """Seconds until the fake upstream has no stream open, or raise after `timeout`."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if (await upstream_stats(client, upstream_url))["in_flight"] == 0:
+            return time.perf_counter() - start
+        await asyncio.sleep(0.01)
+    raise RuntimeError(f"The upstream stream was still open {timeout}s after the client disconnected")
+
+
+async def drop_after(client: httpx.AsyncClient, url: str, stream_format: str, read_bytes: int) -> None:
+    """Open a chat stream, read `read_bytes` of it, then close the connection."""
+    body = {"message": f"Plan a long trip ({uuid.uuid4().hex})", "stream_format": stream_format}
+    async with client.stream("POST", url, json=body) as response:
+        response.raise_for_status()
+        received = 0
+        async for chunk in response.aiter_bytes():
+            received += len(chunk)
+            if received >= read_bytes:
+                break
+
+
+async def run(base_url: str, upstream_url: str, args: argparse.Namespace) -> None:
+    url = f"{base_url}/api/v1/chat/stream"
+    bounds = {"raw": args.bound, "sse": args.abandon_seconds + args.bound}
+    async with httpx.AsyncClient(timeout=httpx.Timeout(60.0)) as client:
+        # One full reply first: the tokens-saved estimate is based on the usual reply length
+        response = await client.post(url, json={"message": "Plan a long trip", "stream_format": "raw"})
+        response.raise_for_status()
+        full_tokens = (await upstream_stats(client, upstream_url))["tokens"]
+
+        for stream_format in ("raw", "sse"):
+            before = await upstream_stats(client, upstream_url)
+            samples: List[float] = []
+            for _ in range(args.runs):
+                await drop_after(client, url, stream_format, args.read_bytes)
+                samples.append(await wait_for_upstream_idle(client, upstream_url, bounds[stream_format]))
+            after = await upstream_stats(client, upstream_url)
+            tokens = (after["tokens"] - before["tokens"]) / args.runs
+            print(
+                f"{stream_format:<4} upstream closed after  p50 {percentile(samples, 50) * 1000:7.1f} ms  "
+                f"max {max(samples) * 1000:7.1f} ms  (bound {bounds[stream_format]:.1f} s), "
+                f"{after['disconnects'] - before['disconnects']}/{args.runs} upstream disconnects, "
+                f"{tokens:.0f} of {full_tokens} tokens generated per reply"
+            )
+
+        metrics = (await client.get(f"{base_url}/metrics")).text
+    for line in metrics.splitlines():
+        if line.startswith("triphelix_upstream_cancelled"):
+            print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Disconnects per stream format")
+    parser.add_argument("--tokens", type=int, default=300, help="Tokens per upstream reply")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Seconds between upstream tokens")
+    parser.add_argument("--read-bytes", type=int, default=100, help="Bytes read before disconnecting")
+    parser.add_argument("--abandon-seconds", type=float, default=1.0, help="REPLY_ABANDON_SECONDS of the worker")
+    parser.add_argument("--bound", type=float, default=0.5, help="Allowed time to close the upstream, in seconds")
+    args = parser.parse_args()
+
+    upstream_port, app_port = free_port(), free_port()
+    upstream = [
+        "-m", "benchmarks.fake_upstream", "--port", str(upstream_port),
+        "--ttft", "0.05", "--tokens", str(args.tokens), "--token-delay", str(args.token_delay),
+    ]
+    app = ["-m", "uvicorn", "app.main:app", "--port", str(app_port), "--log-level", "warning"]
+    env = {
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{upstream_port}/v1",
+        "OPENAI_API_KEY": "fake",
+        "REPLY_ABANDON_SECONDS": str(args.abandon_seconds),
+    }
+
+    with ExitStack() as stack:
+        stack.enter_context(spawn(upstream, upstream_port))
+        stack.enter_context(spawn(app, app_port, env=env))
+        asyncio.run(run(f"http://127.0.0.1:{app_port}", f"http://127.0.0.1:{upstream_port}", args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark of SiteSherpa itinerary generation: one long completion versus a
+skeleton followed by concurrent per-day completions.
+
+Both paths run against the fake upstream with the same per-token latency. The
+single call produces `days * tokens_per_day` tokens; in parallel mode the
+skeleton and every day produce `tokens_per_day` tokens each.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_itinerary [--days 10] [--tokens-per-day 150] [--concurrency 4]
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from langchain_openai import ChatOpenAI
+
+from app.agents.site_sherpa import SiteSherpa, TravelPreferences
+from benchmarks.common import free_port, spawn
+
+
+async def measure(base_url: str, days: int, parallel: bool, concurrency: int) -> float:
+    sherpa = SiteSherpa(tools=[])
+    sherpa.llm = ChatOpenAI(model="fake-model", base_url=base_url, api_key="fake", max_retries=0)
+    start_date = datetime(2026, 6, 1)
+    sherpa.travel_preferences = TravelPreferences(
+        destination="Kyoto",
+        start_date=start_date,
+        end_date=start_date + timedelta(days=days - 1),
+        budget=5000,
+        accommodation_type="ryokan",
+        travel_style="cultural",
+        interests=["temples", "food", "gardens"],
+        group_size=2,
+    )
+    start = time.perf_counter()
+    if parallel:
+        parts = [day async for day in sherpa.stream_itinerary(use_cache=False, max_concurrency=concurrency)]
+        assert len(parts) == days
+    else:
+        await sherpa._generate_itinerary(use_cache=False, parallel=False)
+    return time.perf_counter() - start
+
+
+def run(label: str, days: int, tokens: int, parallel: bool, args: argparse.Namespace) -> float:
+    port = free_port()
+    upstream = [
+        "-m", "benchmarks.fake_upstream", "--port", str(port),
+        "--ttft", str(args.ttft), "--token-delay", str(args.token_delay), "--tokens", str(tokens),
+    ]
+    with spawn(upstream, port):
+        elapsed = asyncio.run(measure(f"http://127.0.0.1:{port}/v1", days, parallel, args.concurrency))
+    print(f"{label:<28} {elapsed:7.2f} s")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=10)
+    parser.add_argument("--tokens-per-day", type=int, default=150)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--ttft", type=float, default=0.4)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    args = parser.parse_args()
+
+    single = run("single completion", args.days, args.days * args.tokens_per_day, False, args)
+    parallel = run(f"skeleton + {args.concurrency} concurrent days", args.days, args.tokens_per_day, True, args)
+    print(f"speedup {single / parallel:.2f}x for a {args.days}-day itinerary")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark of the streaming itinerary parser (app/services/itinerary_stream.py).
+
+Builds an itinerary in the template of the chat system prompt, splits it into
+token-sized deltas, and compares the parsing cost of a streamed reply:
+
+- naive: re-parse the accumulated markdown on every delta, as a client
+  rendering the days from the text has to
+- incremental: feed every delta once to ItineraryStreamParser
+
+Both must end with the same days. Prints the total parse time of the reply,
+the per-delta p50 / p99 / max, and the characters each approach scans.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_itinerary_parser [--days 14] [--delta-chars 4]
+"""
+
+import argparse
+import time
+from datetime import date, timedelta
+from typing import List
+
+from app.services.itinerary_stream import ItineraryStreamParser, parse_itinerary
+from benchmarks.common import percentile
+
+ACTIVITIES = [
+    "Breakfast at a neighbourhood pastelaria, try the custard tarts",
+    "Guided walking tour of the old town and its viewpoints",
+    "Lunch at the covered market, seafood and petiscos",
+    "Tram ride up the hill to the castle, then the cathedral",
+    "Sunset at the river promenade with a glass of vinho verde",
+    "Dinner at a family-run tasca, fado in the evening",
+]
+
+
+def build_itinerary(days: int) -> str:
+    """Markdown itinerary of `days` days in the template of the chat system prompt."""
+    start = date(2026, 6, 3)
+    lines = [f"# Lisbon Itinerary: {start:%B %d} – {start + timedelta(days=days - 1):%B %d}", ""]
+    for day in range(days):
+        current = start + timedelta(days=day)
+        lines += [f"## Day {day + 1}: {current:%A}, {current:%B %d}", ""]
+        for slot, offset in (("Morning", 0), ("Afternoon", 2), ("Evening", 4)):
+            lines += [f"### {slot}  "]
+            lines += [f"- {ACTIVITIES[(offset + i + day) % len(ACTIVITIES)]}  " for i in range(2)]
+            lines += [""]
+    return "\n".join(lines)
+
+
+def split_deltas(text: str, size: int) -> List[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=14, help="Days in the itinerary")
+    parser.add_argument("--delta-chars", type=int, default=4, help="Characters per streamed delta (about one token)")
+    args = parser.parse_args()
+
+    text = build_itinerary(args.days)
+    deltas = split_deltas(text, args.delta_chars)
+
+    naive_times = []
+    naive_scanned = 0
+    accumulated = ""
+    for delta in deltas:
+        accumulated += delta
+        started = time.perf_counter()
+        naive_days = parse_itinerary(accumulated)
+        naive_times.append(time.perf_counter() - started)
+        naive_scanned += len(accumulated)
+
+    incremental_times = []
+    stream = ItineraryStreamParser()
+    events = 0
+    for delta in deltas:
+        started = time.perf_counter()
+        events += len(stream.feed(delta))
+        incremental_times.append(time.perf_counter() - started)
+    started = time.perf_counter()
+    events += len(stream.close())
+    incremental_times[-1] += time.perf_counter() - started
+
+    assert stream.days == naive_days and len(stream.days) == args.days
+
+    print(
+        f"{args.days}-day itinerary: {len(text)} characters in {len(deltas)} deltas of "
+        f"{args.delta_chars} characters, {events} structured events"
+    )
+    for title, times, scanned in (
+        ("naive re-parse", naive_times, naive_scanned),
+        ("incremental", incremental_times, len(text)),
+    ):
+        print(
+            f"{title:<16} total {sum(times) * 1000:8.2f} ms  "
+            f"per delta p50 {percentile(times, 50) * 1e6:7.1f} us  "
+            f"p99 {percentile(times, 99) * 1e6:7.1f} us  max {max(times) * 1e6:7.1f} us  "
+            f"characters scanned {scanned:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
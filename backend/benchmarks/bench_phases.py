@@ -0,0 +1,100 @@
+"""
+Benchmark of phase-aware model routing (app/services/model_policy.py).
+
+Spawns the fake upstream, where the small model streams its tokens three
+times faster than the large one, and one API worker, then plays the loadgen
+conversation (five question turns, then "please generate the itinerary") on
+N sessions through the chat endpoint, twice:
+
+- single model: MODEL_PHASES empty, every turn on OPENAI_MODEL
+- by phase: the default MODEL_PHASES (questions on the small model)
+
+For each run it prints the calls, average latency and cost of each phase from
+/api/v1/chat/models/stats, and the total cost of the run, priced by the
+MODEL_PRICES of the worker from the token usage the fake upstream reports.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_phases [--sessions 20]
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from contextlib import ExitStack
+from typing import Dict
+
+import httpx
+
+from benchmarks.common import free_port, spawn
+from benchmarks.loadgen import SCRIPT
+
+LARGE_MODEL = "gpt-4o"
+SMALL_MODEL = "gpt-4o-mini"
+
+
+async def run_session(client: httpx.AsyncClient, url: str) -> None:
+    session_id = uuid.uuid4().hex
+    for turn, message in enumerate(SCRIPT):
+        # Identical conversations would share their upstream calls
+        if turn == 0:
+            message = f"{message} ({session_id})"
+        body = {"message": message, "session_id": session_id, "stream_format": "raw"}
+        async with client.stream("POST", url, json=body) as response:
+            response.raise_for_status()
+            async for _ in response.aiter_bytes():
+                pass
+
+
+async def run(base_url: str, title: str, sessions: int) -> None:
+    async with httpx.AsyncClient(timeout=httpx.Timeout(120.0)) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(run_session(client, f"{base_url}/api/v1/chat/stream") for _ in range(sessions)))
+        elapsed = time.perf_counter() - start
+        stats: Dict[str, Dict[str, object]] = (await client.get(f"{base_url}/api/v1/chat/models/stats")).json()
+
+    total = sum(phase["cost_usd"] for phase in stats.values())
+    print(f"{title}: {sessions} sessions x {len(SCRIPT)} turns in {elapsed:.1f} s, cost ${total:.4f}")
+    for name, phase in stats.items():
+        if phase["calls"]:
+            print(
+                f"  {name:<10} {phase['model']:<12} calls {phase['calls']:4d}  "
+                f"avg {phase['avg_seconds'] * 1000:6.0f} ms  cost ${phase['cost_usd']:.4f}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20, help="Concurrent conversations per run")
+    parser.add_argument("--tokens", type=int, default=200, help="Tokens per upstream reply")
+    parser.add_argument("--token-delay", type=float, default=0.015, help="Seconds between tokens of the large model")
+    args = parser.parse_args()
+
+    upstream_port = free_port()
+    upstream = [
+        "-m", "benchmarks.fake_upstream", "--port", str(upstream_port), "--ttft", "0.3",
+        "--tokens", str(args.tokens), "--token-delay", str(args.token_delay),
+        "--model-token-delay", f"{SMALL_MODEL}={args.token_delay / 3}",
+    ]
+    runs = [
+        ("single model", {"MODEL_PHASES": "{}"}),
+        ("by phase", {}),
+    ]
+
+    with ExitStack() as stack:
+        stack.enter_context(spawn(upstream, upstream_port))
+        for title, overrides in runs:
+            app_port = free_port()
+            app = ["-m", "uvicorn", "app.main:app", "--port", str(app_port), "--log-level", "warning"]
+            env = {
+                "OPENAI_BASE_URL": f"http://127.0.0.1:{upstream_port}/v1",
+                "OPENAI_API_KEY": "fake",
+                "OPENAI_MODEL": LARGE_MODEL,
+                **overrides,
+            }
+            with spawn(app, app_port, env=env):
+                asyncio.run(run(f"http://127.0.0.1:{app_port}", title, args.sessions))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Benchmark of the checkpointed booking pipeline (app/agents/pipeline.py).
+
+Spawns the fake upstream and an API worker checkpointing to a SQLite file
+(PIPELINE_CHECKPOINT_BACKEND=database), with the itinerary generated in
+parallel mode (a skeleton call, then one call per day), then measures:
+
+- full run: a run from start to finish
+- crash: a run whose worker is killed (SIGKILL) once a node has completed
+  and been checkpointed, or while the booking tokens stream; a new worker is
+  started on the same database and the run is posted again with its run_id
+- replay: posting a finished run again
+
+For each it prints the time until "done", the time to the first event of
+the resumed run, and the upstream LLM calls made, against the calls a rerun
+from scratch would make.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_pipeline [--runs 3]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from contextlib import ExitStack
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.common import free_port, percentile, spawn
+
+PREFERENCES = {
+    "destination": "Lisbon",
+    "start_date": date(2026, 6, 3).isoformat(),
+    "end_date": (date(2026, 6, 3) + timedelta(days=3)).isoformat(),
+    "budget": 3000,
+    "accommodation_type": "hotel",
+    "travel_style": "mid-range",
+    "interests": ["food", "history"],
+    "group_size": 2,
+}
+
+
+async def upstream_requests(client: httpx.AsyncClient, upstream_url: str) -> int:
+    return (await client.get(f"{upstream_url}/stats")).json()["requests"]
+
+
+async def post_run(
+    client: httpx.AsyncClient,
+    base_url: str,
+    body: Dict[str, Any],
+    stop_at: Optional[Tuple[str, str]] = None
+) -> Tuple[str, float, float, List[str]]:
+    """
+    Post a pipeline run and read its events until "done", or until the
+    (event, node) `stop_at` is seen.
+
+    Returns:
+        run_id, seconds to the first event after "run", seconds to the end, event names
+    """
+    start = time.perf_counter()
+    first = None
+    run_id = ""
+    events: List[str] = []
+    async with client.stream("POST", f"{base_url}/api/v1/pipeline/runs", json=body) as response:
+        response.raise_for_status()
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+                events.append(event)
+                if event == "run":
+                    run_id = data["run_id"]
+                    continue
+                if first is None:
+                    first = time.perf_counter() - start
+                if event == "error":
+                    raise RuntimeError(data["detail"])
+                if stop_at and event == stop_at[0] and data.get("node") == stop_at[1]:
+                    break
+                if event == "done":
+                    break
+    return run_id, first or 0.0, time.perf_counter() - start, events
+
+
+async def wait_checkpointed(client: httpx.AsyncClient, base_url: str, run_id: str, node: str) -> None:
+    """Wait until the checkpoints of `run_id` record `node` as completed."""
+    while True:
+        response = await client.get(f"{base_url}/api/v1/pipeline/runs/{run_id}")
+        if response.status_code == 200 and node in response.json()["completed"]:
+            return
+        await asyncio.sleep(0.01)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Runs per scenario")
+    parser.add_argument("--tokens", type=int, default=60, help="Tokens per upstream reply")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="Seconds between upstream tokens")
+    args = parser.parse_args()
+
+    database = os.path.join(tempfile.mkdtemp(prefix="bench_pipeline_"), "checkpoints.db")
+    upstream_port = free_port()
+    upstream_url = f"http://127.0.0.1:{upstream_port}"
+    upstream = [
+        "-m", "benchmarks.fake_upstream", "--port", str(upstream_port), "--ttft", "0.2",
+        "--tokens", str(args.tokens), "--token-delay", str(args.token_delay),
+    ]
+    env = {
+        "OPENAI_BASE_URL": f"{upstream_url}/v1",
+        "OPENAI_API_KEY": "fake",
+        "PIPELINE_CHECKPOINT_BACKEND": "database",
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{database}",
+        "ITINERARY_PARALLEL": "true",
+        "HEALTH_CHECK_UPSTREAM": "false",
+    }
+
+    def worker(stack: ExitStack) -> Tuple[str, Any]:
+        port = free_port()
+        app = ["-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"]
+        return f"http://127.0.0.1:{port}", stack.enter_context(spawn(app, port, env=env))
+
+    async def measure(title: str, run) -> None:
+        totals, firsts, calls, rerun_calls = [], [], [], []
+        for _ in range(args.runs):
+            total, first, made, full = await run()
+            totals.append(total)
+            firsts.append(first)
+            calls.append(made)
+            rerun_calls.append(full)
+        print(
+            f"{title:<34} done after p50 {percentile(totals, 50) * 1000:6.0f} ms  "
+            f"first event p50 {percentile(firsts, 50) * 1000:5.0f} ms  "
+            f"LLM calls {sum(calls) / len(calls):4.1f} (rerun from scratch: {sum(rerun_calls) / len(rerun_calls):.1f})"
+        )
+
+    with ExitStack() as stack:
+        stack.enter_context(spawn(upstream, upstream_port))
+        base_url, proc = worker(stack)
+        full_calls = 0
+
+        async def full_run() -> Tuple[float, float, int, int]:
+            nonlocal full_calls
+            async with httpx.AsyncClient(timeout=httpx.Timeout(60.0)) as client:
+                before = await upstream_requests(client, upstream_url)
+                _, first, total, _ = await post_run(client, base_url, {"preferences": PREFERENCES})
+                full_calls = await upstream_requests(client, upstream_url) - before
+            return total, first, full_calls, full_calls
+
+        def crash(stop_at: Tuple[str, str]):
+            async def run() -> Tuple[float, float, int, int]:
+                nonlocal base_url, proc
+                async with httpx.AsyncClient(timeout=httpx.Timeout(60.0)) as client:
+                    run_id, _, _, _ = await post_run(client, base_url, {"preferences": PREFERENCES}, stop_at)
+                    if stop_at[0] == "node":
+                        # LangGraph writes checkpoints in the background: kill once the node's is in
+                        await wait_checkpointed(client, base_url, run_id, stop_at[1])
+                    proc.kill()
+                    proc.wait()
+                    # Let the upstream notice the dropped connections before counting
+                    await asyncio.sleep(0.2)
+                    base_url, proc = worker(stack)
+                    before = await upstream_requests(client, upstream_url)
+                    _, first, total, events = await post_run(client, base_url, {"run_id": run_id})
+                    assert events[1] == "resumed", events[:3]
+                    made = await upstream_requests(client, upstream_url) - before
+                return total, first, made, full_calls
+            return run
+
+        async def replay() -> Tuple[float, float, int, int]:
+            async with httpx.AsyncClient(timeout=httpx.Timeout(60.0)) as client:
+                run_id, _, _, _ = await post_run(client, base_url, {"preferences": PREFERENCES})
+                before = await upstream_requests(client, upstream_url)
+                _, first, total, _ = await post_run(client, base_url, {"run_id": run_id})
+                made = await upstream_requests(client, upstream_url) - before
+            return total, first, made, full_calls
+
+        print(f"Booking pipeline, SQLite checkpoints, {args.tokens} tokens per LLM call, {args.runs} runs per scenario")
+        asyncio.run(measure("full run", full_run))
+        asyncio.run(measure("killed after write_itinerary", crash(("node", "write_itinerary"))))
+        asyncio.run(measure("killed after run_lookups", crash(("node", "run_lookups"))))
+        asyncio.run(measure("killed during propose_booking", crash(("token", "propose_booking"))))
+        asyncio.run(measure("finished run posted again", replay))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Benchmark of SiteSherpa information gathering: turns and LLM tokens needed
+before the itinerary can be generated, on scripted conversations.
+
+- legacy: the agent asks about every topic one question at a time with the
+  full history, and the itinerary starts when its reply says
+  "all information collected" (previous behaviour)
+- incremental: each new user message is parsed into a preferences delta, the
+  agent only asks about missing fields, and the itinerary starts as soon as
+  the required fields are known, without another agent turn
+
+A scripted chat model stands in for the LLM: it returns the expected delta for
+extraction prompts and asks about the next topic otherwise. Itinerary
+generation itself is identical in both modes and is not included.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_preferences
+"""
+
+import argparse
+import asyncio
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from app.agents.site_sherpa import SiteSherpa
+from app.services.history import count_message_tokens, count_tokens
+
+# Topics the original prompt asks about, one question per turn
+LEGACY_TOPICS = [
+    "destination", "dates", "travel style", "accommodation", "interests",
+    "group size", "special requirements", "budget",
+]
+
+# (user message, preferences the message states)
+Script = List[Tuple[str, Dict[str, Any]]]
+
+CONVERSATIONS: Dict[str, Script] = {
+    "all at once": [
+        ("Two of us want a cultural week in Kyoto from 2026-06-01 to 2026-06-07, ryokan stays, "
+         "temples and food, about $5000 total, no special needs.",
+         {"destination": "Kyoto", "start_date": "2026-06-01", "end_date": "2026-06-07",
+          "group_size": 2, "travel_style": "cultural", "accommodation_type": "ryokan",
+          "interests": ["temples", "food"], "budget": 5000, "special_requirements": []}),
+    ],
+    "chatty": [
+        ("Hi! I'm thinking about Lisbon.", {"destination": "Lisbon"}),
+        ("We'd go from 2026-09-10 to 2026-09-15, just me and my partner.",
+         {"start_date": "2026-09-10", "end_date": "2026-09-15", "group_size": 2}),
+        ("Boutique hotel, relaxed pace, we love food and tiles and the sea.",
+         {"accommodation_type": "boutique hotel", "travel_style": "relaxed",
+          "interests": ["food", "architecture", "beaches"]}),
+        ("Budget around 3000 dollars, and I'm vegetarian.",
+         {"budget": 3000, "dietary_restrictions": ["vegetarian"]}),
+    ],
+    "one fact per message": [
+        ("Reykjavik", {"destination": "Reykjavik"}),
+        ("Starting 2026-02-03", {"start_date": "2026-02-03"}),
+        ("Back on 2026-02-08", {"end_date": "2026-02-08"}),
+        ("Adventure", {"travel_style": "adventure"}),
+        ("A guesthouse is fine", {"accommodation_type": "guesthouse"}),
+        ("Northern lights and hot springs", {"interests": ["northern lights", "hot springs"]}),
+        ("Four friends", {"group_size": 4}),
+        ("None", {"special_requirements": [], "dietary_restrictions": []}),
+        ("$8000", {"budget": 8000}),
+    ],
+}
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model answering from a conversation script, counting prompt and completion tokens."""
+
+    script: Dict[str, Dict[str, Any]]
+    model_name: str = "gpt-4o"
+    temperature: float = 0.7  # Above LLM_CACHE_MAX_TEMPERATURE: every call reaches the model
+    max_tokens: int = 256
+    calls: int = 0
+    tokens: int = 0
+    legacy_asked: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _reply(self, messages: List[BaseMessage]) -> str:
+        last = messages[-1].content
+        if "Extract the travel preferences" in last:
+            message = last.rsplit("Message:", 1)[1].strip()
+            return json.dumps(self.script.get(message, {}))
+        state = next((m.content for m in messages if "Still to ask about" in m.content), None)
+        if state is not None:
+            missing = re.search(r"Still to ask about, one question at a time: (.*)", state).group(1)
+            return f"Great! Could you tell me your {missing.split(', ')[0]}?"
+        # Legacy flow: one topic per turn, then the completion phrase
+        if self.legacy_asked < len(LEGACY_TOPICS):
+            self.legacy_asked += 1
+            return f"Great! Could you tell me your {LEGACY_TOPICS[self.legacy_asked - 1]}?"
+        return "Perfect, all information collected!"
+
+    def _generate(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any
+    ) -> ChatResult:
+        reply = self._reply(messages)
+        prompt = [{"role": m.type, "content": m.content} for m in messages]
+        self.calls += 1
+        self.tokens += count_message_tokens(prompt, self.model_name) + count_tokens(reply, self.model_name)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=reply))])
+
+
+async def run(script: Script, legacy: bool, max_turns: int = 12) -> Tuple[int, int, int]:
+    """Return (turns, LLM calls, tokens) until the itinerary is generated."""
+    llm = ScriptedChatModel(script={message: delta for message, delta in script})
+    sherpa = SiteSherpa(tools=[])
+    sherpa.llm = llm
+    planned = []
+
+    async def generate_itinerary(**kwargs: Any) -> str:
+        planned.append(True)
+        return ""
+
+    sherpa._generate_itinerary = generate_itinerary
+
+    messages = [message for message, _ in script]
+    for turn in range(1, max_turns + 1):
+        # Users who ran out of new facts repeat that they already answered
+        message = messages[turn - 1] if turn <= len(messages) else "As I said earlier."
+        if legacy:
+            response = await sherpa.get_agent_executor().ainvoke({
+                "input": message,
+                "chat_history": await sherpa.get_context_window(),
+                "collection_state": "",
+            })
+            sherpa.add_to_memory("user", message)
+            sherpa.add_to_memory("assistant", response["output"])
+            if "all information collected" in response["output"].lower():
+                planned.append(True)
+        else:
+            await sherpa.process_message(message)
+        if planned:
+            return turn, llm.calls, llm.tokens
+    raise RuntimeError(f"no itinerary after {max_turns} turns")
+
+
+async def main_async() -> None:
+    print(f"{'conversation':<22} {'mode':<12} {'turns':>5} {'llm calls':>9} {'tokens':>7}")
+    for name, script in CONVERSATIONS.items():
+        results = {}
+        for mode in ("legacy", "incremental"):
+            results[mode] = await run(script, legacy=mode == "legacy")
+            turns, calls, tokens = results[mode]
+            print(f"{name:<22} {mode:<12} {turns:>5} {calls:>9} {tokens:>7}")
+        saved = 1 - results["incremental"][2] / results["legacy"][2]
+        print(f"{'':<22} {'saved':<12} {results['legacy'][0] - results['incremental'][0]:>5} "
+              f"{results['legacy'][1] - results['incremental'][1]:>9} {saved:>6.0%}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args()
+    asyncio.run(main_async())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Benchmark of the multi-backend LLM router (app/services/llm_router.py).
+
+Spawns several fake upstreams with injected slowness and failures and sends
+streamed completions through an AsyncOpenAI client (SDK retries disabled),
+directly or through an LLMRouter, reporting client-side TTFT percentiles,
+errors and how the requests were spread over the backends:
+
+- stragglers: one backend where a few requests are very slow to their first
+  token, versus two such backends with hedging
+- slow backend: a slow and a fast backend, the router learning to prefer the fast one
+- failover: a backend that is down and one failing 30% of its requests,
+  versus the router over those plus a healthy one
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_router [--requests 300] [--concurrency 10]
+"""
+
+import argparse
+import asyncio
+import time
+from contextlib import ExitStack
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.common import free_port, percentile, spawn
+
+# Fake upstream options of each backend used by the scenarios
+BACKENDS = {
+    "straggly-a": ["--ttft", "0.05", "--slow-rate", "0.04", "--slow-delay", "2.0"],
+    "straggly-b": ["--ttft", "0.05", "--slow-rate", "0.04", "--slow-delay", "2.0"],
+    "slow": ["--ttft", "0.6"],
+    "fast": ["--ttft", "0.05"],
+    "flaky": ["--ttft", "0.05", "--error-rate", "0.3", "--error-status", "503"],
+}
+
+
+async def measure(
+    base_url: str,
+    http_client: Optional[httpx.AsyncClient],
+    requests: int,
+    concurrency: int
+) -> Dict[str, object]:
+    from openai import AsyncOpenAI
+
+    client = AsyncOpenAI(api_key="fake", base_url=base_url, max_retries=0, http_client=http_client)
+    ttfts: List[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                stream = await client.chat.completions.create(
+                    model="fake-model",
+                    messages=[{"role": "user", "content": f"request {i}"}],
+                    max_tokens=20,
+                    stream=True,
+                )
+                first = None
+                async for chunk in stream:
+                    if first is None and chunk.choices and chunk.choices[0].delta.content:
+                        first = time.perf_counter() - start
+                ttfts.append(first)
+            except Exception:
+                errors += 1
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    await client.close()
+    return {"ttft": ttfts, "errors": errors}
+
+
+async def upstream_requests(ports: Dict[str, int]) -> Dict[str, int]:
+    async with httpx.AsyncClient() as client:
+        counts = {}
+        for name, port in ports.items():
+            counts[name] = (await client.get(f"http://127.0.0.1:{port}/stats")).json()["requests"]
+        return counts
+
+
+def run_scenario(title: str, ports: Dict[str, int], names: List[str], routed: bool, hedge: bool,
+                 args: argparse.Namespace) -> None:
+    from app.services.llm_router import ROUTER_BASE_URL, LLMBackend, LLMRouter
+
+    # The backend that is down has no stats to read
+    counted = {name: ports[name] for name in names if name in BACKENDS}
+
+    async def run() -> None:
+        before = await upstream_requests(counted)
+        if routed:
+            backends = [LLMBackend(name, f"http://127.0.0.1:{ports[name]}/v1", "fake") for name in names]
+            router = LLMRouter(backends, hedge=hedge, hedge_min_delay=0.05)
+            result = await measure(ROUTER_BASE_URL, httpx.AsyncClient(transport=router), args.requests, args.concurrency)
+        else:
+            result = await measure(f"http://127.0.0.1:{ports[names[0]]}/v1", None, args.requests, args.concurrency)
+        after = await upstream_requests(counted)
+
+        ttft = result["ttft"]
+        spread = ", ".join(f"{name} {after[name] - before[name]}" for name in counted)
+        print(
+            f"{title:<28} TTFT p50 {percentile(ttft, 50) * 1000:6.0f} ms  p95 {percentile(ttft, 95) * 1000:6.0f} ms  "
+            f"p99 {percentile(ttft, 99) * 1000:6.0f} ms  errors {result['errors']:3d}  upstream calls: {spread}"
+        )
+
+    asyncio.run(run())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300, help="Streamed completions per scenario")
+    parser.add_argument("--concurrency", type=int, default=10, help="Completions in flight at once")
+    args = parser.parse_args()
+
+    ports = {name: free_port() for name in BACKENDS}
+    # Nothing listens on this one
+    ports["down"] = free_port()
+    with ExitStack() as stack:
+        for name, options in BACKENDS.items():
+            command = ["-m", "benchmarks.fake_upstream", "--port", str(ports[name]), "--tokens", "20",
+                       "--token-delay", "0.005", *options]
+            stack.enter_context(spawn(command, ports[name]))
+
+        print(f"{args.requests} streamed completions, {args.concurrency} at once")
+        run_scenario("stragglers, one backend", ports, ["straggly-a"], routed=False, hedge=False, args=args)
+        run_scenario("stragglers, 2 hedged", ports, ["straggly-a", "straggly-b"], routed=True, hedge=True, args=args)
+        run_scenario("slow backend alone", ports, ["slow"], routed=False, hedge=False, args=args)
+        run_scenario("slow + fast, routed", ports, ["slow", "fast"], routed=True, hedge=False, args=args)
+        run_scenario("flaky backend alone", ports, ["flaky"], routed=False, hedge=False, args=args)
+        # Every request starts at the dead backend until it is known to be down
+        run_scenario("down + flaky + fast, routed", ports, ["down", "flaky", "fast"], routed=True, hedge=False, args=args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark of the memory used by chat sessions.
+
+Fills a session store with N sessions of T turns (a system prompt, then one
+user message and one assistant reply per turn) and reports the resident
+memory per session, each layout measured in a fresh process:
+
+- dicts: one {"role", "content"} dict per message, the system prompt text shared
+- dicts, prompt copies: the same, with a copy of the prompt per session, as
+  when sessions are decoded from JSON (Redis, the archive)
+- compact: InMemorySessionStore (slotted messages, interned roles, system
+  prompt stored once)
+
+It also reports the bytes a session takes in Redis, with the prompt inlined
+versus stored once by reference.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_session_memory [--sessions 100000] [--turns 10]
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+
+from benchmarks.common import BACKEND_DIR
+from benchmarks.loadgen import SCRIPT
+
+VARIANTS = ("dicts", "dicts, prompt copies", "compact")
+
+REPLY = (
+    "Lisbon in early June is a great choice: long days, warm evenings and the city "
+    "festivals starting. For food and history I would stay in Baixa or Alfama, close "
+    "to the castle, the cathedral and the old tram lines. Would you like me to keep "
+    "the budget around the amount you mentioned, or leave some room for a day trip "
+    "to Sintra? (reply {})"
+)
+
+
+def rss() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def conversation(turns: int, n: int):
+    """Messages of one session, as fresh strings like decoded request bodies."""
+    for turn in range(turns):
+        yield {"role": "user", "content": SCRIPT[turn % len(SCRIPT)].encode().decode()}
+        yield {"role": "assistant", "content": REPLY.format(n * turns + turn)}
+
+
+def measure(variant: str, sessions: int, turns: int) -> float:
+    from app.api.endpoints.chat import SYSTEM_PROMPT
+    from app.services.session_store import InMemorySessionStore
+
+    gc.collect()
+    before = rss()
+    if variant == "compact":
+        store = InMemorySessionStore(max_sessions=sessions, ttl_seconds=3600)
+
+        async def fill():
+            for n in range(sessions):
+                system = {"role": "system", "content": SYSTEM_PROMPT}
+                await store.append(f"session-{n}", [system, *conversation(turns, n)])
+        asyncio.run(fill())
+    else:
+        # The store layout before compact messages: session -> (expires_at, messages, size)
+        store = OrderedDict()
+        for n in range(sessions):
+            prompt = SYSTEM_PROMPT.encode().decode() if variant == "dicts, prompt copies" else SYSTEM_PROMPT
+            messages = [{"role": "system", "content": prompt}, *conversation(turns, n)]
+            store[f"session-{n}"] = (time.monotonic() + 3600, messages, 0)
+    gc.collect()
+    return (rss() - before) / sessions
+
+
+def redis_bytes(turns: int) -> tuple:
+    from app.api.endpoints.chat import SYSTEM_PROMPT
+    from app.services.messages import system_prompts
+
+    messages = list(conversation(turns, 0))
+    inlined = len(json.dumps({"role": "system", "content": SYSTEM_PROMPT}))
+    referenced = len(json.dumps({"role": "system", "prompt": system_prompts.find(SYSTEM_PROMPT).version}))
+    rest = sum(len(json.dumps(message)) for message in messages)
+    return inlined + rest, referenced + rest
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100_000)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--variant", choices=VARIANTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        # Child process: measure one layout
+        print(measure(args.variant, args.sessions, args.turns))
+        return
+
+    print(f"{args.sessions} sessions x {args.turns} turns")
+    results = {}
+    for variant in VARIANTS:
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_session_memory", "--variant", variant,
+             "--sessions", str(args.sessions), "--turns", str(args.turns)],
+            cwd=BACKEND_DIR, check=True, capture_output=True, text=True,
+        ).stdout
+        results[variant] = float(out.strip().splitlines()[-1])
+        total = results[variant] * args.sessions / 2**20
+        print(f"{variant:<22} {results[variant]:8.0f} bytes/session  {total:8.1f} MiB total")
+    saved = 1 - results["compact"] / results["dicts, prompt copies"]
+    print(f"{'compact vs copies':<22} {saved:8.0%} saved")
+
+    inlined, referenced = redis_bytes(args.turns)
+    print(f"{'redis, prompt inlined':<22} {inlined:8d} bytes/session")
+    print(f"{'redis, prompt by ref':<22} {referenced:8d} bytes/session")
+
+
+if __name__ == "__main__":
+    main()
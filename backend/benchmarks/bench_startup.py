@@ -0,0 +1,84 @@
+"""
+Benchmark of API worker cold start.
+
+- import time: `import app.main` in a fresh interpreter
+- time to first /health: from launching uvicorn until /health answers
+  (imports, lifespan startup and the first request)
+
+Each measurement is repeated in new processes and the median is reported.
+The upstream check of /health is disabled so that only the worker is measured.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_startup [--runs 5]
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import BACKEND_DIR, free_port
+
+ENV = {**os.environ, "HEALTH_CHECK_UPSTREAM": "false"}
+
+
+def import_time() -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import app.main"], cwd=BACKEND_DIR, env=ENV, check=True)
+    return time.perf_counter() - start
+
+
+def port_open(port: int) -> bool:
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+            return True
+    except OSError:
+        return False
+
+
+def time_to_first_health(timeout: float = 30.0) -> float:
+    port = free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=ENV,
+    )
+    try:
+        # Poll with plain sockets: a new HTTP client per attempt would slow the measured process down
+        while not port_open(port):
+            if proc.poll() is not None:
+                raise RuntimeError("the API worker exited during startup")
+            if time.perf_counter() - start > timeout:
+                raise RuntimeError(f"/health did not answer within {timeout}s")
+            time.sleep(0.01)
+        with httpx.Client() as client:
+            client.get(f"http://127.0.0.1:{port}/health", timeout=timeout)
+        return time.perf_counter() - start
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    # One untimed run of each to warm the OS file cache and bytecode
+    import_time()
+    time_to_first_health()
+
+    imports = [import_time() for _ in range(args.runs)]
+    health = [time_to_first_health() for _ in range(args.runs)]
+    print(f"import app.main      median {statistics.median(imports):6.3f} s  (min {min(imports):.3f} s)")
+    print(f"time to first /health median {statistics.median(health):6.3f} s  (min {min(health):.3f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark for /api/v1/chat/stream against a local fake upstream.
+
+Starts the fake upstream and a single uvicorn worker, then drives 1, 50 and 500
+concurrent sessions and reports time-to-first-token and aggregate tokens/s.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_streaming [--levels 1 50 500] [--tokens 200]
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from typing import List, Tuple
+
+import httpx
+
+from benchmarks.common import free_port, percentile, spawn
+
+
+async def one_session(client: httpx.AsyncClient, url: str) -> Tuple[float, float, int]:
+    """
+    Send a single message and consume the streamed reply.
+
+    Returns:
+        (time to first token, total duration, number of chunks received)
+    """
+    start = time.perf_counter()
+    first = None
+    chunks = 0
+    payload = {"message": "Plan me a trip", "session_id": str(uuid.uuid4())}
+    async with client.stream("POST", url, json=payload) as response:
+        response.raise_for_status()
+        async for piece in response.aiter_text():
+            if not piece:
+                continue
+            if first is None:
+                first = time.perf_counter() - start
+            chunks += 1
+    return first or 0.0, time.perf_counter() - start, chunks
+
+
+async def run_level(url: str, concurrency: int, tokens: int) -> None:
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(timeout=None, limits=limits) as client:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(one_session(client, url) for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+
+    ttfts: List[float] = [r[0] for r in results]
+    print(
+        f"{concurrency:>5} sessions | "
+        f"TTFT p50 {percentile(ttfts, 50) * 1000:7.1f} ms  "
+        f"p95 {percentile(ttfts, 95) * 1000:7.1f} ms  "
+        f"max {max(ttfts) * 1000:7.1f} ms | "
+        f"{concurrency * tokens / wall:9.0f} tokens/s aggregate | wall {wall:5.2f} s"
+    )
+
+
+async def main_async(args: argparse.Namespace, app_port: int) -> None:
+    url = f"http://127.0.0.1:{app_port}/api/v1/chat/stream"
+    for level in args.levels:
+        await run_level(url, level, args.tokens)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 50, 500])
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--ttft", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    args = parser.parse_args()
+
+    upstream_port, app_port = free_port(), free_port()
+    upstream = [
+        "-m", "benchmarks.fake_upstream", "--port", str(upstream_port),
+        "--ttft", str(args.ttft), "--token-delay", str(args.token_delay), "--tokens", str(args.tokens),
+    ]
+    app = ["-m", "uvicorn", "app.main:app", "--port", str(app_port), "--log-level", "warning"]
+    env = {"OPENAI_BASE_URL": f"http://127.0.0.1:{upstream_port}/v1", "OPENAI_API_KEY": "fake"}
+
+    with spawn(upstream, upstream_port), spawn(app, app_port, env=env):
+        asyncio.run(main_async(args, app_port))
+
+
+if __name__ == "__main__":
+    main()
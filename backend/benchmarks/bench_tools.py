@@ -0,0 +1,150 @@
+"""
+Benchmark of the Concierge tool execution layer (app/services/tool_executor.py).
+
+Builds booking schemas with SiteSherpa._generate_booking_schema for N sessions
+spread over a few distinct trips (same destination and dates), and answers
+each with local stub flight, hotel and transfer lookups that sleep for an
+injected latency. Sessions run concurrently; each is measured:
+
+- sequential: the lookups awaited one after another, as the functions agent
+  (one tool call per model step) runs them
+- parallel: Concierge.lookup_bookings, the schema as one concurrent batch,
+  without caching
+- parallel + cache: the same with the lookup cache (TOOL_CACHE_TTLS) shared
+  by the sessions
+
+It prints the lookup latency percentiles per booking and the number of stub
+calls made, then checks that a stuck lookup is cut at its time limit.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_tools [--sessions 50] [--trips 5] [--latency 0.3]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from benchmarks.common import percentile
+
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+
+def stub_tools(latency: float, calls: Counter, latencies: Optional[Dict[str, float]] = None) -> List[Any]:
+    """Stub lookup tools sleeping for `latency` (or their entry in `latencies`) and counting their calls."""
+    from langchain_core.tools import tool
+
+    async def lookup(name: str) -> None:
+        calls[name] += 1
+        # +-30% around the injected latency
+        await asyncio.sleep((latencies or {}).get(name, latency) * random.uniform(0.7, 1.3))
+
+    @tool
+    async def search_flights(origin: str, destination: str, dates: Dict[str, str], passengers: int) -> List[Dict[str, Any]]:
+        """Search flights to the destination for the given dates and passengers."""
+        await lookup("search_flights")
+        return [{"flight": f"TP{len(destination) * 101}", "destination": destination, "price": 420.0 * passengers}]
+
+    @tool
+    async def search_hotels(type: str, location: str, check_in: str, check_out: str, guests: int,
+                            special_requirements: List[str]) -> List[Dict[str, Any]]:
+        """Search accommodation at the location for the given dates and guests."""
+        await lookup("search_hotels")
+        return [{"hotel": f"{location} Central", "type": type, "price": 140.0}]
+
+    @tool
+    async def search_transfers(destination: str, date: str, passengers: int) -> List[Dict[str, Any]]:
+        """Search airport transfers at the destination."""
+        await lookup("search_transfers")
+        return [{"transfer": "shuttle", "destination": destination, "price": 25.0 * passengers}]
+
+    return [search_flights, search_hotels, search_transfers]
+
+
+def booking_schemas(sessions: int, trips: int) -> List[Dict[str, Any]]:
+    from app.agents.site_sherpa import SiteSherpa
+    from app.schemas.base import TravelPreferences
+
+    sherpa = SiteSherpa(tools=[])
+    destinations = ["Lisbon", "Porto", "Madrid", "Rome", "Vienna", "Prague", "Athens", "Dublin"]
+    schemas = []
+    for session in range(sessions):
+        trip = session % trips
+        start = datetime(2026, 6, 1) + timedelta(days=7 * trip)
+        preferences = TravelPreferences(
+            destination=destinations[trip % len(destinations)],
+            start_date=start,
+            end_date=start + timedelta(days=7),
+            budget=3000,
+            accommodation_type="hotel",
+            travel_style="mid-range",
+            interests=["food", "history"],
+            group_size=2,
+        )
+        schemas.append(sherpa._generate_booking_schema(preferences))
+    return schemas
+
+
+async def run(args: argparse.Namespace) -> None:
+    from langchain_openai import ChatOpenAI
+
+    from app.agents.concierge import Concierge
+    from app.core.config import settings
+    from app.services.tool_executor import ToolResultCache, tool_executor
+
+    calls: Counter = Counter()
+    concierge = Concierge(ChatOpenAI(api_key="fake"), stub_tools(args.latency, calls))
+    schemas = booking_schemas(args.sessions, args.trips)
+
+    async def sequential(schema: Dict[str, Any]) -> None:
+        for tool, query in concierge.booking_queries(schema).values():
+            await tool.ainvoke(query)
+
+    async def measure(title: str, book) -> None:
+        calls.clear()
+        samples: List[float] = []
+
+        async def one(schema: Dict[str, Any]) -> None:
+            start = time.perf_counter()
+            await book(schema)
+            samples.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(one(schema) for schema in schemas))
+        print(
+            f"{title:<18} p50 {percentile(samples, 50) * 1000:6.0f} ms  p95 {percentile(samples, 95) * 1000:6.0f} ms  "
+            f"stub calls {sum(calls.values()):4d} ({', '.join(f'{name} {count}' for name, count in sorted(calls.items()))})"
+        )
+
+    print(f"{args.sessions} concurrent bookings over {args.trips} distinct trips, lookups {args.latency * 1000:.0f} ms +-30%")
+    await measure("sequential", sequential)
+    tool_executor.cache = ToolResultCache({}, settings.TOOL_CACHE_MAX_ENTRIES)
+    await measure("parallel", concierge.lookup_bookings)
+    tool_executor.cache = ToolResultCache(settings.TOOL_CACHE_TTLS, settings.TOOL_CACHE_MAX_ENTRIES)
+    await measure("parallel + cache", concierge.lookup_bookings)
+    print(f"cache: {tool_executor.stats()}")
+
+    # A hotel lookup stuck well past its time limit
+    tool_executor.timeouts["search_hotels"] = args.latency * 2
+    tool_executor.cache = ToolResultCache({}, settings.TOOL_CACHE_MAX_ENTRIES)
+    concierge.tools = stub_tools(args.latency, calls, {"search_hotels": args.latency * 20})
+    start = time.perf_counter()
+    results = await concierge.lookup_bookings(schemas[0])
+    print(f"stuck hotel lookup: answered in {(time.perf_counter() - start) * 1000:.0f} ms, "
+          f"accommodation -> {results['accommodation']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50, help="Concurrent bookings")
+    parser.add_argument("--trips", type=int, default=5, help="Distinct trips the bookings are spread over")
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds per stub lookup")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
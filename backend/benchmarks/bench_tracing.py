@@ -0,0 +1,161 @@
+"""
+Benchmark of request tracing and the per-request profiler (app/core/tracing.py,
+app/core/profiler.py).
+
+Spawns the fake upstream and one API worker per mode, then sends the same
+chat requests (unique messages, concurrently) to each:
+
+- off: TRACING_ENABLED=false
+- traced: every request traced (TRACE_SAMPLE_RATE=1)
+- profiled: every request traced and sent with X-Profile: 1
+
+It prints the cost of one span in process (inside and outside a traced
+request), the request latency percentiles and the worker CPU time per request
+of each mode (the overhead), then the spans of one traced request, by kind,
+as served by /api/v1/debug/traces.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_tracing [--requests 300] [--concurrency 20]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.common import free_port, percentile, spawn
+
+
+def cpu_seconds(pid: int) -> Optional[float]:
+    """User + system CPU time of a process (Linux /proc), or None elsewhere."""
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            fields = stat.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except OSError:
+        return None
+
+
+async def one_request(client: httpx.AsyncClient, url: str, headers: Dict[str, str]) -> Tuple[float, str]:
+    start = time.perf_counter()
+    body = {"message": f"Plan me a trip ({uuid.uuid4().hex})", "stream_format": "raw"}
+    async with client.stream("POST", url, json=body, headers=headers) as response:
+        response.raise_for_status()
+        async for _ in response.aiter_bytes():
+            pass
+    return time.perf_counter() - start, response.headers.get("x-trace-id", "")
+
+
+async def load(base_url: str, requests: int, concurrency: int, headers: Dict[str, str]) -> Tuple[List[float], List[str]]:
+    url = f"{base_url}/api/v1/chat/stream"
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=httpx.Timeout(60.0), limits=limits) as client:
+        async def bounded():
+            async with semaphore:
+                return await one_request(client, url, headers)
+
+        # Warm up: first-use costs (tokenizer, clients) are not what is measured
+        await one_request(client, url, headers)
+        results = await asyncio.gather(*(bounded() for _ in range(requests)))
+    return [latency for latency, _ in results], [trace_id for _, trace_id in results]
+
+
+async def span_breakdown(base_url: str, trace_id: str) -> None:
+    async with httpx.AsyncClient(timeout=httpx.Timeout(10.0)) as client:
+        trace = (await client.get(f"{base_url}/api/v1/debug/traces/{trace_id}")).json()
+    print(f"\nOne traced request ({trace['name']}, {trace['duration_ms']:.0f} ms):")
+    for span in trace["spans"]:
+        attributes = {key: value for key, value in span["attributes"].items() if key != "method"}
+        print(f"  {span['start_ms']:8.1f} ms  {span['duration_ms']:8.1f} ms  {span['kind']:<8} {span['name']:<24} {attributes}")
+    by_kind: Dict[str, float] = defaultdict(float)
+    for span in trace["spans"]:
+        if span["parent_id"] is not None:
+            by_kind[span["kind"]] += span["duration_ms"]
+    print("  time by span kind: " + ", ".join(f"{kind} {ms:.1f} ms" for kind, ms in sorted(by_kind.items())))
+
+
+def span_cost(iterations: int = 100000) -> Tuple[float, float]:
+    """Seconds per `span()` block inside a traced request, and outside one (no-op)."""
+    from app.core.tracing import Tracer, _current, span
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with span("noop", "step"):
+            pass
+    untraced = (time.perf_counter() - started) / iterations
+
+    # Traces keep their first spans only, so the timing does not grow a list
+    root = Tracer(max_traces=1, max_spans=0).start_trace("bench")
+    token = _current.set(root)
+    try:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            with span("child", "step", key="value"):
+                pass
+        traced = (time.perf_counter() - started) / iterations
+    finally:
+        _current.reset(token)
+    return traced, untraced
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300, help="Requests per mode")
+    parser.add_argument("--concurrency", type=int, default=20, help="Requests in flight at once")
+    parser.add_argument("--tokens", type=int, default=50, help="Tokens per upstream reply")
+    args = parser.parse_args()
+
+    upstream_port = free_port()
+    upstream = [
+        "-m", "benchmarks.fake_upstream", "--port", str(upstream_port),
+        "--tokens", str(args.tokens), "--token-delay", "0.001", "--ttft", "0.02",
+    ]
+    base_env = {
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{upstream_port}/v1",
+        "OPENAI_API_KEY": "fake",
+        "HEALTH_CHECK_UPSTREAM": "false",
+        "LLM_SINGLE_FLIGHT": "false",
+        "TRACE_DEBUG_ENDPOINTS": "true",
+    }
+    modes = [
+        ("off", {"TRACING_ENABLED": "false"}, {}),
+        ("traced", {"TRACING_ENABLED": "true"}, {}),
+        ("profiled", {"TRACING_ENABLED": "true", "PROFILER_ENABLED": "true"}, {"X-Profile": "1"}),
+    ]
+
+    traced, untraced = span_cost()
+    print(f"span(): {traced * 1e6:.2f} us in a traced request, {untraced * 1e6:.2f} us outside one")
+    print(f"Chat streams of {args.tokens} tokens, {args.requests} requests per mode, {args.concurrency} at once")
+    with spawn(upstream, upstream_port):
+        for title, env, headers in modes:
+            port = free_port()
+            app = ["-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"]
+            base_url = f"http://127.0.0.1:{port}"
+            with spawn(app, port, env={**base_env, **env}) as proc:
+                cpu_before = cpu_seconds(proc.pid)
+                started = time.perf_counter()
+                latencies, trace_ids = asyncio.run(load(base_url, args.requests, args.concurrency, headers))
+                wall = time.perf_counter() - started
+                cpu_after = cpu_seconds(proc.pid)
+                cpu = (
+                    f"worker CPU {(cpu_after - cpu_before) / (args.requests + 1) * 1000:5.2f} ms/request"
+                    if cpu_before is not None else ""
+                )
+                print(
+                    f"{title:<9} p50 {percentile(latencies, 50) * 1000:6.1f} ms  "
+                    f"p95 {percentile(latencies, 95) * 1000:6.1f} ms  "
+                    f"{(args.requests + 1) / wall:6.1f} requests/s  {cpu}"
+                )
+                if title == "traced":
+                    asyncio.run(span_breakdown(base_url, trace_ids[-1]))
+                    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Local OpenAI-compatible stub server.
+
+Implements the parts of the OpenAI API used by TripHelix (streaming and
+non-streaming chat completions, model listing) with configurable latency,
+reply length and error injection, so the chat endpoints and the agents can
+be measured without real OpenAI calls. Point the app at it with
+OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+Usage:
+    python -m benchmarks.fake_upstream --port 9100 --ttft 0.2 --token-delay 0.01 --tokens 200
+    python -m benchmarks.fake_upstream --error-rate 0.05 --abort-rate 0.01 --reply-file itinerary.md
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.requests import ClientDisconnect
+
+
+@dataclass
+class FakeUpstreamConfig:
+    """Behaviour of the stub server."""
+    ttft: float = 0.2  # Seconds before the first token
+    ttft_jitter: float = 0.0  # Uniform random extra delay added to ttft
+    slow_rate: float = 0.0  # Fraction of requests that are stragglers (slow_delay added to their ttft)
+    slow_delay: float = 1.0  # Extra time to first token of a straggler
+    token_delay: float = 0.01  # Seconds between two tokens
+    model_token_delays: Dict[str, float] = field(default_factory=dict)  # token_delay of specific models (e.g. faster small models)
+    tokens: int = 200  # Tokens per completion (capped by the request's max_tokens)
+    reply: Optional[str] = None  # Fixed reply text, streamed word by word
+    error_rate: float = 0.0  # Fraction of requests answered with an HTTP error
+    error_status: int = 500  # Status code of injected errors (e.g. 429 or 503)
+    abort_rate: float = 0.0  # Fraction of streams cut off half way through
+
+
+@dataclass
+class FakeUpstreamStats:
+    """Counters exposed at GET /stats."""
+    requests: int = 0
+    streams: int = 0
+    in_flight: int = 0
+    errors: int = 0
+    aborts: int = 0
+    disconnects: int = 0
+    completed: int = 0
+    tokens: int = 0
+
+
+def create_app(config: Optional[FakeUpstreamConfig] = None) -> FastAPI:
+    """
+    Build the stub server application.
+
+    Args:
+        config: Latency, length and error behaviour (defaults to FakeUpstreamConfig())
+
+    Returns:
+        A FastAPI app exposing /v1/chat/completions, /v1/models and /stats
+    """
+    config = config or FakeUpstreamConfig()
+    stats = FakeUpstreamStats()
+    app = FastAPI(title="Fake OpenAI upstream")
+    app.state.config = config
+    app.state.stats = stats
+
+    def reply_tokens(max_tokens: Optional[int]) -> List[str]:
+        if config.reply is not None:
+            words = config.reply.split(" ")
+            tokens = [word + " " for word in words[:-1]] + words[-1:]
+        else:
+            tokens = [f"tok{i} " for i in range(config.tokens)]
+        return tokens[:max_tokens] if max_tokens else tokens
+
+    def error_response() -> JSONResponse:
+        stats.errors += 1
+        return JSONResponse(
+            status_code=config.error_status,
+            content={"error": {"message": "Injected failure", "type": "server_error"}},
+            headers={"Retry-After": "1"} if config.error_status == 429 else None,
+        )
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "fake-model", "object": "model", "owned_by": "local"}]}
+
+    @app.get("/stats")
+    async def get_stats():
+        return vars(stats)
+
+    @app.post("/stats/reset")
+    async def reset_stats():
+        for name in vars(stats):
+            setattr(stats, name, 0)
+        return vars(stats)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        try:
+            body: Dict[str, Any] = await request.json()
+        except ClientDisconnect:
+            # Gone before the request was even read (e.g. the cancelled side of a hedged request)
+            stats.disconnects += 1
+            return Response(status_code=499)
+        stats.requests += 1
+        if random.random() < config.error_rate:
+            return error_response()
+
+        model = body.get("model", "fake-model")
+        completion_id = f"chatcmpl-{time.time_ns()}"
+        created = int(time.time())
+        tokens = reply_tokens(body.get("max_tokens") or body.get("max_completion_tokens"))
+        token_delay = config.model_token_delays.get(model, config.token_delay)
+        prompt_tokens = sum(len(str(m.get("content", ""))) // 4 + 1 for m in body.get("messages", []))
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(tokens),
+            "total_tokens": prompt_tokens + len(tokens),
+        }
+        first_delay = config.ttft + random.uniform(0, config.ttft_jitter)
+        if random.random() < config.slow_rate:
+            first_delay += config.slow_delay
+
+        if not body.get("stream"):
+            await asyncio.sleep(first_delay + token_delay * max(0, len(tokens) - 1))
+            stats.completed += 1
+            stats.tokens += len(tokens)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            }
+
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+        abort_at = len(tokens) // 2 if random.random() < config.abort_rate else None
+
+        def chunk(content=None, finish_reason=None, with_usage=False) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [] if with_usage else [{
+                    "index": 0,
+                    "delta": {"content": content} if content is not None else {},
+                    "finish_reason": finish_reason,
+                }],
+            }
+            if with_usage:
+                payload["usage"] = usage
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def stream():
+            stats.streams += 1
+            stats.in_flight += 1
+            try:
+                await asyncio.sleep(first_delay)
+                for i, token in enumerate(tokens):
+                    if i == abort_at:
+                        stats.aborts += 1
+                        # Drop the connection without finishing the stream
+                        raise RuntimeError("Injected stream abort")
+                    if i:
+                        await asyncio.sleep(token_delay)
+                    stats.tokens += 1
+                    yield chunk(token)
+                yield chunk(finish_reason="stop")
+                if include_usage:
+                    yield chunk(with_usage=True)
+                yield "data: [DONE]\n\n"
+                stats.completed += 1
+            except asyncio.CancelledError:
+                # The client went away before the stream finished
+                stats.disconnects += 1
+                raise
+            finally:
+                stats.in_flight -= 1
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the stub server options to an argument parser."""
+    parser.add_argument("--ttft", type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument("--ttft-jitter", type=float, default=0.0, help="Random extra TTFT, in seconds")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Fraction of requests with a slow first token")
+    parser.add_argument("--slow-delay", type=float, default=1.0, help="Extra TTFT of those requests, in seconds")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="Seconds between tokens")
+    parser.add_argument("--model-token-delay", action="append", default=[], metavar="MODEL=SECONDS",
+                        help="Token delay of one model (repeatable)")
+    parser.add_argument("--tokens", type=int, default=200, help="Tokens per completion")
+    parser.add_argument("--reply-file", help="Stream the words of this file instead of placeholder tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of injected failures")
+    parser.add_argument("--abort-rate", type=float, default=0.0, help="Fraction of streams cut mid-way")
+
+
+def config_from_args(args: argparse.Namespace) -> FakeUpstreamConfig:
+    """Build a FakeUpstreamConfig from parsed `add_arguments` options."""
+    reply = None
+    if args.reply_file:
+        with open(args.reply_file, encoding="utf-8") as f:
+            reply = f.read()
+    return FakeUpstreamConfig(
+        ttft=args.ttft,
+        ttft_jitter=args.ttft_jitter,
+        slow_rate=args.slow_rate,
+        slow_delay=args.slow_delay,
+        token_delay=args.token_delay,
+        model_token_delays={
+            model: float(delay) for model, _, delay in (option.partition("=") for option in args.model_token_delay)
+        },
+        tokens=args.tokens,
+        reply=reply,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        abort_rate=args.abort_rate,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Load generator for the chat endpoints.
+
+Drives N concurrent multi-turn sessions against /api/v1/chat/stream and reports
+p50/p95/p99 time-to-first-token, full-response latency, tokens/s, errors and
+the RSS of the API worker. With --duplicates, every turn is submitted several
+times at once on its session (double submits, client retries), and the number
+of upstream calls made is reported from the fake upstream's /stats.
+
+By default it spawns the fake upstream and one uvicorn worker pointed at it;
+pass --url to target an already running API instead (with --worker-pid to
+sample its RSS).
+
+Usage (from the backend directory):
+    python -m benchmarks.loadgen --sessions 100 --turns 3
+    python -m benchmarks.loadgen --sessions 50 --error-rate 0.05 --ttft-jitter 0.3
+    python -m benchmarks.loadgen --sessions 50 --duplicates 3
+    python -m benchmarks.loadgen --url http://localhost:8000 --worker-pid 1234
+"""
+
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import httpx
+
+from app.services.history import count_tokens
+from benchmarks import fake_upstream
+from benchmarks.common import free_port, percentile, spawn
+
+# Messages sent in order by every session, wrapping around if --turns is larger
+SCRIPT = [
+    "Hi! I'd like to plan a trip.",
+    "I'm thinking about Lisbon.",
+    "From June 3rd to June 10th.",
+    "Mid-range, mostly food and history.",
+    "Two adults, budget around 3000 dollars.",
+    "No special requirements, please generate the itinerary.",
+]
+
+
+@dataclass
+class LoadResults:
+    """Samples collected while the load runs."""
+    ttft: List[float] = field(default_factory=list)
+    latency: List[float] = field(default_factory=list)
+    tokens: int = 0
+    turns: int = 0
+    errors: int = 0
+    rejected: int = 0
+    rss_samples: List[int] = field(default_factory=list)
+    upstream_requests: Optional[int] = None
+
+
+def read_rss(pid: int) -> Optional[int]:
+    """Resident set size of a process in bytes, read from /proc (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+async def sample_rss(pid: int, results: LoadResults, interval: float = 0.25) -> None:
+    while True:
+        rss = read_rss(pid)
+        if rss is not None:
+            results.rss_samples.append(rss)
+        await asyncio.sleep(interval)
+
+
+async def run_turn(client: httpx.AsyncClient, url: str, session_id: str, message: str, results: LoadResults) -> None:
+    start = time.perf_counter()
+    first = None
+    reply = []
+    try:
+        async with client.stream("POST", url, json={"message": message, "session_id": session_id}) as response:
+            response.raise_for_status()
+            async for piece in response.aiter_text():
+                if piece and first is None:
+                    first = time.perf_counter() - start
+                reply.append(piece)
+    except httpx.HTTPStatusError as e:
+        # 429: refused by admission control, counted apart from failures
+        if e.response.status_code == 429:
+            results.rejected += 1
+        else:
+            results.errors += 1
+        return
+    except httpx.HTTPError:
+        results.errors += 1
+        return
+    results.turns += 1
+    results.ttft.append(first if first is not None else time.perf_counter() - start)
+    results.latency.append(time.perf_counter() - start)
+    results.tokens += count_tokens("".join(reply), "gpt-4o")
+
+
+async def run_session(
+    client: httpx.AsyncClient,
+    url: str,
+    turns: int,
+    think_time: float,
+    duplicates: int,
+    results: LoadResults
+) -> None:
+    session_id = uuid.uuid4().hex
+    for turn in range(turns):
+        message = SCRIPT[turn % len(SCRIPT)]
+        await asyncio.gather(*(run_turn(client, url, session_id, message, results) for _ in range(duplicates)))
+        if think_time:
+            await asyncio.sleep(random.uniform(0, think_time))
+
+
+async def upstream_request_count(client: httpx.AsyncClient, upstream_url: str) -> int:
+    response = await client.get(f"{upstream_url}/stats")
+    response.raise_for_status()
+    return response.json()["requests"]
+
+
+async def run_load(
+    base_url: str,
+    args: argparse.Namespace,
+    worker_pid: Optional[int],
+    upstream_url: Optional[str] = None
+) -> None:
+    url = f"{base_url.rstrip('/')}/api/v1/chat/stream"
+    results = LoadResults()
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    sampler = asyncio.create_task(sample_rss(worker_pid, results)) if worker_pid else None
+
+    async with httpx.AsyncClient(timeout=httpx.Timeout(args.timeout), limits=limits) as client:
+        upstream_before = await upstream_request_count(client, upstream_url) if upstream_url else 0
+        start = time.perf_counter()
+        sessions = []
+        for _ in range(args.sessions):
+            sessions.append(asyncio.create_task(
+                run_session(client, url, args.turns, args.think_time, args.duplicates, results)
+            ))
+            if args.ramp:
+                await asyncio.sleep(args.ramp / args.sessions)
+        await asyncio.gather(*sessions)
+        wall = time.perf_counter() - start
+        if upstream_url:
+            results.upstream_requests = await upstream_request_count(client, upstream_url) - upstream_before
+
+    if sampler:
+        sampler.cancel()
+    report(results, args, wall)
+
+
+def report(results: LoadResults, args: argparse.Namespace, wall: float) -> None:
+    def line(name: str, samples: List[float]) -> str:
+        return (
+            f"{name:<16} p50 {percentile(samples, 50) * 1000:8.1f} ms  "
+            f"p95 {percentile(samples, 95) * 1000:8.1f} ms  "
+            f"p99 {percentile(samples, 99) * 1000:8.1f} ms"
+        )
+
+    duplicates = f" x {args.duplicates} submissions" if args.duplicates > 1 else ""
+    print(
+        f"sessions {args.sessions} x {args.turns} turns{duplicates}, "
+        f"{results.turns} ok, {results.rejected} rejected (429), {results.errors} errors, wall {wall:.2f} s"
+    )
+    print(line("TTFT", results.ttft))
+    print(line("full response", results.latency))
+    print(f"{'throughput':<16} {results.tokens / wall:8.0f} tokens/s  {results.turns / wall:8.1f} turns/s")
+    if results.rss_samples:
+        print(f"{'worker RSS':<16} start {results.rss_samples[0] / 2**20:8.1f} MiB  peak {max(results.rss_samples) / 2**20:8.1f} MiB")
+    if results.upstream_requests is not None:
+        requests = results.turns + results.rejected + results.errors
+        print(f"{'upstream calls':<16} {results.upstream_requests:8d} for {requests} requests")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Base URL of a running API (default: spawn one against the fake upstream)")
+    parser.add_argument("--worker-pid", type=int, help="PID of the API worker whose RSS is sampled (with --url)")
+    parser.add_argument("--sessions", type=int, default=50, help="Concurrent sessions")
+    parser.add_argument("--turns", type=int, default=3, help="Turns per session")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Max random pause between turns, in seconds")
+    parser.add_argument("--duplicates", type=int, default=1, help="Concurrent submissions of each turn")
+    parser.add_argument("--ramp", type=float, default=0.0, help="Seconds over which sessions are started")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout, in seconds")
+    fake_upstream.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.url:
+        asyncio.run(run_load(args.url, args, args.worker_pid))
+        return
+
+    upstream_port, app_port = free_port(), free_port()
+    upstream = ["-m", "benchmarks.fake_upstream", "--port", str(upstream_port)]
+    for option in ("ttft", "ttft_jitter", "slow_rate", "slow_delay", "token_delay", "tokens", "reply_file", "error_rate", "error_status", "abort_rate"):
+        value = getattr(args, option)
+        if value is not None:
+            upstream += [f"--{option.replace('_', '-')}", str(value)]
+    app = ["-m", "uvicorn", "app.main:app", "--port", str(app_port), "--log-level", "warning"]
+    env = {"OPENAI_BASE_URL": f"http://127.0.0.1:{upstream_port}/v1", "OPENAI_API_KEY": "fake"}
+
+    with ExitStack() as stack:
+        stack.enter_context(spawn(upstream, upstream_port))
+        worker = stack.enter_context(spawn(app, app_port, env=env))
+        asyncio.run(run_load(
+            f"http://127.0.0.1:{app_port}", args, worker.pid, f"http://127.0.0.1:{upstream_port}"
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+The upstream LLM call is closed when a chat client disconnects.
+
+Runs the fake upstream and one API worker, opens chat streams, drops them
+after the first bytes and checks that the fake upstream sees its own stream
+closed early (`in_flight` back to 0, counted in `disconnects`) rather than
+generated to the end:
+
+- raw: as soon as the response is cancelled
+- sse: once REPLY_ABANDON_SECONDS have passed without the client resuming
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+
+import asyncio
+import time
+import uuid
+from typing import Dict, Iterator, Tuple
+
+import httpx
+import pytest
+
+from benchmarks.common import free_port, spawn
+
+ABANDON_SECONDS = 0.5
+# Time allowed to close the upstream stream, on top of REPLY_ABANDON_SECONDS for SSE replies
+BOUND_SECONDS = 1.0
+# 300 tokens, 20 ms apart: a reply takes 6 s, far longer than any bound above
+REPLY_TOKENS = 300
+
+
+@pytest.fixture(scope="module")
+def servers() -> Iterator[Tuple[str, str]]:
+    """Base URLs of the API worker and of the fake upstream it calls."""
+    upstream_port, app_port = free_port(), free_port()
+    upstream = [
+        "-m", "benchmarks.fake_upstream", "--port", str(upstream_port),
+        "--ttft", "0.05", "--tokens", str(REPLY_TOKENS), "--token-delay", "0.02",
+    ]
+    app = ["-m", "uvicorn", "app.main:app", "--port", str(app_port), "--log-level", "warning"]
+    env = {
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{upstream_port}/v1",
+        "OPENAI_API_KEY": "fake",
+        "HEALTH_CHECK_UPSTREAM": "false",
+        "REPLY_ABANDON_SECONDS": str(ABANDON_SECONDS),
+    }
+    with spawn(upstream, upstream_port), spawn(app, app_port, env=env):
+        yield f"http://127.0.0.1:{app_port}", f"http://127.0.0.1:{upstream_port}"
+
+
+async def disconnect_and_watch(
+    base_url: str,
+    upstream_url: str,
+    stream_format: str,
+    timeout: float
+) -> Tuple[Dict[str, int], Dict[str, int], float]:
+    """
+    Open a chat stream, drop it after its first bytes, then poll the fake
+    upstream until it has no stream open or `timeout` passed.
+
+    Returns:
+        The upstream counters before and after, and the seconds waited
+    """
+    async with httpx.AsyncClient(timeout=httpx.Timeout(30.0)) as client:
+        before = (await client.get(f"{upstream_url}/stats")).json()
+        body = {"message": f"Plan a long trip ({uuid.uuid4().hex})", "stream_format": stream_format}
+        async with client.stream("POST", f"{base_url}/api/v1/chat/stream", json=body) as response:
+            assert response.status_code == 200
+            async for chunk in response.aiter_bytes():
+                if chunk:
+                    break
+
+        started = time.perf_counter()
+        while True:
+            after = (await client.get(f"{upstream_url}/stats")).json()
+            waited = time.perf_counter() - started
+            if after["in_flight"] == 0 or waited > timeout:
+                return before, after, waited
+            await asyncio.sleep(0.02)
+
+
+@pytest.mark.parametrize(
+    "stream_format, timeout",
+    [("raw", BOUND_SECONDS), ("sse", ABANDON_SECONDS + BOUND_SECONDS)],
+)
+def test_upstream_closed_after_client_disconnects(servers, stream_format, timeout):
+    base_url, upstream_url = servers
+    before, after, waited = asyncio.run(disconnect_and_watch(base_url, upstream_url, stream_format, timeout))
+
+    assert after["in_flight"] == 0, f"The upstream stream was still open {waited:.1f}s after the client disconnected"
+    assert after["disconnects"] == before["disconnects"] + 1, "The upstream stream was not aborted"
+    assert after["tokens"] - before["tokens"] < REPLY_TOKENS
@@ -0,0 +1,52 @@
+"""
+HistoryManager keeps chat turns going when the summarizer fails.
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+
+import asyncio
+
+from app.services.history import SUMMARY_PREFIX, HistoryManager, count_message_tokens
+
+MODEL = "gpt-4o"
+
+
+def conversation(turns: int):
+    messages = [{"role": "system", "content": "You are a travel assistant."}]
+    for turn in range(turns):
+        messages.append({"role": "user", "content": f"Message {turn}: " + "tell me about Lisbon " * 20})
+        messages.append({"role": "assistant", "content": f"Answer {turn}: " + "Lisbon is lovely " * 20})
+    return messages
+
+
+def test_failed_summary_truncates_to_the_budget():
+    async def failing(previous, messages):
+        raise TimeoutError("summarizer timed out")
+
+    manager = HistoryManager(summarizer=failing, model=MODEL, max_tokens=600, keep_recent=2)
+    messages = conversation(10)
+    window = asyncio.run(manager.window("session", messages))
+
+    assert window[0] == messages[0]
+    assert window[-1] == messages[-1]
+    assert count_message_tokens(window, MODEL) <= 600
+    assert not any(message["content"].startswith(SUMMARY_PREFIX) for message in window)
+
+
+def test_failed_summary_keeps_the_previous_one():
+    calls = []
+
+    async def flaky(previous, messages):
+        calls.append(len(messages))
+        if len(calls) > 1:
+            raise RuntimeError("upstream error")
+        return "The traveller wants to visit Lisbon."
+
+    manager = HistoryManager(summarizer=flaky, model=MODEL, max_tokens=600, keep_recent=2)
+    asyncio.run(manager.window("session", conversation(6)))
+    window = asyncio.run(manager.window("session", conversation(12)))
+
+    assert len(calls) == 2
+    assert window[1]["content"] == SUMMARY_PREFIX + "The traveller wants to visit Lisbon."
+    assert count_message_tokens(window, MODEL) <= 600
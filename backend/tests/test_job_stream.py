@@ -0,0 +1,95 @@
+"""
+Job streams resume from a client's Last-Event-ID, and from the start when it is not one of theirs.
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+
+import asyncio
+
+import pytest
+from fakeredis import FakeAsyncRedis
+
+from app.services.job_stream import InMemoryJobStreamStore, RedisJobStreamStore
+
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request):
+    if request.param == "redis":
+        return RedisJobStreamStore(FakeAsyncRedis(decode_responses=True), ttl_seconds=60)
+    return InMemoryJobStreamStore(ttl_seconds=60)
+
+
+def test_resume_after_last_event_id(store):
+    async def scenario():
+        first = await store.publish("job", "status", {"status": "running"})
+        await store.publish("job", "done", {})
+        return await store.read("job", first, timeout=0.1)
+
+    assert [event_type for _, event_type, _ in asyncio.run(scenario())] == ["done"]
+
+
+@pytest.mark.parametrize("last_event_id", ["1712-0", "garbage", "-3", "1:2"])
+def test_foreign_last_event_id_resumes_from_the_start(store, last_event_id):
+    async def scenario():
+        await store.publish("job", "status", {"status": "running"})
+        await store.publish("job", "done", {})
+        return await store.read("job", last_event_id, timeout=0.1)
+
+    events = asyncio.run(scenario())
+    if isinstance(store, RedisJobStreamStore) and last_event_id == "1712-0":
+        # A valid stream id older than every event
+        assert len(events) == 2
+    else:
+        assert [event_type for _, event_type, _ in events] == ["status", "done"]
+
+
+@pytest.fixture
+def jobs_client(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.api.endpoints import jobs
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "SSE_HEARTBEAT_SECONDS", 0.1)
+    monkeypatch.setattr(jobs, "job_stream", InMemoryJobStreamStore(ttl_seconds=60))
+    app = FastAPI()
+    app.include_router(jobs.router, prefix="/api/v1")
+    with TestClient(app) as client:
+        yield client, jobs.job_stream
+
+
+def read_events(client, job_id):
+    events = []
+    with client.stream("GET", f"/api/v1/jobs/{job_id}/stream") as response:
+        for line in response.iter_lines():
+            if line.startswith("event: "):
+                events.append(line[len("event: "):])
+    return events
+
+
+@pytest.mark.parametrize("status", ["done", "failed"])
+def test_stream_ends_when_a_finished_job_lost_its_terminal_event(jobs_client, status):
+    client, store = jobs_client
+    asyncio.run(store.set_status("job", {"status": "running"}))
+    asyncio.run(store.publish("job", "status", {"status": "running"}))
+    asyncio.run(store.set_status("job", {"status": status}))
+
+    assert read_events(client, "job") == ["status", "error"]
+
+
+def test_stream_ends_when_the_job_expires(jobs_client):
+    client, store = jobs_client
+    asyncio.run(store.set_status("job", {"status": "running"}))
+    store.ttl_seconds = 0.05
+
+    assert read_events(client, "job") == ["error"]
+
+
+def test_stream_of_a_finished_job_ends_with_its_terminal_event(jobs_client):
+    client, store = jobs_client
+    asyncio.run(store.set_status("job", {"status": "done"}))
+    asyncio.run(store.publish("job", "done", {}))
+
+    assert read_events(client, "job") == ["done"]
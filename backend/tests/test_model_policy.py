@@ -0,0 +1,104 @@
+"""
+Phase routing of the chat endpoint: the transcript heuristics of chat_phase()
+and the guard that keeps a misrouted itinerary from being cut at the
+gathering max_tokens.
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+
+import asyncio
+
+import pytest
+
+from app.services.model_policy import chat_phase, guard_gathering_reply, starts_itinerary
+
+QUESTIONS = [
+    "Hi! Do you have a destination in mind?",
+    "Lovely. What are your travel dates?",
+    "What's your travel style: luxury, mid-range or adventure?",
+    "What kind of accommodation do you prefer?",
+    "Which activities interest you most?",
+    "How big is your group?",
+    "What's your budget range?",
+    "Any dietary restrictions or special requirements?",
+]
+
+
+def conversation(questions, answer="Sounds good."):
+    messages = [{"role": "system", "content": "You are a travel assistant."}]
+    for question in questions:
+        messages.append({"role": "assistant", "content": question})
+        messages.append({"role": "user", "content": answer})
+    return messages
+
+
+def test_answer_to_the_last_question_is_the_itinerary_turn():
+    assert chat_phase(conversation(QUESTIONS[:-1])) == "gathering"
+    assert chat_phase(conversation(QUESTIONS)) == "itinerary"
+
+
+def test_topics_match_whole_words_only():
+    # "update" is not "date", "stylesheet" is not "style", "grouped" is not "group"...
+    near_misses = [
+        "Do you have a destination in mind?",
+        "Shall I update you whenever prices change?",
+        "Do you like this stylesheet?",
+        "What kind of accommodation do you prefer?",
+        "Which activities interest you most?",
+        "Should these be grouped?",
+        "Any dietary restrictions?",
+        "What's your budget range?",
+    ]
+    assert chat_phase(conversation(near_misses)) == "gathering"
+
+
+def test_unmatched_wording_still_gets_the_itinerary_through_the_guard():
+    # "special needs" is none of the dietary/requirement words: the turn stays on gathering...
+    questions = QUESTIONS[:-1] + ["Does anyone in your party have special needs?"]
+    assert chat_phase(conversation(questions)) == "gathering"
+
+    # ...and its reply, which opens the itinerary template, is asked again on the itinerary phase
+    itinerary = ["# Lis", "bon Itinerary: June 3", " - June 6\n\n", "## Day 1"]
+    escalated = []
+
+    async def deltas(parts):
+        for part in parts:
+            yield part
+
+    async def escalate(gathering):
+        escalated.append(True)
+        await gathering.aclose()
+        return deltas(["# Lisbon Itinerary: June 3 - June 6\n\n", "## Day 1: June 3\n", "..."])
+
+    async def read():
+        return [delta async for delta in guard_gathering_reply(deltas(itinerary), escalate)]
+
+    assert asyncio.run(read()) == ["# Lisbon Itinerary: June 3 - June 6\n\n", "## Day 1: June 3\n", "..."]
+    assert escalated == [True]
+
+
+@pytest.mark.parametrize("reply", [
+    ["What are ", "your dates?"],
+    ["# Packing", " tips\n", "- Sunscreen"],
+    ["#", "# Options"],
+])
+def test_guard_passes_other_replies_through(reply):
+    async def deltas():
+        for part in reply:
+            yield part
+
+    async def escalate(gathering):
+        raise AssertionError("escalated a reply that is not the itinerary")
+
+    async def read():
+        return "".join([delta async for delta in guard_gathering_reply(deltas(), escalate)])
+
+    assert asyncio.run(read()) == "".join(reply)
+
+
+def test_starts_itinerary():
+    assert starts_itinerary("  \n# Lisbon Itinerary: June 3") is True
+    assert starts_itinerary("What are your dates?") is False
+    assert starts_itinerary("# Lisbon") is None
+    assert starts_itinerary("# Lisbon highlights\n") is False
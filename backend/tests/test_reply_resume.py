@@ -0,0 +1,145 @@
+"""
+An SSE chat reply resumed on another worker is not abandoned by the worker
+producing it.
+
+Runs the fake upstream, an in-process fake Redis server and two API workers
+buffering replies in it (REPLY_BUFFER_BACKEND=redis). A reply started on the
+first worker is dropped after its first event and resumed on the second with
+Last-Event-ID; the second worker's reader lease keeps the first from
+cancelling the reply after REPLY_ABANDON_SECONDS, so it arrives whole. Once
+the reader on the second worker leaves too, the reply is abandoned.
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+
+import asyncio
+import json
+import threading
+import uuid
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import httpx
+import pytest
+from fakeredis import TcpFakeServer
+
+from benchmarks.common import free_port, spawn
+
+ABANDON_SECONDS = 0.5
+# 60 tokens, 50 ms apart: the reply takes 3 s, several times REPLY_ABANDON_SECONDS
+REPLY_TOKENS = 60
+
+
+@pytest.fixture(scope="module")
+def servers() -> Iterator[Tuple[str, str, str]]:
+    """Base URLs of two API workers sharing one Redis reply buffer, and of the fake upstream they call."""
+    redis_port, upstream_port = free_port(), free_port()
+    redis = TcpFakeServer(("127.0.0.1", redis_port))
+    threading.Thread(target=redis.serve_forever, daemon=True).start()
+
+    upstream = [
+        "-m", "benchmarks.fake_upstream", "--port", str(upstream_port),
+        "--ttft", "0.05", "--tokens", str(REPLY_TOKENS), "--token-delay", "0.05",
+    ]
+    env = {
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{upstream_port}/v1",
+        "OPENAI_API_KEY": "fake",
+        "HEALTH_CHECK_UPSTREAM": "false",
+        "REPLY_BUFFER_BACKEND": "redis",
+        "REDIS_HOST": "127.0.0.1",
+        "REDIS_PORT": str(redis_port),
+        "REPLY_ABANDON_SECONDS": str(ABANDON_SECONDS),
+        "SSE_HEARTBEAT_SECONDS": "0.2",
+    }
+    ports = free_port(), free_port()
+    try:
+        with spawn(upstream, upstream_port):
+            with spawn(["-m", "uvicorn", "app.main:app", "--port", str(ports[0]), "--log-level", "warning"],
+                       ports[0], env=env):
+                with spawn(["-m", "uvicorn", "app.main:app", "--port", str(ports[1]), "--log-level", "warning"],
+                           ports[1], env=env):
+                    yield (
+                        f"http://127.0.0.1:{ports[0]}", f"http://127.0.0.1:{ports[1]}",
+                        f"http://127.0.0.1:{upstream_port}",
+                    )
+    finally:
+        redis.shutdown()
+        redis.server_close()
+
+
+def parse_events(text: str) -> List[Dict[str, str]]:
+    """SSE events of a response body, heartbeat comments left out."""
+    events = []
+    for frame in text.split("\n\n"):
+        fields = {}
+        for line in frame.splitlines():
+            name, _, value = line.partition(": ")
+            if name in ("id", "event", "data"):
+                fields[name] = value
+        if "data" in fields:
+            events.append(fields)
+    return events
+
+
+async def read_first_event(client: httpx.AsyncClient, url: str, body: Dict[str, str],
+                      headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Open an SSE chat stream and drop it after its first event."""
+    buffered = ""
+    async with client.stream("POST", url, json=body, headers=headers) as response:
+        assert response.status_code == 200
+        async for text in response.aiter_text():
+            buffered += text
+            if parse_events(buffered):
+                return parse_events(buffered)[0]
+    raise AssertionError("The stream ended without an event")
+
+
+async def drop_and_resume(first: str, second: str, drop_again: bool) -> Tuple[Dict[str, str], List[Dict[str, str]]]:
+    """
+    Start an SSE reply on `first`, drop it after its first event, then resume it on `second`.
+
+    Args:
+        drop_again: Drop the resumed stream after its first event too
+
+    Returns:
+        The first event and the events of the resumed stream
+    """
+    async with httpx.AsyncClient(timeout=httpx.Timeout(30.0)) as client:
+        url = "/api/v1/chat/stream"
+        body = {"message": f"Plan a long trip ({uuid.uuid4().hex})", "stream_format": "sse"}
+        event = await read_first_event(client, first + url, body)
+        headers = {"Last-Event-ID": event["id"]}
+        if drop_again:
+            return event, [await read_first_event(client, second + url, body, headers)]
+        resumed = await client.post(second + url, json=body, headers=headers)
+        assert resumed.status_code == 200
+        return event, parse_events(resumed.text)
+
+
+def test_reply_resumed_on_another_worker_is_not_abandoned(servers):
+    first, second, _ = servers
+    first_event, events = asyncio.run(drop_and_resume(first, second, drop_again=False))
+
+    assert events[-1]["event"] == "done"
+    done = json.loads(events[-1]["data"])
+    assert not done.get("truncated"), "The first worker abandoned the reply while it was read on the second"
+    reply = "".join(json.loads(event["data"])["delta"] for event in [first_event, *events] if "event" not in event)
+    assert reply.split() == [f"tok{i}" for i in range(REPLY_TOKENS)]
+
+
+def test_reply_dropped_on_both_workers_is_abandoned(servers):
+    first, second, upstream = servers
+
+    async def run():
+        async with httpx.AsyncClient() as client:
+            before = (await client.get(f"{upstream}/stats")).json()
+            await drop_and_resume(first, second, drop_again=True)
+            # Well before the 3 s the reply takes to generate
+            await asyncio.sleep(ABANDON_SECONDS * 3)
+            after = (await client.get(f"{upstream}/stats")).json()
+            return before, after
+
+    before, after = asyncio.run(run())
+
+    assert after["in_flight"] == 0, "The reply was still generated after every reader left"
+    assert after["disconnects"] == before["disconnects"] + 1
@@ -0,0 +1,163 @@
+"""
+The multi-backend LLM router fails over, avoids slow backends and cancels
+the loser of a hedge.
+
+Runs several fake upstreams and sends streamed completions to them through
+an AsyncOpenAI client (SDK retries disabled) backed by an LLMRouter, then
+checks from each fake upstream's counters which backends served them:
+
+- failover: a backend answering 503 to everything, then a healthy one
+- slow backend: one backend slow to its first token, one fast
+- hedging: a backend that stalls before its first token, raced by a fast one
+  whose answer is used while the stalled stream is closed
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+
+import asyncio
+import time
+from contextlib import ExitStack
+from typing import Dict, Iterator, List
+
+import httpx
+import pytest
+
+from app.services.llm_router import MIN_SAMPLES, ROUTER_BASE_URL, LLMBackend, LLMRouter
+from benchmarks.common import free_port, spawn
+
+REPLY_TOKENS = 10
+# Fake upstream options of each backend
+UPSTREAMS = {
+    "fast": ["--ttft", "0.02"],
+    "fast-b": ["--ttft", "0.02"],
+    "slow": ["--ttft", "0.4"],
+    "failing": ["--ttft", "0.02", "--error-rate", "1.0", "--error-status", "503"],
+    "stalled": ["--ttft", "5.0"],
+}
+# Time allowed for the cancelled side of a hedge to be closed upstream
+BOUND_SECONDS = 1.0
+
+
+@pytest.fixture(scope="module")
+def upstreams() -> Iterator[Dict[str, str]]:
+    """Base URLs of the fake upstreams, by name."""
+    ports = {name: free_port() for name in UPSTREAMS}
+    with ExitStack() as stack:
+        for name, options in UPSTREAMS.items():
+            command = [
+                "-m", "benchmarks.fake_upstream", "--port", str(ports[name]),
+                "--tokens", str(REPLY_TOKENS), "--token-delay", "0.005", *options,
+            ]
+            stack.enter_context(spawn(command, ports[name]))
+        yield {name: f"http://127.0.0.1:{port}" for name, port in ports.items()}
+
+
+def backends(upstreams: Dict[str, str], names: List[str]) -> List[LLMBackend]:
+    # New backends for each test: their statistics must not leak from one to the next
+    return [LLMBackend(name, f"{upstreams[name]}/v1", "fake") for name in names]
+
+
+async def upstream_stats(upstreams: Dict[str, str], names: List[str]) -> Dict[str, Dict[str, int]]:
+    async with httpx.AsyncClient() as client:
+        return {name: (await client.get(f"{upstreams[name]}/stats")).json() for name in names}
+
+
+async def complete(router: LLMRouter, requests: int = 1) -> List[str]:
+    """Send streamed completions one after the other through the router and return their texts."""
+    from openai import AsyncOpenAI
+
+    client = AsyncOpenAI(
+        api_key="fake", base_url=ROUTER_BASE_URL, max_retries=0, http_client=httpx.AsyncClient(transport=router)
+    )
+    replies = []
+    try:
+        for i in range(requests):
+            stream = await client.chat.completions.create(
+                model="fake-model",
+                messages=[{"role": "user", "content": f"request {i}"}],
+                max_tokens=REPLY_TOKENS,
+                stream=True,
+            )
+            parts = [chunk.choices[0].delta.content async for chunk in stream
+                     if chunk.choices and chunk.choices[0].delta.content]
+            replies.append("".join(parts))
+    finally:
+        await client.close()
+    return replies
+
+
+def served(before: Dict[str, Dict[str, int]], after: Dict[str, Dict[str, int]], counter: str) -> Dict[str, int]:
+    return {name: after[name][counter] - before[name][counter] for name in before}
+
+
+def test_fails_over_to_the_next_backend(upstreams):
+    names = ["failing", "fast"]
+
+    async def run():
+        router = LLMRouter(backends(upstreams, names), explore=0.0)
+        before = await upstream_stats(upstreams, names)
+        replies = await complete(router, requests=3)
+        after = await upstream_stats(upstreams, names)
+        await router.aclose()
+        return router, replies, served(before, after, "errors"), served(before, after, "completed")
+
+    router, replies, errors, completed = asyncio.run(run())
+
+    assert all(reply.startswith("tok0") for reply in replies)
+    # Tried first, then cooling down after its failure
+    assert errors == {"failing": 1, "fast": 0}
+    assert completed == {"failing": 0, "fast": 3}
+    assert router.backends[0].down_until > time.monotonic()
+
+
+def test_routes_away_from_a_slow_backend(upstreams):
+    names = ["slow", "fast"]
+
+    async def run():
+        router = LLMRouter(backends(upstreams, names), explore=0.0)
+        before = await upstream_stats(upstreams, names)
+        await complete(router, requests=10)
+        after = await upstream_stats(upstreams, names)
+        await router.aclose()
+        return served(before, after, "completed")
+
+    completed = asyncio.run(run())
+
+    # Both are untried at first: the slow one answers once, then only the fast one is used
+    assert completed == {"slow": 1, "fast": 9}
+
+
+def test_hedge_cancels_the_stalled_backend(upstreams):
+    names = ["stalled", "fast-b"]
+
+    async def run():
+        stalled, fast = backends(upstreams, names)
+        # Known history: "stalled" usually answers in 50 ms and is ranked first, so it is late after 100 ms
+        for _ in range(MIN_SAMPLES):
+            stalled.stats["stream"].success(0.05)
+        fast.stats["stream"].success(0.2)
+        router = LLMRouter([stalled, fast], hedge=True, hedge_min_delay=0.1, explore=0.0)
+
+        before = await upstream_stats(upstreams, names)
+        started = time.perf_counter()
+        replies = await complete(router)
+        elapsed = time.perf_counter() - started
+
+        deadline = time.perf_counter() + BOUND_SECONDS
+        while True:
+            after = await upstream_stats(upstreams, names)
+            if after["stalled"]["in_flight"] == 0 or time.perf_counter() > deadline:
+                break
+            await asyncio.sleep(0.02)
+        await router.aclose()
+        return replies, elapsed, before, after
+
+    replies, elapsed, before, after = asyncio.run(run())
+
+    assert replies[0].startswith("tok0")
+    assert elapsed < 1.0, f"The hedge did not answer for the stalled backend ({elapsed:.1f}s)"
+    assert served(before, after, "requests") == {"stalled": 1, "fast-b": 1}
+    assert served(before, after, "completed") == {"stalled": 0, "fast-b": 1}
+    assert after["stalled"]["in_flight"] == 0, "The stalled backend's stream was still open"
+    assert served(before, after, "disconnects")["stalled"] == 1
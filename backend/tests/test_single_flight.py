@@ -0,0 +1,48 @@
+"""
+Single-flight upstream streams are cancelled once nobody reads them.
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+
+import asyncio
+
+from app.services.single_flight import SingleFlight
+
+
+async def slow_stream(tokens: int = 1000):
+    for index in range(tokens):
+        await asyncio.sleep(0.01)
+        yield f"tok{index} "
+
+
+def test_unread_joiner_does_not_keep_the_upstream_open():
+    async def scenario():
+        flights = SingleFlight("test")
+        leader, is_leader = await flights.stream("key", lambda: asyncio.sleep(0, slow_stream()))
+        # Joins, then fails or disconnects before its first read
+        joined, is_joiner_leader = await flights.stream("key", lambda: asyncio.sleep(0, slow_stream()))
+        assert is_leader and not is_joiner_leader
+
+        assert await leader.__anext__() == "tok0 "
+        await leader.aclose()
+        await asyncio.sleep(0.05)
+        return len(flights)
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_joiner_reading_keeps_the_upstream_open():
+    async def scenario():
+        flights = SingleFlight("test")
+        leader, _ = await flights.stream("key", lambda: asyncio.sleep(0, slow_stream(20)))
+        joined, _ = await flights.stream("key", lambda: asyncio.sleep(0, slow_stream(20)))
+        await leader.__anext__()
+        await joined.__anext__()
+        await leader.aclose()
+        # The joiner still reads the whole reply
+        return [delta async for delta in joined][:2], len(flights)
+
+    deltas, flights = asyncio.run(scenario())
+    assert deltas == ["tok1 ", "tok2 "]
+    assert flights == 0